@@ -12,6 +12,7 @@ CREATE TABLE `inventory` (
   `location` varchar(60) DEFAULT NULL,
   `contacts` varchar(255) DEFAULT NULL,
   `do_ping` tinyint(1) DEFAULT NULL,
+  `probe_type` varchar(20) DEFAULT NULL,
   PRIMARY KEY (`mgmt_ip_address`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
 
@@ -23,9 +24,86 @@ CREATE TABLE `pingresults` (
   `max_latency` decimal(7,2) DEFAULT NULL,
   `datetime_lastup` datetime DEFAULT NULL,
   `down_count` int NOT NULL,
+  `p50_latency` decimal(7,2) DEFAULT NULL,
+  `p95_latency` decimal(7,2) DEFAULT NULL,
+  `p99_latency` decimal(7,2) DEFAULT NULL,
+  `jitter` decimal(7,2) DEFAULT NULL,
+  `state` varchar(10) DEFAULT NULL,
+  `flap_score` tinyint DEFAULT NULL,
+  `probe_type` varchar(20) DEFAULT NULL,
+  `poller` varchar(45) DEFAULT NULL,
+  `stale` tinyint NOT NULL DEFAULT 0,
   PRIMARY KEY (`mgmt_ip_address`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
 
+CREATE TABLE `pollers` (
+  `worker_id` varchar(64) NOT NULL,
+  `hostname` varchar(45) DEFAULT NULL,
+  `heartbeat` bigint NOT NULL,
+  PRIMARY KEY (`worker_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+
+CREATE TABLE `shard_leases` (
+  `shard` smallint NOT NULL,
+  `worker_id` varchar(64) NOT NULL,
+  `lease_expires` bigint NOT NULL,
+  PRIMARY KEY (`shard`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+
+CREATE TABLE `poller_batches` (
+  `batch_id` varchar(80) NOT NULL,
+  `poller` varchar(45) NOT NULL,
+  `created` bigint NOT NULL,
+  `devices` int NOT NULL,
+  PRIMARY KEY (`batch_id`),
+  KEY `poller_created` (`poller`, `created`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+
+CREATE TABLE `inventory_sources` (
+  `collector` varchar(30) NOT NULL,
+  `mgmt_ip_address` varchar(45) NOT NULL,
+  `hostname` varchar(45) DEFAULT NULL,
+  `serial_number` varchar(30) DEFAULT NULL,
+  `device_type` varchar(120) DEFAULT NULL,
+  `device_group` varchar(45) DEFAULT NULL,
+  `model` varchar(45) DEFAULT NULL,
+  `source` varchar(30) DEFAULT NULL,
+  `software_version` varchar(30) DEFAULT NULL,
+  `location` varchar(60) DEFAULT NULL,
+  `do_ping` tinyint(1) DEFAULT NULL,
+  `last_seen` bigint NOT NULL DEFAULT 0,
+  PRIMARY KEY (`collector`, `mgmt_ip_address`),
+  KEY `mgmt_ip_address` (`mgmt_ip_address`),
+  KEY `serial_number` (`serial_number`),
+  KEY `collector_last_seen` (`collector`, `last_seen`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+
+CREATE TABLE `sla_state` (
+  `mgmt_ip_address` varchar(45) NOT NULL,
+  `last_sample` bigint NOT NULL,
+  `last_up` tinyint(1) NOT NULL,
+  `outage_start` bigint DEFAULT NULL,
+  PRIMARY KEY (`mgmt_ip_address`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+
+CREATE TABLE `sla_daily` (
+  `day` date NOT NULL,
+  `mgmt_ip_address` varchar(45) NOT NULL,
+  `samples` int NOT NULL DEFAULT 0,
+  `monitored_seconds` int NOT NULL DEFAULT 0,
+  `down_seconds` int NOT NULL DEFAULT 0,
+  `outages` int NOT NULL DEFAULT 0,
+  `repairs` int NOT NULL DEFAULT 0,
+  `repair_seconds` bigint NOT NULL DEFAULT 0,
+  PRIMARY KEY (`day`, `mgmt_ip_address`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+
+CREATE TABLE `query_generation` (
+  `id` tinyint NOT NULL,
+  `generation` bigint NOT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+
 
 CREATE USER 'dddbu'@'localhost' IDENTIFIED BY '###PASSWORD###';
 
@@ -0,0 +1,776 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Benchmarks the poll-to-dashboard pipeline with synthetic data
+ (Benchmark.py)
+
+#                                                                      #
+Generates a synthetic inventory (eg. 1k to 100k devices) and fake
+fping JSON output, then times every stage of the PingAndUpdateInventory
+and CreateAvailabilityDashboard pipeline against a local SQLite file
+or a local MySQL container - no network devices are pinged.
+
+For every stage the wall time, peak RSS of the process and number of
+database round trips are recorded.  Each device count runs in its own
+Python process so the peak RSS figures are not inflated by the
+previous (larger) run.  Results are appended to a JSON-lines file,
+one line per device count and run; two runs can be compared to spot
+regressions.
+
+Required inputs/variables:
+    Command line options, see 'python Benchmark.py --help'
+    With --backend mysql, the MySQL section of optionsconfig.yaml and a
+        dedicated benchmark database (--mysql-database) whose
+        inventory and pingresults tables are overwritten
+
+Outputs:
+    Appends results to the --results JSON-lines file
+    With --compare, prints per-stage differences between two runs and
+        exits non-zero when a stage regressed beyond --tolerance
+    With --json-codecs, prints the parse and encode times of every
+        installed JSONCodec backend on fping output of --devices hosts
+        and on controller REST API pages
+    With --import-time, prints the start-up cost of the cron entry
+        points: import time per module (python -X importtime) and the
+        time to read optionsconfig.yaml, with and without fast-start
+
+Version log:
+v1      2026-1019   First release
+v2      2026-1019   classify_endpoint vs classify_columns stages;
+    records whether the vectorized poll stats match get_poll_stats
+v3      2026-1019   add_poller stage for the pingresults poller column
+v4      2026-1019   add_probe_type stage
+v5      2026-1019   --json-codecs microbenchmark of the JSONCodec
+    backends; fake fping output is bytes, like the real one
+v6      2026-1019   --import-time start-up report of the entry points
+v7      2026-1019   get_mysql_pingresults_cached stage, a repeated read
+    served by the QueryCache
+v8      2026-1019   --compare only compares the records of --label,
+    when given
+v9      2026-1019   get_mysql_pingresults_cached reads the generation
+    published to CacheDir
+
+Credits:
+"""
+__version__ = '9'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import timeit
+import tempfile
+import subprocess
+from datetime import datetime
+
+
+# Script-global variables
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_RESULTS = "benchmark_results.jsonl"
+SOURCES = ("sandboxdnac.cisco.com", "primeinfra.example.com",
+           "sandboxapicdc.cisco.com", "GetWLCAPs")
+STARTUP_SCRIPTS = ["PingAndUpdateInventory", "CreateAvailabilityDashboard"]
+STARTUP_TOP = 10
+# Imports a module and reads every optionsconfig.yaml section, timed
+#  in a fresh interpreter
+STARTUP_PROBE = """import json, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+import GetEnv
+for section in list(GetEnv.load()):
+    GetEnv.getparam(section)
+print(json.dumps([imported - start, time.perf_counter() - imported]))
+"""
+GROUPS = ("Switches and Hubs", "Routers", "Wireless Controller",
+          "Wireless AP", "Unified AP", "leaf", "spine")
+
+
+def synthetic_inventory(devices, seed=0):
+    """Synthetic inventory
+
+    :param devices: integer number of devices
+    :param seed: integer random seed
+    :returns: list of inventory tuples (hostname, mgmt_ip_address,
+        device_type, device_group, source, do_ping)
+    """
+    rng = random.Random(seed)
+    inventory = []
+    for number in range(devices):
+        ip_address = f"10.{(number >> 16) & 255}.{(number >> 8) & 255}." \
+            f"{number & 255}"
+        group = rng.choice(GROUPS)
+        inventory.append((f"bench-{number:06d}", ip_address, group, group,
+                          rng.choice(SOURCES), 1))
+    return inventory
+
+
+def synthetic_fping(ip_addresses, cycle=0, down_pct=2.0, lossy_pct=3.0,
+                    seed=0):
+    """Synthetic fping output
+
+    Builds fping '-c3 -q --json' style output: most devices answer all
+    three pings with log-normal latency, a few lose some pings and a
+    few are down.
+
+    :param ip_addresses: list of device IP addresses
+    :param cycle: integer poll cycle number, varies the results
+    :param down_pct: percentage of devices that are down
+    :param lossy_pct: percentage of devices dropping pings
+    :param seed: integer random seed
+    :returns: bytes of fping JSON output
+    """
+    rng = random.Random(seed * 1000003 + cycle)
+    hosts = {}
+    for ip_address in ip_addresses:
+        roll = rng.random() * 100
+        if roll < down_pct:
+            hosts[ip_address] = {"xmt": 3, "rcv": 0, "loss_percentage": 100}
+            continue
+        loss = 33 if roll < down_pct + lossy_pct else 0
+        latencies = sorted(rng.lognormvariate(1.5, 0.8) for _ in range(3))
+        hosts[ip_address] = {"xmt": 3, "rcv": 3 - loss // 33,
+                             "loss_percentage": loss,
+                             "min": round(latencies[0], 2),
+                             "avg": round(sum(latencies) / 3, 2),
+                             "max": round(latencies[2], 2)}
+    return json.dumps({"hosts": hosts}).encode("utf-8")
+
+
+def synthetic_api_pages(seed=0):
+    """Synthetic controller REST API pages
+
+    One full page of each collector's API, with the attributes the
+    controllers return per device, not only the ones extracted.
+
+    :param seed: integer random seed
+    :returns: dictionary of payload name: bytes of JSON
+    """
+    rng = random.Random(seed)
+
+    def ip_address(number):
+        return f"10.{(number >> 16) & 255}.{(number >> 8) & 255}." \
+            f"{number & 255}"
+
+    dnac = [{
+        "hostname": f"bench-{number:06d}.example.com",
+        "managementIpAddress": ip_address(number),
+        "type": "Cisco Catalyst 9300 Switch",
+        "family": "Switches and Hubs",
+        "series": "Cisco Catalyst 9300 Series Switches",
+        "platformId": "C9300-48U",
+        "softwareType": "IOS-XE",
+        "softwareVersion": "17.9.4a",
+        "serialNumber": f"FOC{rng.randrange(10**8):08d}",
+        "macAddress": ":".join(f"{rng.randrange(256):02x}"
+                               for _ in range(6)),
+        "upTime": f"{rng.randrange(400)} days, 4:{rng.randrange(60):02d}",
+        "uptimeSeconds": rng.randrange(10**8),
+        "lastUpdated": "2026-10-19 10:12:44",
+        "lastUpdateTime": 1760868764000 + number,
+        "collectionStatus": "Managed",
+        "collectionInterval": "Global Default",
+        "reachabilityStatus": "Reachable",
+        "reachabilityFailureReason": "",
+        "role": rng.choice(("ACCESS", "DISTRIBUTION", "CORE")),
+        "roleSource": "AUTO",
+        "snmpContact": "noc@example.com",
+        "snmpLocation": f"Building {rng.randrange(40)} Floor 2",
+        "interfaceCount": "56",
+        "memorySize": "NA",
+        "lineCardCount": "3",
+        "lineCardId": "",
+        "tagCount": "0",
+        "managementState": "Managed",
+        "instanceUuid": f"{rng.getrandbits(128):032x}",
+        "id": f"{rng.getrandbits(128):032x}",
+        "instanceTenantId": "5d8f3f9ef5c4dc004c5a6b4e",
+        "description": "Cisco IOS Software [Cupertino], Catalyst L3 "
+                       "Switch Software (CAT9K_IOSXE), Version 17.9.4a",
+    } for number in range(500)]
+    prime = [{"devicesDTO": {
+        "@displayName": str(number),
+        "@id": number,
+        "adminStatus": "MANAGED",
+        "clearedAlarms": rng.randrange(50),
+        "collectionDetail": "<status><general code=\"SUCCESS\"/></status>",
+        "collectionTime": "2026-10-19T10:12:44.125Z",
+        "creationTime": "2026-01-07T08:00:11.512Z",
+        "criticalAlarms": 0,
+        "deviceId": 1000000 + number,
+        "deviceName": f"bench-{number:06d}",
+        "deviceType": "Cisco 4451 Integrated Services Router",
+        "informationAlarms": rng.randrange(5),
+        "ipAddress": ip_address(number),
+        "location": f"Building {rng.randrange(40)}",
+        "majorAlarms": 0,
+        "managementStatus": "MANAGED_AND_SYNCHRONIZED",
+        "minorAlarms": rng.randrange(3),
+        "productFamily": "Routers",
+        "reachability": "REACHABLE",
+        "softwareType": "IOS-XE",
+        "softwareVersion": "17.9.4a",
+        "warningAlarms": rng.randrange(3),
+    }} for number in range(1000)]
+    apic = [{"topSystem": {"attributes": {
+        "address": ip_address(number),
+        "bootstrapState": "done",
+        "childAction": "",
+        "configIssues": "",
+        "controlPlaneMTU": "9000",
+        "currentTime": "2026-10-19T10:12:44.125+00:00",
+        "dn": f"topology/pod-1/node-{101 + number}/sys",
+        "enforceSubnetCheck": "no",
+        "etepAddr": "0.0.0.0",
+        "fabricDomain": "ACI Fabric1",
+        "fabricId": "1",
+        "fabricMAC": "00:22:BD:F8:19:FF",
+        "id": str(101 + number),
+        "inbMgmtAddr": "0.0.0.0",
+        "lastRebootTime": "2026-06-01T03:04:05.000+00:00",
+        "lastResetReason": "unknown",
+        "lcOwn": "local",
+        "modTs": "2026-10-19T10:12:44.125+00:00",
+        "mode": "unspecified",
+        "monPolDn": "uni/fabric/monfab-default",
+        "name": f"leaf-{101 + number}",
+        "nodeType": "unspecified",
+        "oobMgmtAddr": ip_address(65536 + number),
+        "podId": "1",
+        "remoteNetworkId": "0",
+        "remoteNode": "no",
+        "role": rng.choice(("leaf", "spine")),
+        "serial": f"FDO{rng.randrange(10**8):08d}",
+        "siteId": "0",
+        "state": "in-service",
+        "status": "",
+        "systemUpTime": f"{rng.randrange(400):03d}:04:05:06.000",
+        "tepPool": "10.0.0.0/16",
+        "unicastXrEpLearnDisable": "no",
+        "version": "n9000-16.0(3e)",
+        "virtualMode": "no",
+    }}} for number in range(1000)]
+    return {
+        "DNA Center page (500)": json.dumps({"response": dnac,
+                                             "version": "1.0"}),
+        "Prime Infra page (1000)": json.dumps({"queryResponse": {
+            "@last": 999, "@first": 0, "@count": 25000,
+            "@type": "Devices", "@requestUrl": "https://pi/webacs/api/v4/"
+            "data/Devices?.full=true", "entity": prime}}),
+        "APIC page (1000)": json.dumps({"totalCount": "25000",
+                                        "imdata": apic}),
+    }
+
+
+def codec_benchmark(options):
+    """Time the JSONCodec backends on realistic payloads
+
+    Compares each installed backend parsing the payload bytes with the
+    previous code path, json.loads of the decoded string.
+
+    :param options: argparse namespace
+    :returns: list of dictionaries of results
+    """
+    import JSONCodec
+
+    payloads = {}
+    for devices in options.devices:
+        ip_addresses = [device[1] for device in
+                        synthetic_inventory(devices, options.seed)]
+        payloads[f"fping output ({devices})"] = \
+            synthetic_fping(ip_addresses, seed=options.seed)
+    for name, text in synthetic_api_pages(options.seed).items():
+        payloads[name] = text.encode("utf-8")
+
+    def best(function):
+        timer = timeit.Timer(function)
+        (number, _) = timer.autorange()
+        return min(timer.repeat(repeat=5, number=number)) / number
+
+    results = []
+    print(f"JSON backends installed: {', '.join(JSONCodec.available())}")
+    print(f"  {'payload':26} {'KB':>7} {'backend':15} {'loads ms':>9} "
+          f"{'dumps ms':>9} {'speed-up':>8}")
+    for name, data in payloads.items():
+        document = json.loads(data)
+        baseline = best(lambda: json.loads(data.decode("utf-8")))
+        rows = [("json (str)", baseline,
+                 best(lambda: json.dumps(document)))]
+        for backend in JSONCodec.available():
+            JSONCodec.use(backend)
+            rows.append((backend, best(lambda: JSONCodec.loads(data)),
+                         best(lambda: JSONCodec.dumps(document))))
+        for (backend, loads_s, dumps_s) in rows:
+            print(f"  {name:26} {len(data) / 1024:7.0f} {backend:15} "
+                  f"{loads_s * 1000:9.2f} {dumps_s * 1000:9.2f} "
+                  f"{baseline / loads_s:7.1f}x")
+            results.append({"payload": name, "bytes": len(data),
+                            "backend": backend,
+                            "loads_s": round(loads_s, 6),
+                            "dumps_s": round(dumps_s, 6)})
+    JSONCodec.use()
+    return results
+
+
+def parse_importtime(output):
+    """Parse the report of python -X importtime
+
+    :param output: string of the interpreter's stderr
+    :returns: list of (module, depth, self us, cumulative us) tuples,
+        in completion order - every module after its own imports
+    """
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        (self_us, cumulative_us, name) = line[12:].split("|")
+        if not self_us.strip().isdigit():
+            continue  # the header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), depth, int(self_us),
+                        int(cumulative_us)))
+    return entries
+
+
+def import_tree(entries, module):
+    """Entries of a top level import and everything it imported
+
+    :param entries: list of parse_importtime() tuples
+    :param module: string of the top level module name
+    :returns: list of tuples, ending with the module itself; empty when
+        the module is not in the report
+    """
+    start = 0
+    for (index, (name, depth, _, _)) in enumerate(entries):
+        if depth == 0:
+            if name == module:
+                return entries[start:index + 1]
+            start = index + 1
+    return []
+
+
+def startup_times(module, script_dir, runs, fast_start=False):
+    """Median import and config read time of a module
+
+    :param module: string of the module name
+    :param script_dir: string of the directory holding the scripts and
+        optionsconfig.yaml
+    :param runs: integer number of fresh interpreters to time
+    :param fast_start: boolean; run with GetEnv's fast-start mode
+    :returns: (import seconds, config seconds)
+    """
+    env = dict(os.environ, PYTHONPATH=script_dir)
+    env.pop("DDCAM_FAST_START", None)
+    if fast_start:
+        env["DDCAM_FAST_START"] = "1"
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-c", STARTUP_PROBE.format(module=module)],
+            capture_output=True, text=True, cwd=script_dir, env=env)
+        if completed.returncode != 0:
+            sys.exit(f"Importing {module} failed:\n{completed.stderr}")
+        samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return tuple(sorted(sample[i] for sample in samples)[len(samples) // 2]
+                 for i in range(2))
+
+
+def startup_report(options):
+    """Report the start-up cost of the cron entry points
+
+    Every module is imported in a fresh interpreter under
+    'python -X importtime'; the report sums the time by direct import
+    and by top level package, then times the import followed by reading
+    every optionsconfig.yaml section, with and without fast-start mode
+    (the first fast-start run writes the cache).
+
+    :param options: argparse namespace
+    :returns: list of dictionaries of results
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for module in options.import_time or STARTUP_SCRIPTS:
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, cwd=script_dir,
+            env=dict(os.environ, PYTHONPATH=script_dir))
+        if completed.returncode != 0:
+            sys.exit(f"Importing {module} failed:\n{completed.stderr}")
+        tree = import_tree(parse_importtime(completed.stderr), module)
+        if not tree:
+            sys.exit(f"No import time reported for {module}")
+        direct = sorted(((cumulative, name) for (name, depth, _, cumulative)
+                         in tree if depth == 1), reverse=True)
+        packages = {}
+        for (name, _, self_us, _) in tree:
+            package = name.split(".")[0]
+            packages[package] = packages.get(package, 0) + self_us
+
+        (import_s, config_s) = startup_times(module, script_dir,
+                                             options.startup_runs)
+        startup_times(module, script_dir, 1, fast_start=True)
+        (_, fast_config_s) = startup_times(module, script_dir,
+                                           options.startup_runs,
+                                           fast_start=True)
+        total_ms = tree[-1][3] / 1000
+        print(f"{module}: imports {total_ms:.1f} ms in {len(tree)} "
+              f"modules; median of {options.startup_runs} runs: import "
+              f"{import_s * 1000:.1f} ms, config {config_s * 1000:.1f} ms "
+              f"(fast-start {fast_config_s * 1000:.1f} ms)")
+        print(f"  {'direct import':34} {'cumulative ms':>13}")
+        for (cumulative, name) in direct[:STARTUP_TOP]:
+            print(f"  {name:34} {cumulative / 1000:13.1f}")
+        print(f"  {'package':34} {'self ms':>13}")
+        for (package, self_us) in sorted(packages.items(),
+                                         key=lambda item: -item[1]
+                                         )[:STARTUP_TOP]:
+            print(f"  {package:34} {self_us / 1000:13.1f}")
+        results.append({"module": module, "import_ms": round(total_ms, 1),
+                        "modules": len(tree),
+                        "import_s": round(import_s, 6),
+                        "config_s": round(config_s, 6),
+                        "fast_start_config_s": round(fast_config_s, 6),
+                        "packages_ms": {package: round(self_us / 1000, 1)
+                                        for (package, self_us)
+                                        in packages.items()}})
+    return results
+
+
+def load_inventory(serverparams, inventory):
+    """Replace the inventory and pingresults tables with inventory
+
+    :param serverparams: dictionary of database parameters
+    :param inventory: list of inventory tuples from synthetic_inventory
+    :returns: None
+    """
+    import DBConnect
+
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+    cursor.execute(f"DELETE FROM {serverparams['database']}.pingresults")
+    cursor.execute(f"DELETE FROM {serverparams['database']}.inventory")
+    cursor.executemany(f"""INSERT INTO {serverparams['database']}.inventory
+      (hostname, mgmt_ip_address, device_type, device_group, source,
+      do_ping)
+      VALUES (%s, %s, %s, %s, %s, %s)""", inventory)
+    db.commit()
+    cursor.close()
+    db.close()
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_single(options):
+    """Benchmark one device count
+
+    Runs in a fresh process (see main); prints the result record as
+    JSON on stdout.
+
+    :param options: argparse namespace
+    :returns: dictionary result record
+    """
+    import DBConnect
+    import GetEnv
+
+    if options.backend == "mysql":
+        serverparams = dict(GetEnv.getparam("MySQL"))
+        serverparams["database"] = options.mysql_database
+    workdir = tempfile.mkdtemp(prefix="ddcam-bench-")
+    os.chdir(workdir)
+    if options.backend == "sqlite":
+        serverparams = {"engine": "sqlite", "database": "devnet_dashboards",
+                        "path": options.sqlite_file
+                        or os.path.join(workdir, "bench.sqlite")}
+        DBConnect.create_sqlite_schema(serverparams)
+
+    import PingAndUpdateInventory
+    import CreateAvailabilityDashboard
+    import JSONCodec
+
+    devices = options.single
+    inventory = synthetic_inventory(devices, options.seed)
+    load_inventory(serverparams, inventory)
+    ip_addresses = [device[1] for device in inventory]
+    threshold = 15
+    dashboard_location = os.path.join(workdir, "html", "availability.html")
+    statsparams = {"StateFile": os.path.join(workdir, "latencystats.npz")}
+    stateparams = {"StateFile": os.path.join(workdir, "devicestate.npz"),
+                   "DownThreshold": 3, "UpThreshold": 2}
+
+    stages = {}
+    stats_match = True
+
+    def timed(stage, function, *args):
+        DBConnect.reset_stats()
+        start = time.perf_counter()
+        result = function(*args)
+        wall = time.perf_counter() - start
+        entry = stages.setdefault(stage, {"wall_s": [], "round_trips": 0})
+        entry["wall_s"].append(wall)
+        entry["round_trips"] = DBConnect.stats["round_trips"]
+        entry["peak_rss_kb"] = peak_rss_kb()
+        return result
+
+    for cycle in range(options.cycles):
+        fping_output = synthetic_fping(ip_addresses, cycle, seed=options.seed)
+        devicelist = timed("get_mysql_devicelist",
+                           PingAndUpdateInventory.get_mysql_devicelist,
+                           serverparams)
+        timed("write_pingfile", PingAndUpdateInventory.write_to_file,
+              devicelist)
+        sqldata_down, sqldata_up = timed(
+            "convert_json_to_sqldata",
+            PingAndUpdateInventory.convert_json_to_sqldata, fping_output)
+        sqldata_down, sqldata_up = timed(
+            "add_latency_stats", PingAndUpdateInventory.add_latency_stats,
+            statsparams, devicelist, sqldata_down, sqldata_up)
+        sqldata_down, sqldata_up = timed(
+            "add_device_state", PingAndUpdateInventory.add_device_state,
+            stateparams, devicelist, sqldata_down, sqldata_up)
+        sqldata_down, sqldata_up = timed(
+            "add_probe_type", PingAndUpdateInventory.add_probe_type, {},
+            sqldata_down, sqldata_up)
+        sqldata_down, sqldata_up = timed(
+            "add_poller", PingAndUpdateInventory.add_poller, None,
+            sqldata_down, sqldata_up)
+        timed("insupd_mysql_pingresults_down",
+              PingAndUpdateInventory.insupd_mysql_pingresults,
+              serverparams, "down", sqldata_down)
+        timed("insupd_mysql_pingresults_up",
+              PingAndUpdateInventory.insupd_mysql_pingresults,
+              serverparams, "up", sqldata_up)
+        results_list = timed("get_mysql_pingresults",
+                             CreateAvailabilityDashboard.get_mysql_pingresults,
+                             serverparams)
+        stats = timed("get_poll_stats",
+                      CreateAvailabilityDashboard.get_poll_stats,
+                      serverparams, threshold, True)
+        # A repeated read of the same cycle, served by the QueryCache
+        #  with the generation published to its CacheDir
+        queryparams = {"Enabled": True,
+                       "CacheDir": os.path.join(workdir, "query_cache")}
+        CreateAvailabilityDashboard.get_mysql_pingresults(serverparams,
+                                                          queryparams)
+        timed("get_mysql_pingresults_cached",
+              CreateAvailabilityDashboard.get_mysql_pingresults,
+              serverparams, queryparams)
+        # Row-at-a-time classification, as before classify_columns
+        timed("classify_endpoint",
+              lambda: [CreateAvailabilityDashboard.classify_endpoint(
+                  endpoint, threshold, True) for endpoint in results_list])
+        columns = timed("rows_to_columns",
+                        CreateAvailabilityDashboard.rows_to_columns,
+                        results_list)
+        order, classes, columns_stats = timed(
+            "classify_columns",
+            CreateAvailabilityDashboard.classify_columns, columns,
+            threshold, True)
+        stats_match = stats_match and columns_stats == tuple(stats)
+        results_list = [results_list[index] for index in order.tolist()]
+        timed("generate_htmlcells",
+              CreateAvailabilityDashboard.generate_htmlcells,
+              results_list, threshold, True, classes)
+        timed("publish_dashboards",
+              CreateAvailabilityDashboard.publish_dashboards,
+              dashboard_location, results_list, stats, threshold, True,
+              CreateAvailabilityDashboard.DEFAULT_MAX_CELLS_PER_PAGE,
+              classes)
+
+    for entry in stages.values():
+        walls = sorted(entry.pop("wall_s"))
+        entry["wall_s"] = round(walls[len(walls) // 2], 6)
+        entry["wall_s_min"] = round(walls[0], 6)
+
+    return {"timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "label": options.label,
+            "backend": options.backend,
+            "devices": devices,
+            "cycles": options.cycles,
+            "python": platform.python_version(),
+            "json_backend": JSONCodec.backend,
+            "host": platform.node(),
+            "peak_rss_kb": peak_rss_kb(),
+            "stats_match": stats_match,
+            "total_wall_s": round(sum(entry["wall_s"]
+                                      for entry in stages.values()), 6),
+            "stages": stages}
+
+
+def load_results(filename, label=None):
+    """Load benchmark results
+
+    :param filename: string of a results JSON-lines file
+    :param label: optional string; only records with this label
+    :returns: dictionary of device count to the latest result record
+    """
+    results = {}
+    with open(filename, "r") as infile:
+        for line in infile:
+            if line.strip():
+                record = json.loads(line)
+                if label is None or record.get("label") == label:
+                    results[record["devices"]] = record
+    return results
+
+
+def compare(baseline_file, current_file, tolerance, label=None):
+    """Compare two benchmark runs
+
+    :param baseline_file: string of the baseline results file
+    :param current_file: string of the current results file
+    :param tolerance: float percentage slow-down tolerated per stage
+    :param label: optional string; only compare records with this label
+    :returns: integer number of regressed stages
+    """
+    baseline = load_results(baseline_file, label)
+    current = load_results(current_file, label)
+    regressions = 0
+    if not set(baseline) & set(current):
+        print("No device counts in common to compare" +
+              (f" for label '{label}'" if label is not None else ""))
+    for devices in sorted(set(baseline) & set(current)):
+        print(f"\n{devices} devices "
+              f"({baseline[devices]['backend']} -> "
+              f"{current[devices]['backend']})")
+        print(f"  {'stage':34} {'base s':>10} {'now s':>10} {'delta':>8}"
+              f" {'trips':>9}")
+        for stage, now in current[devices]["stages"].items():
+            base = baseline[devices]["stages"].get(stage)
+            if base is None:
+                print(f"  {stage:34} {'-':>10} {now['wall_s']:10.4f}")
+                continue
+            delta = (now["wall_s"] - base["wall_s"]) \
+                / max(base["wall_s"], 1e-9) * 100
+            flag = ""
+            # Ignore noise on stages that take under a millisecond
+            if delta > tolerance and now["wall_s"] > 0.001:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"  {stage:34} {base['wall_s']:10.4f} "
+                  f"{now['wall_s']:10.4f} {delta:+7.1f}% "
+                  f"{base['round_trips']:>4}/{now['round_trips']:<4}{flag}")
+        print(f"  peak RSS {baseline[devices]['peak_rss_kb']} KB -> "
+              f"{current[devices]['peak_rss_kb']} KB")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the poll-to-dashboard pipeline with "
+                    "synthetic devices")
+    parser.add_argument("--devices", type=int, nargs="+",
+                        default=DEFAULT_SIZES,
+                        help="inventory sizes to benchmark")
+    parser.add_argument("--cycles", type=int, default=3,
+                        help="poll cycles per size; median time is kept")
+    parser.add_argument("--backend", choices=("sqlite", "mysql"),
+                        default="sqlite")
+    parser.add_argument("--sqlite-file",
+                        help="SQLite database file (default: temporary)")
+    parser.add_argument("--mysql-database",
+                        help="dedicated MySQL benchmark database; its "
+                             "inventory and pingresults are overwritten")
+    parser.add_argument("--results", default=DEFAULT_RESULTS,
+                        help="JSON-lines file results are appended to")
+    parser.add_argument("--label", default="",
+                        help="label stored with the results, eg. a git "
+                             "commit; with --compare, only records with "
+                             "this label are compared")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", nargs=2,
+                        metavar=("BASELINE", "CURRENT"),
+                        help="compare two results files and exit")
+    parser.add_argument("--tolerance", type=float, default=10.0,
+                        help="percent slow-down per stage flagged as a "
+                             "regression by --compare")
+    parser.add_argument("--json-codecs", action="store_true",
+                        help="time the JSON backends on fping output of "
+                             "--devices hosts and API pages, and exit")
+    parser.add_argument("--import-time", nargs="*", metavar="MODULE",
+                        help="report the start-up time of the entry "
+                             "points (default: %s) and exit"
+                             % " ".join(STARTUP_SCRIPTS))
+    parser.add_argument("--startup-runs", type=int, default=5,
+                        help="fresh interpreters timed per module by "
+                             "--import-time; the median is kept")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+
+    if options.compare:
+        regressions = compare(*options.compare, options.tolerance,
+                              options.label or None)
+        sys.exit(1 if regressions else 0)
+
+    if options.json_codecs:
+        codec_benchmark(options)
+        return
+
+    if options.import_time is not None:
+        startup_report(options)
+        return
+
+    if options.single is not None:
+        print(json.dumps(run_single(options)))
+        return
+
+    if options.backend == "mysql":
+        import GetEnv
+        if not options.mysql_database:
+            sys.exit("--mysql-database is required with --backend mysql")
+        if options.mysql_database == GetEnv.getparam("MySQL")["database"]:
+            sys.exit("Refusing to overwrite the production database "
+                     f"'{options.mysql_database}' - use a dedicated "
+                     "benchmark database")
+
+    results_file = os.path.abspath(options.results)
+    script = os.path.abspath(__file__)
+    for devices in options.devices:
+        print(f"Benchmarking {devices} devices "
+              f"({options.backend}, {options.cycles} cycles)...")
+        args = [sys.executable, script, "--single", str(devices),
+                "--cycles", str(options.cycles), "--backend",
+                options.backend, "--seed", str(options.seed), "--label",
+                options.label]
+        if options.sqlite_file:
+            args += ["--sqlite-file", os.path.abspath(options.sqlite_file)]
+        if options.mysql_database:
+            args += ["--mysql-database", options.mysql_database]
+        completed = subprocess.run(args, capture_output=True, text=True,
+                                   cwd=os.path.dirname(script),
+                                   env=dict(os.environ,
+                                            PYTHONPATH=os.path.dirname(script)))
+        if completed.returncode != 0:
+            sys.exit(f"Benchmark of {devices} devices failed:\n"
+                     f"{completed.stderr}")
+        record = json.loads(completed.stdout.strip().splitlines()[-1])
+        with open(results_file, "a") as outfile:
+            outfile.write(json.dumps(record) + "\n")
+        for stage, entry in record["stages"].items():
+            print(f"  {stage:34} {entry['wall_s']:10.4f} s "
+                  f"{entry['round_trips']:4} round trips")
+        print(f"  total {record['total_wall_s']:.3f} s, peak RSS "
+              f"{record['peak_rss_kb']} KB")
+        if not record["stats_match"]:
+            print("  WARNING: classify_columns poll stats differ from "
+                  "get_poll_stats")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,51 +17,197 @@ Required inputs/variables:
     None
 
 Outputs:
-    Puts 'availability.html' in the Apache web docs directory, 
-        typically, /var/www/html
+    Puts 'availability.html' summary page in the Apache web docs
+        directory, typically, /var/www/html, with links to the
+        'availability-problems*.html', 'availability-group-*.html' and
+        'availability-source-*.html' pages next to it
+    Also puts pre-compressed 'availability.html.gz' (and
+        'availability.html.br' when the optional brotli package is
+        installed), a 'manifest.json' of content-hash ETags and a
+        'status.json' of the generation time in the same directory.
+        The directory is a symbolic link to the latest release in
+        '.<directory>-releases' next to it, switched once per run
 
 Version log:
 v1      2021-0702   Published to DevNet Automation Exchange
 v2      2023-0628   Change ReadEnvironmentVars to GetEnv; fix reset code
+v3      2026-1019   Optional p95 latency for latent classification
+v4      2026-1019   Flapping state and hysteresis from pingresults state
+v5      2026-1019   Pre-compressed .gz/.br siblings and ETag manifest
+v6      2026-1019   Summary page plus bounded per-group, per-source and
+    problems-only pages; only changed pages are regenerated
+v7      2026-1019   Database connections through DBConnect (MySQL or
+    SQLite)
+v8      2026-1019   Per-stage timing metrics
+v9      2026-1019   --profile option (cProfile, stack sampling,
+    tracemalloc)
+v10     2026-1019   In-memory poll stats and ordering for the
+    Orchestrator
+v11     2026-1019   Renders from the StateCache snapshot when fresh,
+    falling back to MySQL
+v12     2026-1019   Vectorized classification, ordering and poll
+    stats (classify_columns)
+v13     2026-1019   Reads MySQL rather than the snapshot when pollers
+    are sharded
+v14     2026-1019   Shows the poller that measured each device; reads
+    MySQL when regional pollers are enabled
+v15     2026-1019   Devices left unprobed by a poll cycle are shown
+    faded, marked stale
+v16     2026-1019   Shows the probe type of devices not checked by ICMP
+v17     2026-1019   Pages subscribe to the LiveUpdates service events
+    when Dashboard LiveURL is set; cells carry their device IP
+v18     2026-1019   Down children of down parents (Topology) are grouped
+    into their parent's cell on the summary and problems pages
+v19     2026-1019   get_mysql_pingresults and get_poll_stats results are
+    cached until the next committed cycle (QueryCache)
+v20     2026-1019   The summary page is rewritten every run so its
+    generation time stays current; view pages show when they last
+    changed
+v21     2026-1019   Views whose names differ only in case or punctuation
+    get distinct page names; MaxCellsPerPage must be a positive integer
+v22     2026-1019   Every run is published as one release of the
+    directory, switched by a symbolic link; unchanged pages, the summary
+    included, keep their file and ETag and show the generation time
+    from status.json
+v23     2026-1019   Groups outages with the Topology parent map saved
+    with a fresh StateCache snapshot, querying the inventory only
+    without one
+v24     2026-1019   get_poll_stats is no longer cached; the renderer
+    counts the stats from the cached ping results
 
 Credits:
 """
 
 __filename__ = 'CreateAvailabilityDashboard.py'
-__version__ = '2'
+__version__ = '24'
 __author__ = 'Jason Davis - jadavis@cisco.com'
 __license__ = "Cisco Sample Code License, Version 1.1 - "\
     "https://developer.cisco.com/site/license/cisco-sample-code-license/"
 
 
 import sys
-import MySQLdb
+import DBConnect
 from datetime import datetime
 import os
+import time
+import shutil
+import gzip
+import hashlib
+import json
+import re
+import html
+import math
+from fractions import Fraction
+import numpy as np
+import FlapDetection
 import GetEnv
+import Metrics
+import Profiling
+import StateCache
+import ShardLeases
+import RegionalPollers
+import Topology
+import QueryCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 ### Script-global variables
 # Maximum number of cells wide on dashboard; may need to be adjusted
 #  for larger monitors
 MAX_CELLS_WIDE = 10
+# Manifest of published pages and their ETags, kept next to the pages
+MANIFEST_FILE = "manifest.json"
+# Time of the latest run, fetched by the pages so that unchanged pages
+#  needn't be rewritten
+STATUS_FILE = "status.json"
+# Maximum number of device cells per dashboard page; larger views are
+#  split across numbered pages
+DEFAULT_MAX_CELLS_PER_PAGE = 1000
+PROBLEM_CLASSES = ("down", "flapping", "dropped", "latent")
+# Endpoint classes by classify_columns class code
+CLASS_NAMES = ("good", "latent", "dropped", "down", "flapping")
+STATE_CODES = {name: code for code, name in
+               enumerate(FlapDetection.STATE_NAMES)}
+# Recolors the cells and counts from the LiveUpdates.py events; the
+#  'state' and 'delta' events carry [class, stale, ...] per device IP
+LIVE_SCRIPT = """    <script>
+      (function () {
+        var source = new EventSource(LIVE_URL);
+        function apply(event) {
+          var update = JSON.parse(event.data);
+          for (var ip in update.devices) {
+            var cell = document.querySelector('td[data-ip="' + ip + '"]');
+            if (cell) {
+              var device = update.devices[ip];
+              cell.className = device[0] + (device[1] ? " stale" : "") +
+                (cell.dataset.children ? " grouped" : "");
+              cell.title = "Updated " + new Date().toLocaleTimeString();
+            }
+          }
+          for (var name in update.stats) {
+            var count = document.getElementById("stat-" + name);
+            if (count) { count.textContent = update.stats[name]; }
+          }
+        }
+        source.addEventListener("state", apply);
+        source.addEventListener("delta", apply);
+      })();
+    </script>
+"""
+# Shows the generation time of the latest run from STATUS_FILE
+STATUS_SCRIPT = """    <script>
+      (function () {
+        function update() {
+          fetch("STATUS_URL", {cache: "no-cache"})
+            .then(function (response) { return response.json(); })
+            .then(function (status) {
+              document.getElementById("generated").textContent =
+                status.generated;
+            })
+            .catch(function () {});
+        }
+        update();
+        setInterval(update, 60000);
+      })();
+    </script>
+"""
 
 
-def get_mysql_pingresults(serverparams):
+def get_mysql_pingresults(serverparams, queryparams=None):
     """Get MySQL Ping results
     
     Connects to MySQL datbase with inventory and pingresults tables to 
     extract hostname, IP and stats.
 
     :param serverparams: dictionary containing settings of the MySQL server [eg. host, database name, username, password,  etc.]
+    :param queryparams: dictionary of QueryCache settings or None; when
+        enabled, the results are reused until the next committed cycle
+    :returns: list of devices pinged and their results
+    """
+
+    # A copy, so callers can't change the cached list
+    return list(QueryCache.read_through(
+        queryparams, serverparams, "pingresults", (),
+        lambda: query_pingresults(serverparams)))
+
+
+def query_pingresults(serverparams):
+    """Query the ping results joined to the inventory
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
     :returns: list of devices pinged and their results
     """
 
-    db=MySQLdb.connect(host=serverparams["host"],user=serverparams["username"], 
-        passwd=serverparams["password"],db=serverparams["database"])
+    db=DBConnect.connect(serverparams)
 
     cursor=db.cursor()
     SQL = f"""SELECT i.hostname, p.mgmt_ip_address, p.reachable_pct, p.avg_latency, p.max_latency,
-      p.datetime_lastup, p.down_count FROM {serverparams["database"]}.pingresults as p 
+      p.datetime_lastup, p.down_count, p.p95_latency, p.state, p.flap_score,
+      i.source, i.device_group, p.poller, p.stale, p.probe_type FROM {serverparams["database"]}.pingresults as p 
     LEFT JOIN inventory i on p.mgmt_ip_address = i.mgmt_ip_address
     ORDER BY p.reachable_pct ASC, p.down_count DESC, p.avg_latency DESC
     """
@@ -75,45 +221,53 @@ def get_mysql_pingresults(serverparams):
     return list(rows)
 
 
-def get_poll_stats(serverparams, latency_threshold):
+def get_poll_stats(serverparams, latency_threshold, use_p95=False):
     """Get poll stats
 
     Connects to MySQL database and extracts the statistics about 
-    device counts for up, latent, dropping and down devices.
+    device counts for up, latent, dropping, down and flapping devices.
+    Rows written before device state tracking (state is NULL) fall back
+    to down_count.
 
     :param serverparams: dictionary containing settings of the MySQL 
         server [eg. host, database name, username, password,  etc.]
     :param latency_threshold: integer value extracted from 
         optionsconfig.py parameters file.  Allows user to define custom
         threshold.
-    :returns: tuple of stats (up, dropping, latent and down device 
-        counts)
+    :param use_p95: boolean; count latent devices by their rolling
+        95th percentile latency (when known) instead of the average
+    :returns: tuple of stats (down, up, dropping, latent and flapping
+        device counts)
     """
 
-    db=MySQLdb.connect(host=serverparams["host"],
-                       user=serverparams["username"],
-                       passwd=serverparams["password"],
-                       db=serverparams["database"])
+    db=DBConnect.connect(serverparams)
 
     cursor=db.cursor()
     SQL_DOWN = f"""SELECT COUNT(mgmt_ip_address)
       FROM {serverparams["database"]}.pingresults
-      WHERE down_count > 0
+      WHERE state = 'down' OR (state IS NULL AND down_count > 0)
       """
 
     SQL_UP = f"""SELECT COUNT(mgmt_ip_address)
       FROM {serverparams["database"]}.pingresults
-      WHERE down_count = 0
+      WHERE state = 'good' OR (state IS NULL AND down_count = 0)
       """
 
     SQL_DROPPING = f"""SELECT COUNT(mgmt_ip_address)
       FROM {serverparams["database"]}.pingresults
-      WHERE reachable_pct < 100 AND reachable_pct > 0
+      WHERE reachable_pct < 100 AND (reachable_pct > 0 OR state = 'good')
+      """
+
+    SQL_FLAPPING = f"""SELECT COUNT(mgmt_ip_address)
+      FROM {serverparams["database"]}.pingresults
+      WHERE state = 'flapping'
       """
 
+    latency_column = "COALESCE(p95_latency, avg_latency)" if use_p95 \
+        else "avg_latency"
     SQL_LATENT = f"""SELECT COUNT(mgmt_ip_address)
       FROM {serverparams["database"]}.pingresults
-      WHERE avg_latency > {latency_threshold}
+      WHERE {latency_column} > {latency_threshold}
       """
 
     cursor.execute(SQL_DOWN)
@@ -128,6 +282,9 @@ def get_poll_stats(serverparams, latency_threshold):
     cursor.execute(SQL_LATENT)
     latentcount = cursor.fetchone()
 
+    cursor.execute(SQL_FLAPPING)
+    flapcount = cursor.fetchone()
+
     #print("Number of down devices: " + str(downcount[0]))
     #print("Number of up devices: " + str(upcount[0]))
     #print("Number of dropping devices: " + str(dropcount[0]))
@@ -136,10 +293,132 @@ def get_poll_stats(serverparams, latency_threshold):
     cursor.close()
     db.close()
 
-    return downcount[0], upcount[0], dropcount[0], latentcount[0]
+    return downcount[0], upcount[0], dropcount[0], latentcount[0], \
+        flapcount[0]
+
+
+def classify_endpoint(endpoint, threshold, use_p95=False):
+    """Classify endpoint
+
+    Classifies one ping result row as flapping, down, dropped, latent
+    or good - the CSS class of its dashboard cell.
+
+    :param endpoint: tuple of one ping result row from database
+    :param threshold: integer or floating point number representing
+       custom desired threshold
+    :param use_p95: boolean; classify latent devices by their rolling
+       95th percentile latency (when known) instead of the 3-packet
+       average
+    :returns: string of the endpoint class
+    """
+
+    latency = endpoint[3]
+    if use_p95 and endpoint[7] is not None:
+        latency = endpoint[7]
+    state = endpoint[8]
+    if state == "flapping":
+        return "flapping"
+    elif state == "down" or (state is None and
+                             (endpoint[2] == 0 or endpoint[2] == None)):
+        return "down"
+    elif endpoint[2] == None or endpoint[2] < 100:
+        # Includes devices failing for fewer cycles than the
+        # StateTracking DownThreshold
+        return "dropped"
+    elif latency > threshold:
+        return "latent"
+    else:
+        return "good"
+
+
+def rows_to_columns(in_results):
+    """Rows to columns
+
+    Builds the columns classify_columns works on from ping result rows,
+    with the NULL conventions of StateCache.DeviceSnapshot.
+
+    :param in_results: list of ping result rows from database
+    :returns: dictionary of column name to NumPy array
+    """
 
+    count = len(in_results)
+    null = StateCache.NULL_UINT8
+    return {
+        "reachable_pct": np.fromiter(
+            (null if row[2] is None else row[2] for row in in_results),
+            np.uint8, count),
+        "avg_latency": np.fromiter(
+            (np.nan if row[3] is None else row[3] for row in in_results),
+            np.float64, count),
+        "down_count": np.fromiter((row[6] for row in in_results),
+                                  np.int64, count),
+        "p95_latency": np.fromiter(
+            (np.nan if row[7] is None else row[7] for row in in_results),
+            np.float64, count),
+        "state": np.fromiter((STATE_CODES.get(row[8], null)
+                              for row in in_results), np.uint8, count),
+    }
+
+
+def classify_columns(columns, threshold, use_p95=False):
+    """Classify and order ping results in one vectorized pass
+
+    Columnar equivalent of classify_endpoint for every device, the
+    ORDER BY of get_mysql_pingresults and the counts of get_poll_stats.
+    Latencies are compared in whole hundredths of a millisecond, like
+    the decimal(7,2) columns in MySQL, so the counts match
+    get_poll_stats exactly.
+
+    :param columns: StateCache.DeviceSnapshot array, or dictionary from
+        rows_to_columns, of the ping results
+    :param threshold: integer or floating point number representing
+       custom desired threshold
+    :param use_p95: boolean; classify latent devices by their rolling
+       95th percentile latency (when known) instead of the average
+    :returns: order, classes, stats - array of row indexes in dashboard
+        order, list of endpoint classes in that order and tuple of
+        (down, up, dropping, latent, flapping) device counts
+    """
 
-def generate_htmlcells(in_results, threshold):
+    array = columns
+    pct = array["reachable_pct"].astype(np.int16)
+    pct_null = pct == StateCache.NULL_UINT8
+    state = array["state"]
+    state_null = state == StateCache.NULL_UINT8
+    down_count = array["down_count"].astype(np.int64)
+    avg = np.rint(array["avg_latency"].astype(np.float64) * 100)
+    latency = avg
+    if use_p95:
+        p95 = np.rint(array["p95_latency"].astype(np.float64) * 100)
+        latency = np.where(np.isnan(p95), avg, p95)
+    # NaN (NULL) latencies compare False, as NULL does in SQL
+    latent = latency > math.floor(Fraction(str(threshold)) * 100)
+
+    flapping = state == FlapDetection.FLAPPING
+    good_state = state == FlapDetection.GOOD
+    down = (state == FlapDetection.DOWN) | \
+        (state_null & (pct_null | (pct == 0)))
+    codes = np.select([flapping, down, pct_null | (pct < 100), latent],
+                      [4, 3, 2, 1], 0)
+
+    order = np.lexsort((np.where(np.isnan(avg), np.inf, -avg),
+                        -down_count,
+                        np.where(pct_null, -1, pct)))
+    classes = [CLASS_NAMES[code] for code in codes[order].tolist()]
+
+    stats = (
+        int(np.count_nonzero((state == FlapDetection.DOWN) |
+                             (state_null & (down_count > 0)))),
+        int(np.count_nonzero(good_state | (state_null & (down_count == 0)))),
+        int(np.count_nonzero(~pct_null & (pct < 100) &
+                             ((pct > 0) | good_state))),
+        int(np.count_nonzero(latent)),
+        int(np.count_nonzero(flapping)))
+    return order, classes, stats
+
+
+def generate_htmlcells(in_results, threshold, use_p95=False, classes=None,
+                       grouped=None):
     """Generate HTML cells
 
     Generate HTML cells by extracting incoming results and providing
@@ -148,37 +427,65 @@ def generate_htmlcells(in_results, threshold):
     :param in_results: dictionary containing ping results from database
     :param threshold: integer or floating point number representing
        custom desired threshold
+    :param use_p95: boolean; classify latent devices by their rolling
+       95th percentile latency (when known) instead of the 3-packet
+       average
+    :param classes: optional list of endpoint classes aligned with
+       in_results, as returned by classify_endpoint
+    :param grouped: optional dictionary of IP: number of down devices
+       grouped into the device's cell, from Topology.group_outages
     :returns: string of table cells rendered as HTML
     """
 
+    grouped = grouped or {}
     tablecells = ""
     for count, endpoint in enumerate(in_results, start=1):
         # print(endpoint)
         # print(endpoint[3])
         # print(type(endpoint[3]))
-        if endpoint[2] == 0 or endpoint[2] == None:
-            cellhtml = f"""<td class="down">{endpoint[0]}<br>
-        {endpoint[1]}<br>
-        {str(endpoint[2])}%<br>
-        Downcount {endpoint[6]} / Downsince {endpoint[5]}
-        </td>
-        """
-        elif endpoint[2] < 100 and endpoint[2] > 0:
-            cellhtml = f"""<td class="dropped">{endpoint[0]}<br>
+        if classes is None:
+            endpointclass = classify_endpoint(endpoint, threshold, use_p95)
+        else:
+            endpointclass = classes[count - 1]
+        p95 = ""
+        if endpoint[7] is not None:
+            p95 = f" / p95 {str(endpoint[7])} ms"
+        notes = ""
+        if endpoint[14] and endpoint[14] != "icmp":
+            notes += f"<br>\n        Probe {endpoint[14]}"
+        if endpoint[12]:
+            notes += f"<br>\n        Poller {endpoint[12]}"
+        stale = ""
+        if endpoint[13]:
+            # Previous results, the last cycle ran out of time before
+            #  probing this device
+            stale = " stale"
+            notes += "<br>\n        Stale - not probed last cycle"
+        children = ""
+        if endpoint[1] in grouped:
+            # Root cause of an outage; its down children aren't shown
+            stale += " grouped"
+            children = f' data-children="{grouped[endpoint[1]]}"'
+            notes += f"<br>\n        Outage - {grouped[endpoint[1]]} " \
+                "dependent devices down"
+        if endpointclass == "flapping":
+            cellhtml = f"""<td class="flapping{stale}" data-ip="{endpoint[1]}"{children}>{endpoint[0]}<br>
         {endpoint[1]}<br>
-        {str(endpoint[2])}% / avg {str(endpoint[3])} ms / max {str(endpoint[4])} ms
+        {str(endpoint[2])}% / flap score {endpoint[9]}<br>
+        Downcount {endpoint[6]} / Lastup {endpoint[5]}{notes}
         </td>
         """
-        elif endpoint[3] > threshold:
-            cellhtml = f"""<td class="latent">{endpoint[0]}<br>
+        elif endpointclass == "down":
+            cellhtml = f"""<td class="down{stale}" data-ip="{endpoint[1]}"{children}>{endpoint[0]}<br>
         {endpoint[1]}<br>
-        {str(endpoint[2])}% / avg {str(endpoint[3])} ms / max {str(endpoint[4])} ms
+        {str(endpoint[2])}%<br>
+        Downcount {endpoint[6]} / Downsince {endpoint[5]}{notes}
         </td>
         """
         else:
-            cellhtml = f"""<td class="good">{endpoint[0]}<br>
+            cellhtml = f"""<td class="{endpointclass}{stale}" data-ip="{endpoint[1]}"{children}>{endpoint[0]}<br>
         {endpoint[1]}<br>
-        {str(endpoint[2])}% / avg {str(endpoint[3])} ms / max {str(endpoint[4])} ms
+        {str(endpoint[2])}% / avg {str(endpoint[3])} ms / max {str(endpoint[4])} ms{p95}{notes}
         </td>
         """
         tablecells += cellhtml
@@ -188,20 +495,33 @@ def generate_htmlcells(in_results, threshold):
     return tablecells
 
 
-def generate_availability_dashboard(cells, downcount, upcount, dropcount, latentcount):
+def generate_availability_dashboard(cells, downcount, upcount, dropcount, latentcount,
+                                    flapcount=0, title="Availability Dashboard",
+                                    navigation="", live_url=""):
     """Generate Availability dashboard
 
     Takes in the HTML table cell information along with availability 
     statistics and generates final HTML page.
 
     :param cells: string representing HTML cell data
-    :param downcount, upcount, dropcount, latentcount: integer values
-      representing availability stats
+    :param downcount, upcount, dropcount, latentcount, flapcount: integer
+      values representing availability stats
+    :param title: string of the page heading
+    :param navigation: string representing HTML links/index shown
+      between the stats and the cells
+    :param live_url: optional string of the LiveUpdates service URL
+      (eg. /live); the page then recolors its cells and counts from
+      the service's events between refreshes
     :returns: htmltemplate - string representing final webpage to be
       published
     """
 
     gen_timestamp = datetime.now().strftime('%H:%M:%S %m-%d-%Y')
+    status_script = STATUS_SCRIPT.replace("STATUS_URL", STATUS_FILE)
+    live_script = ""
+    if live_url:
+        live_script = LIVE_SCRIPT.replace(
+            "LIVE_URL", json.dumps(live_url.rstrip("/") + "/events"))
 
     # Note with f-strings and HTML any styles should be escaped with
     # double braces {{}}
@@ -211,7 +531,7 @@ def generate_availability_dashboard(cells, downcount, upcount, dropcount, latent
     <meta http-equiv="content-type" content="text/html; charset=UTF-8">
     <meta http-equiv="refresh" content="300">
 
-    <title></title>
+    <title>{html.escape(title)}</title>
     <style>
         table {{ table-layout: fixed;
             overflow: hidden;}}
@@ -249,6 +569,18 @@ def generate_availability_dashboard(cells, downcount, upcount, dropcount, latent
             color: black;
             background-color: lime;}}
         
+        td.flapping {{ font-size: 10px;
+            color: white;
+            background-color: darkviolet;}}
+
+        td.stale {{ opacity: 0.5;}}
+
+        td.grouped {{ font-size: 12px;
+            font-weight: bold;
+            border: 3px solid white;}}
+
+        a {{ color: #ffffff;}}
+
         td.stats {{ font-size: 14px;
             color: black;
             background-color: white;
@@ -259,8 +591,8 @@ def generate_availability_dashboard(cells, downcount, upcount, dropcount, latent
     </style>
   </head>
   <body>
-    <h1>Availability Dashboard</h1>
-    <h4>Last generated: {gen_timestamp}</h4>
+    <h1>{html.escape(title)}</h1>
+    <h4>Last generated: <span id="generated">{gen_timestamp}</span></h4>
     <br>
     <table border="1" width="40%" cellspacing="2" cellpadding="2">
         <tbody class="center">
@@ -269,15 +601,18 @@ def generate_availability_dashboard(cells, downcount, upcount, dropcount, latent
                 <th>Latent</th>
                 <th>Dropping</th>
                 <th>Down</th>
+                <th>Flapping</th>
             </tr>
             <tr>
-                <td class="good">{upcount}</td>
-                <td class="latent">{latentcount}</td>
-                <td class="dropped">{dropcount}</td>
-                <td class="down">{downcount}</td>
+                <td class="good" id="stat-up">{upcount}</td>
+                <td class="latent" id="stat-latent">{latentcount}</td>
+                <td class="dropped" id="stat-dropping">{dropcount}</td>
+                <td class="down" id="stat-down">{downcount}</td>
+                <td class="flapping" id="stat-flapping">{flapcount}</td>
             <tr>
         </tbody>
     </table>
+    {navigation}
 
     <table border="1" width="100%" cellspacing="2" cellpadding="2">
       <tbody>
@@ -289,42 +624,514 @@ def generate_availability_dashboard(cells, downcount, upcount, dropcount, latent
       </tbody>
     </table>
     <br>
-  </body>
+{status_script}{live_script}  </body>
 </html>
     """
     return htmltemplate
 
 
-def write_to_file(dashboard_location, in_content):
+def max_cells_per_page(dashboardparams):
+    """Max cells per page
+
+    :param dashboardparams: dictionary of Dashboard settings from
+        optionsconfig.yaml or None
+    :returns: integer MaxCellsPerPage setting, or the default when unset;
+        exits with an error when it isn't a positive integer
+    """
+    max_cells = (dashboardparams or {}).get("MaxCellsPerPage",
+                                            DEFAULT_MAX_CELLS_PER_PAGE)
+    if isinstance(max_cells, bool) or not isinstance(max_cells, int) \
+            or max_cells <= 0:
+        sys.exit(f"Dashboard MaxCellsPerPage must be a positive integer, "
+                 f"not '{max_cells}'.  Check configuration in "
+                 f"optionsconfig.yaml")
+    return max_cells
+
+
+def view_slug(name):
+    """View slug
+
+    :param name: string of the group/source name
+    :returns: string of the name as used in page file names, eg. campus
+    """
+    return re.sub(r"[^a-z0-9_.]+", "_", name.lower()).strip("_") or "_"
+
+
+def view_filename(dashboard_location, kind, name="", page=1, unique=False):
+    """View filename
+
+    Builds the file name of one page of a dashboard view, next to the
+    summary page, eg. availability-group-campus-2.html
+
+    :param dashboard_location: string of the summary HTML file
+    :param kind: string of the view kind [eg. problems, group, source]
+    :param name: string of the group/source name, if any
+    :param page: integer page number, starting at 1
+    :param unique: boolean; append a short hash of the name, for names
+        sharing their slug with another view of the same kind
+    :returns: string of the page file path
+    """
+    base, extension = os.path.splitext(dashboard_location)
+    parts = [base, kind]
+    if name:
+        slug = view_slug(name)
+        if unique:
+            slug += "_" + hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+        parts.append(slug)
+    if page > 1:
+        parts.append(str(page))
+    return "-".join(parts) + extension
+
+
+def build_views(in_results, classes):
+    """Build views
+
+    Splits the ping results into the problems-only view and one view
+    per device_group and per source, keeping the result order.
+
+    :param in_results: list of ping result rows from database
+    :param classes: list of endpoint classes aligned with in_results
+    :returns: dictionary of (kind, name) to list of row indexes; the
+        problems view is always present, even when empty
+    """
+    views = {("problems", ""): []}
+    groups = {}
+    sources = {}
+    for index, (endpoint, endpointclass) in enumerate(zip(in_results,
+                                                          classes)):
+        if endpointclass in PROBLEM_CLASSES:
+            views[("problems", "")].append(index)
+        groups.setdefault(endpoint[11] or "Unassigned", []).append(index)
+        sources.setdefault(endpoint[10] or "Unknown", []).append(index)
+    for name in sorted(groups):
+        views[("group", name)] = groups[name]
+    for name in sorted(sources):
+        views[("source", name)] = sources[name]
+    return views
+
+
+def count_classes(classes):
+    """Count classes
+
+    :param classes: iterable of endpoint classes
+    :returns: tuple of (down, up, dropping, latent, flapping) counts in
+        the order of the summary stats
+    """
+    counts = {"down": 0, "flapping": 0, "dropped": 0, "latent": 0,
+              "good": 0}
+    for endpointclass in classes:
+        counts[endpointclass] += 1
+    up = counts["good"] + counts["latent"] + counts["dropped"]
+    return counts["down"], up, counts["dropped"], counts["latent"], \
+        counts["flapping"]
+
+
+def page_etag(fingerprint):
+    """Page ETag
+
+    :param fingerprint: string identifying the page contents
+    :returns: string of the content-hash ETag recorded in the manifest
+    """
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:32]
+
+
+def generate_navigation(dashboard_location, pagenames, page):
+    """Generate navigation
+
+    :param dashboard_location: string of the summary HTML file
+    :param pagenames: list of the file names of all pages of the view
+    :param page: integer number of the current page, starting at 1
+    :returns: string of HTML links to the summary and adjacent pages
+    """
+    links = [f'<a href="{os.path.basename(dashboard_location)}">Summary</a>']
+    if page > 1:
+        links.append(f'<a href="{pagenames[page - 2]}">Previous</a>')
+    if page < len(pagenames):
+        links.append(f'<a href="{pagenames[page]}">Next</a>')
+    links.append(f'Page {page} of {len(pagenames)}')
+    return "<h4>" + " | ".join(links) + "</h4>"
+
+
+def generate_view_index(view_index):
+    """Generate view index
+
+    :param view_index: list of (title, pagename, device count, counts)
+        tuples, counts as returned by count_classes
+    :returns: string of an HTML table linking to every view
+    """
+    rows = ""
+    for title, pagename, devices, counts in view_index:
+        downcount, upcount, dropcount, latentcount, flapcount = counts
+        rows += f"""<tr>
+                <td><a href="{pagename}">{html.escape(title)}</a></td>
+                <td>{devices}</td>
+                <td class="latent">{latentcount}</td>
+                <td class="dropped">{dropcount}</td>
+                <td class="down">{downcount}</td>
+                <td class="flapping">{flapcount}</td>
+            </tr>
+            """
+    return f"""<br>
+    <table border="1" width="60%" cellspacing="2" cellpadding="2">
+        <tbody class="center">
+            <tr>
+                <th>View</th>
+                <th>Devices</th>
+                <th>Latent</th>
+                <th>Dropping</th>
+                <th>Down</th>
+                <th>Flapping</th>
+            </tr>
+            {rows}
+        </tbody>
+    </table>"""
+
+
+def publish_dashboards(dashboard_location, in_results, stats, threshold,
+                       use_p95=False,
+                       max_cells=DEFAULT_MAX_CELLS_PER_PAGE, classes=None,
+                       live_url="", parents=None):
+    """Publish dashboards
+
+    Publishes the summary page (fleet stats, an index of all views and
+    the first page of problem devices) plus the problems-only, per
+    device_group and per source views, each split into pages of at
+    most max_cells devices.  A page is only rendered and written when
+    its contents changed since the last run (per the manifest ETag);
+    the pages show the time of the latest run from status.json.  Pages
+    of views that no longer exist are removed.  The run is written to
+    a new release of the publishing directory and published as a whole
+    by commit_release.  With Topology
+    dependencies, the down devices whose parents are all down are left
+    out of the summary and problems pages and counted in the cell of
+    the device at the root of their outage instead; the device_group
+    and source views still show every device.
+
+    :param dashboard_location: string of the summary HTML file
+    :param in_results: list of ping result rows from database
+    :param stats: tuple of (down, up, dropping, latent, flapping)
+        counts from get_poll_stats
+    :param threshold: integer or floating point number representing
+       custom desired threshold
+    :param use_p95: boolean; classify latent devices by p95 latency
+    :param max_cells: integer maximum number of cells per page
+    :param classes: optional list of endpoint classes aligned with
+       in_results, eg. from classify_columns
+    :param live_url: optional string of the LiveUpdates service URL
+    :param parents: optional dictionary of child IP: tuple of parent
+       IPs, from Topology.dependencies
+    :returns: list of file names of the pages (re)published
+    """
+    if classes is None:
+        classes = [classify_endpoint(endpoint, threshold, use_p95)
+                   for endpoint in in_results]
+    views = build_views(in_results, classes)
+    outages = Topology.group_outages(in_results, classes, parents) \
+        if parents else {}
+    grouped = {root: len(indexes) for root, indexes in outages.items()}
+    collapsed = {index for indexes in outages.values() for index in indexes}
+    web_pub_path = os.path.dirname(dashboard_location)
+    release = begin_release(web_pub_path)
+    # The pages are written to the release, under their published names
+    dashboard_location = os.path.join(release,
+                                      os.path.basename(dashboard_location))
+    manifest = read_manifest(release)
+    # Names sharing a slug (eg. 'A B' and 'a_b') get hashed page names
+    slugs = {}
+    for kind, name in views:
+        slugs.setdefault((kind, view_slug(name)), []).append(name)
+    shared = {(kind, name) for (kind, _), names in slugs.items()
+              if len(names) > 1 for name in names}
+    published = []
+    current = {os.path.basename(dashboard_location)}
+    view_index = []
+
+    def publish(filename, rows, rowclasses, counts, title, navigation,
+                rowgroups=None):
+        fingerprint = f"{__version__}|{threshold}|{use_p95}|{title}|" \
+            f"{navigation}|{live_url}|{counts}|{rows!r}|{rowgroups!r}"
+        pagename = os.path.basename(filename)
+        current.add(pagename)
+        if manifest.get(pagename, {}).get("etag") == page_etag(fingerprint) \
+                and os.path.exists(filename):
+            return
+        cells = generate_htmlcells(rows, threshold, use_p95, rowclasses,
+                                   rowgroups)
+        dashboard = generate_availability_dashboard(cells, *counts,
+                                                    title=title,
+                                                    navigation=navigation,
+                                                    live_url=live_url)
+        if write_to_file(filename, dashboard, fingerprint):
+            published.append(pagename)
+
+    for (kind, name), indexes in views.items():
+        title = {"problems": "Problem devices",
+                 "group": f"Device group: {name}",
+                 "source": f"Source: {name}"}[kind]
+        shown = indexes
+        if kind == "problems" and collapsed:
+            shown = [index for index in indexes if index not in collapsed]
+        pages = [shown[start:start + max_cells]
+                 for start in range(0, len(shown), max_cells)] or [[]]
+        unique = (kind, name) in shared
+        pagenames = [os.path.basename(view_filename(dashboard_location,
+                                                    kind, name, page,
+                                                    unique))
+                     for page in range(1, len(pages) + 1)]
+        viewclasses = [classes[index] for index in indexes]
+        view_index.append((title, pagenames[0], len(indexes),
+                           count_classes(viewclasses)))
+        for page, pageindexes in enumerate(pages, start=1):
+            rows = [in_results[index] for index in pageindexes]
+            rowclasses = [classes[index] for index in pageindexes]
+            rowgroups = None
+            if kind == "problems":
+                rowgroups = {row[1]: grouped[row[1]] for row in rows
+                             if row[1] in grouped}
+            publish(view_filename(dashboard_location, kind, name, page,
+                                  unique),
+                    rows, rowclasses, count_classes(viewclasses), title,
+                    generate_navigation(dashboard_location, pagenames, page),
+                    rowgroups)
+        if kind == "problems":
+            summary_rows = [in_results[index] for index in pages[0]]
+            summary_classes = [classes[index] for index in pages[0]]
+            summary_groups = {row[1]: grouped[row[1]] for row in summary_rows
+                              if row[1] in grouped}
+
+    publish(dashboard_location, summary_rows, summary_classes, tuple(stats),
+            "Availability Dashboard", generate_view_index(view_index),
+            summary_groups)
+
+    # Remove pages of views that no longer exist
+    manifest = read_manifest(release)
+    removed = set(manifest) - current
+    for pagename in removed:
+        for suffix in ("", ".gz", ".br"):
+            filename = os.path.join(release, pagename + suffix)
+            if os.path.exists(filename):
+                os.remove(filename)
+        manifest.pop(pagename)
+    if removed:
+        atomic_write(os.path.join(release, MANIFEST_FILE),
+                     json.dumps(manifest, indent=2).encode("utf-8"))
+    atomic_write(os.path.join(release, STATUS_FILE), json.dumps(
+        {"generated": datetime.now().strftime('%H:%M:%S %m-%d-%Y')}
+    ).encode("utf-8"))
+    commit_release(web_pub_path, release)
+    return published
+
+
+def release_root(web_pub_path):
+    """Release root
+
+    :param web_pub_path: string of the dashboard publishing directory
+    :returns: string of the directory of its releases, next to it
+    """
+    (parent, name) = os.path.split(os.path.normpath(web_pub_path))
+    return os.path.join(parent, f".{name}-releases")
+
+
+def begin_release(web_pub_path):
+    """Begin release
+
+    Creates the next release of the publishing directory, holding hard
+    links to the files of the live release, so unchanged pages keep
+    their modification time and size - and the web server's ETag.
+
+    :param web_pub_path: string of the dashboard publishing directory
+    :returns: string of the new release directory
+    """
+    release = os.path.join(release_root(web_pub_path), str(time.time_ns()))
+    os.makedirs(release)
+    if os.path.isdir(web_pub_path):
+        for entry in os.scandir(web_pub_path):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                os.link(entry.path, os.path.join(release, entry.name))
+    return release
+
+
+def commit_release(web_pub_path, release):
+    """Commit release
+
+    Points the publishing directory - a symbolic link - at the release
+    in one rename, so the web server serves either all the pages,
+    compressed variants and manifest of the previous run or all of
+    this one.  A publishing directory that is still a plain directory
+    (eg. from an earlier version) is first moved into the releases.
+    Releases other than this one and the previous one, which may still
+    be serving requests, are removed.
+
+    :param web_pub_path: string of the dashboard publishing directory
+    :param release: string of the release from begin_release
+    :returns: None
+    """
+    web_pub_path = os.path.normpath(web_pub_path)
+    root = release_root(web_pub_path)
+    previous = None
+    if os.path.islink(web_pub_path):
+        previous = os.path.realpath(web_pub_path)
+    elif os.path.isdir(web_pub_path):
+        previous = os.path.realpath(os.path.join(root, "0"))
+        os.rename(web_pub_path, previous)
+    link = web_pub_path + ".tmp"
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.relpath(release, os.path.dirname(web_pub_path)), link)
+    os.replace(link, web_pub_path)
+
+    keep = {os.path.realpath(release), previous}
+    for entry in os.scandir(root):
+        if os.path.realpath(entry.path) not in keep:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def read_manifest(web_pub_path):
+    """Read manifest
+
+    Reads the manifest of published pages from the dashboard
+    publishing directory.
+
+    :param web_pub_path: string of the dashboard publishing directory
+    :returns: dictionary of page name to ETag/size details; empty if
+        there is no (readable) manifest yet
+    """
+    try:
+        with open(os.path.join(web_pub_path, MANIFEST_FILE), "r") as infile:
+            return json.load(infile)
+    except (OSError, ValueError):
+        return {}
+
+
+def atomic_write(filename, data):
+    """Atomic write
+
+    Writes bytes to a temporary file in the same directory and renames
+    it over the target, so the web server never serves a partial file.
+
+    :param filename: string of the file to publish
+    :param data: bytes to write
+    :returns: None
+    """
+    tmpfile = filename + ".tmp"
+    with open(tmpfile, "wb") as outfile:
+        outfile.write(data)
+    os.replace(tmpfile, filename)
+
+
+def write_to_file(dashboard_location, in_content, fingerprint=None):
     """Write to file
 
     Receive HTML content in and writes as file to dashboard publishing
-    location
+    location, along with pre-compressed .gz and .br (when brotli is
+    installed) siblings for Apache to serve as-is.  The ETag (content
+    hash) of the page is recorded in manifest.json.  A page whose ETag
+    is unchanged is not rewritten, so its modification time and the
+    web server's ETag stay the same and clients get 304 responses.
 
+    :param dashboard_location: string of the HTML file to publish
     :param in_content: string representing web page HTML
-    :returns: None; file is written to web hosting directory, typically
-        /var/www/html
+    :param fingerprint: optional string the ETag is computed from
+        instead of in_content, eg. the dashboard data without the
+        generation timestamp
+    :returns: boolean; True if the page was (re)published, False if it
+        was unchanged.  Files are written to web hosting directory,
+        typically /var/www/html
     """
     web_pub_path = os.path.dirname(dashboard_location) ## directory of file
     if not os.path.exists(web_pub_path):
         os.makedirs(web_pub_path)
-    with open(dashboard_location, "w") as outfile:
-        outfile.write(in_content)
 
+    content = in_content.encode("utf-8")
+    if fingerprint is None:
+        etag = hashlib.sha256(content).hexdigest()[:32]
+    else:
+        etag = page_etag(fingerprint)
+    manifest = read_manifest(web_pub_path)
+    pagename = os.path.basename(dashboard_location)
+    if manifest.get(pagename, {}).get("etag") == etag \
+            and os.path.exists(dashboard_location):
+        return False
+
+    artifacts = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        artifacts[".br"] = brotli.compress(content)
+    elif os.path.exists(dashboard_location + ".br"):
+        # Never leave a stale .br sibling for Apache to serve
+        os.remove(dashboard_location + ".br")
+
+    # Compressed siblings first, then the page, then the manifest
+    for suffix, data in artifacts.items():
+        atomic_write(dashboard_location + suffix, data)
+    atomic_write(dashboard_location, content)
+
+    manifest[pagename] = {
+        "etag": etag,
+        "size": len(content),
+        "encodings": {suffix.lstrip("."): len(data)
+                      for suffix, data in artifacts.items()},
+        "published": datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+    atomic_write(os.path.join(web_pub_path, MANIFEST_FILE),
+                 json.dumps(manifest, indent=2).encode("utf-8"))
+    return True
 
-def main():
-    latency_threshold = GetEnv.getparam("LatencyThreshold")
-    dashboard_location = GetEnv.getparam("DashboardFile")
-    mysqlenv = GetEnv.getparam("MySQL")
-    results_list = get_mysql_pingresults(mysqlenv)
 
-    downcount, upcount, dropcount, latentcount = get_poll_stats(mysqlenv, latency_threshold)
-    availabilitycells = generate_htmlcells(results_list, latency_threshold)
-    dashboard = generate_availability_dashboard(availabilitycells, 
-                                                downcount, upcount, 
-                                                dropcount, latentcount)
-    write_to_file(dashboard_location, dashboard)
+def main():
+    with Metrics.run("CreateAvailabilityDashboard",
+                     GetEnv.getparam("Metrics")):
+        latency_threshold = GetEnv.getparam("LatencyThreshold")
+        dashboard_location = GetEnv.getparam("DashboardFile")
+        mysqlenv = GetEnv.getparam("MySQL")
+        use_p95 = (GetEnv.getparam("LatencyStats") or {}).get("UseP95",
+                                                              False)
+        cacheparams = GetEnv.getparam("StateCache")
+        snapshot = None
+        # Sharded and regional pollers each see only their own devices
+        #  and don't write the snapshot
+        if StateCache.enabled(cacheparams) and \
+                not ShardLeases.enabled(GetEnv.getparam("Sharding")) and \
+                not RegionalPollers.enabled(
+                    GetEnv.getparam("RegionalPollers")):
+            with Metrics.timer("read_snapshot"):
+                snapshot = StateCache.read_snapshot(cacheparams)
+        Metrics.gauge("snapshot_used", int(snapshot is not None))
+        if snapshot is not None:
+            # Fresh snapshot from the pinger - no MySQL queries
+            with Metrics.timer("snapshot_rows"):
+                rows = snapshot.rows()
+            columns = snapshot.array
+        else:
+            with Metrics.timer("get_mysql_pingresults"):
+                rows = get_mysql_pingresults(
+                    mysqlenv, GetEnv.getparam("QueryCache"))
+            with Metrics.timer("rows_to_columns"):
+                columns = rows_to_columns(rows)
+        with Metrics.timer("classify_columns"):
+            (order, classes, stats) = classify_columns(
+                columns, latency_threshold, use_p95)
+        results_list = [rows[index] for index in order.tolist()]
+
+        dashboardparams = GetEnv.getparam("Dashboard") or {}
+        max_cells = max_cells_per_page(dashboardparams)
+        topoparams = GetEnv.getparam("Topology")
+        parents = None
+        if Topology.enabled(topoparams):
+            if snapshot is not None:
+                # Saved by the pinger with the snapshot
+                parents = StateCache.read_parents(cacheparams)
+            if parents is None:
+                with Metrics.timer("topology"):
+                    parents = Topology.dependencies(mysqlenv, topoparams)
+        with Metrics.timer("publish_dashboards"):
+            published = publish_dashboards(dashboard_location, results_list,
+                                           stats, latency_threshold, use_p95,
+                                           max_cells, classes,
+                                           dashboardparams.get("LiveURL", ""),
+                                           parents)
+        print(f"Number of dashboard pages published: {len(published)}")
+        Metrics.gauge("devices", len(results_list))
+        Metrics.gauge("pages_published", len(published))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    Profiling.run(main)
\ No newline at end of file
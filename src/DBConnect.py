@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Opens database connections for the project (DBConnect.py)
+
+#                                                                      #
+Opens a DB-API connection from the MySQL server parameters defined in
+optionsconfig.yaml.  MySQL (MySQLdb) is used by default; setting
+'engine: sqlite' opens a local SQLite database file instead, so the
+poll-to-dashboard pipeline can be benchmarked or exercised without a
+MySQL server.  SQLite connections translate the MySQL dialect used by
+the project scripts: %s placeholders and INSERT ... ON DUPLICATE KEY
+UPDATE col=VALUES(col) upserts.  The database name prefix used in the
+SQL (eg. devnet_dashboards.pingresults) works because the SQLite file
+is attached under that name.
+
+Every connection counts its database round trips (connect, execute,
+executemany, commit) in the module-level 'stats' dictionary.
+
+Required inputs/variables:
+    serverparams - dictionary of MySQL server parameters (eg. host,
+        username, password, database name), optionally
+        engine: sqlite
+        path: SQLite database file (default <database>.sqlite)
+
+Outputs:
+    DB-API connection object
+
+Version log:
+v1      2026-1019   First release
+v2      2026-1019   pollers and shard_leases tables
+v3      2026-1019   pingresults poller column and poller_batches table
+v4      2026-1019   pingresults stale column
+v5      2026-1019   inventory and pingresults probe_type columns
+v6      2026-1019   inventory_sources table
+v7      2026-1019   inventory_sources last_seen column
+v8      2026-1019   sqlite3 imported on the first SQLite connection only
+v9      2026-1019   sla_state and sla_daily tables
+v10     2026-1019   query_generation table
+
+Credits:
+"""
+__version__ = '10'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import re
+
+
+# Script-global variables
+# Database round trips since the process started (or reset_stats)
+stats = {"connects": 0, "round_trips": 0}
+
+# Primary keys of the project tables, for SQLite upsert conflict targets
+PRIMARY_KEYS = {
+    "inventory": "mgmt_ip_address",
+    "pingresults": "mgmt_ip_address",
+    "pollers": "worker_id",
+    "shard_leases": "shard",
+    "poller_batches": "batch_id",
+    "inventory_sources": "collector, mgmt_ip_address",
+    "sla_state": "mgmt_ip_address",
+    "sla_daily": "day, mgmt_ip_address",
+    "query_generation": "id",
+}
+
+# SQLite equivalent of mysql-table-ddl.sql
+SQLITE_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS {database}.inventory (
+      hostname varchar(45) DEFAULT NULL,
+      mgmt_ip_address varchar(45) NOT NULL PRIMARY KEY,
+      serial_number varchar(30) DEFAULT NULL,
+      device_type varchar(120) DEFAULT NULL,
+      device_group varchar(45) DEFAULT NULL,
+      model varchar(45) DEFAULT NULL,
+      source varchar(30) DEFAULT NULL,
+      software_version varchar(30) DEFAULT NULL,
+      location varchar(60) DEFAULT NULL,
+      contacts varchar(255) DEFAULT NULL,
+      do_ping tinyint DEFAULT NULL,
+      probe_type varchar(20) DEFAULT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS {database}.pingresults (
+      mgmt_ip_address varchar(45) NOT NULL PRIMARY KEY,
+      reachable_pct tinyint DEFAULT NULL,
+      avg_latency decimal(7,2) DEFAULT NULL,
+      min_latency decimal(7,2) DEFAULT NULL,
+      max_latency decimal(7,2) DEFAULT NULL,
+      datetime_lastup datetime DEFAULT NULL,
+      down_count int NOT NULL,
+      p50_latency decimal(7,2) DEFAULT NULL,
+      p95_latency decimal(7,2) DEFAULT NULL,
+      p99_latency decimal(7,2) DEFAULT NULL,
+      jitter decimal(7,2) DEFAULT NULL,
+      state varchar(10) DEFAULT NULL,
+      flap_score tinyint DEFAULT NULL,
+      probe_type varchar(20) DEFAULT NULL,
+      poller varchar(45) DEFAULT NULL,
+      stale tinyint NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS {database}.pollers (
+      worker_id varchar(64) NOT NULL PRIMARY KEY,
+      hostname varchar(45) DEFAULT NULL,
+      heartbeat bigint NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS {database}.shard_leases (
+      shard smallint NOT NULL PRIMARY KEY,
+      worker_id varchar(64) NOT NULL,
+      lease_expires bigint NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS {database}.poller_batches (
+      batch_id varchar(80) NOT NULL PRIMARY KEY,
+      poller varchar(45) NOT NULL,
+      created bigint NOT NULL,
+      devices int NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS {database}.inventory_sources (
+      collector varchar(30) NOT NULL,
+      mgmt_ip_address varchar(45) NOT NULL,
+      hostname varchar(45) DEFAULT NULL,
+      serial_number varchar(30) DEFAULT NULL,
+      device_type varchar(120) DEFAULT NULL,
+      device_group varchar(45) DEFAULT NULL,
+      model varchar(45) DEFAULT NULL,
+      source varchar(30) DEFAULT NULL,
+      software_version varchar(30) DEFAULT NULL,
+      location varchar(60) DEFAULT NULL,
+      do_ping tinyint DEFAULT NULL,
+      last_seen bigint NOT NULL DEFAULT 0,
+      PRIMARY KEY (collector, mgmt_ip_address)
+    )""",
+    """CREATE INDEX IF NOT EXISTS {database}.inventory_sources_ip
+      ON inventory_sources (mgmt_ip_address)""",
+    """CREATE INDEX IF NOT EXISTS {database}.inventory_sources_serial
+      ON inventory_sources (serial_number)""",
+    """CREATE INDEX IF NOT EXISTS {database}.inventory_sources_last_seen
+      ON inventory_sources (collector, last_seen)""",
+    """CREATE TABLE IF NOT EXISTS {database}.sla_state (
+      mgmt_ip_address varchar(45) NOT NULL PRIMARY KEY,
+      last_sample bigint NOT NULL,
+      last_up tinyint NOT NULL,
+      outage_start bigint DEFAULT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS {database}.sla_daily (
+      day date NOT NULL,
+      mgmt_ip_address varchar(45) NOT NULL,
+      samples int NOT NULL DEFAULT 0,
+      monitored_seconds int NOT NULL DEFAULT 0,
+      down_seconds int NOT NULL DEFAULT 0,
+      outages int NOT NULL DEFAULT 0,
+      repairs int NOT NULL DEFAULT 0,
+      repair_seconds bigint NOT NULL DEFAULT 0,
+      PRIMARY KEY (day, mgmt_ip_address)
+    )""",
+    """CREATE TABLE IF NOT EXISTS {database}.query_generation (
+      id tinyint NOT NULL PRIMARY KEY,
+      generation bigint NOT NULL
+    )""",
+)
+
+
+_UPSERT = re.compile(r"ON\s+DUPLICATE\s+KEY\s+UPDATE", re.IGNORECASE)
+_VALUES_REF = re.compile(r"VALUES\((\w+)\)", re.IGNORECASE)
+_INSERT_TABLE = re.compile(r"INSERT\s+INTO\s+(?:\w+\.)?(\w+)", re.IGNORECASE)
+
+
+def reset_stats():
+    """Reset the round trip counters to zero
+
+    :returns: None
+    """
+    for key in stats:
+        stats[key] = 0
+
+
+def mysql_to_sqlite(sql):
+    """Translate the project's MySQL SQL dialect to SQLite
+
+    :param sql: string of MySQL SQL statement
+    :returns: string of SQLite SQL statement
+    """
+    sql = sql.replace("%s", "?")
+    upsert = _UPSERT.search(sql)
+    if upsert:
+        table = _INSERT_TABLE.search(sql).group(1)
+        updates = _VALUES_REF.sub(r"excluded.\1", sql[upsert.end():])
+        sql = sql[:upsert.start()] + \
+            f"ON CONFLICT({PRIMARY_KEYS[table]}) DO UPDATE SET" + updates
+    return sql
+
+
+class CountingCursor:
+    """DB-API cursor wrapper counting round trips and, for SQLite,
+    translating MySQL SQL
+    """
+
+    def __init__(self, cursor, translate=False):
+        self._cursor = cursor
+        self._translate = translate
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, args=None):
+        stats["round_trips"] += 1
+        if self._translate:
+            sql = mysql_to_sqlite(sql)
+        if args is None:
+            return self._cursor.execute(sql)
+        return self._cursor.execute(sql, args)
+
+    def executemany(self, sql, args):
+        # MySQLdb batches multi-row INSERTs into a single statement
+        stats["round_trips"] += 1
+        if self._translate:
+            sql = mysql_to_sqlite(sql)
+        return self._cursor.executemany(sql, args)
+
+
+class CountingConnection:
+    """DB-API connection wrapper handing out CountingCursors"""
+
+    def __init__(self, connection, translate=False):
+        self._connection = connection
+        self._translate = translate
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self, *args):
+        return CountingCursor(self._connection.cursor(*args),
+                              self._translate)
+
+    def commit(self):
+        stats["round_trips"] += 1
+        return self._connection.commit()
+
+
+def connect(serverparams):
+    """Connect to the project database
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password, etc.]
+    :returns: DB-API connection
+    """
+    stats["connects"] += 1
+    stats["round_trips"] += 1
+    if serverparams.get("engine", "mysql") == "sqlite":
+        import sqlite3
+        from decimal import Decimal
+
+        sqlite3.register_adapter(Decimal, float)
+        database = serverparams["database"]
+        connection = sqlite3.connect(":memory:")
+        connection.execute(f"ATTACH DATABASE ? AS {database}",
+                           (serverparams.get("path", f"{database}.sqlite"),))
+        return CountingConnection(connection, translate=True)
+
+    import MySQLdb
+    connection = MySQLdb.connect(host=serverparams["host"],
+                                 user=serverparams["username"],
+                                 passwd=serverparams["password"],
+                                 db=serverparams["database"])
+    return CountingConnection(connection)
+
+
+def create_sqlite_schema(serverparams):
+    """Create the project tables in a SQLite database
+
+    :param serverparams: dictionary of database parameters with
+        engine: sqlite
+    :returns: None
+    """
+    db = connect(serverparams)
+    cursor = db.cursor()
+    for statement in SQLITE_SCHEMA:
+        cursor.execute(statement.format(database=serverparams["database"]))
+    db.commit()
+    cursor.close()
+    db.close()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Flap detection and hysteresis for device state (FlapDetection.py)
+
+#                                                                      #
+Classifies every device as good, down or flapping from its poll cycle
+history instead of the single latest poll cycle.  A device goes down
+only after DownThreshold consecutive failed cycles and comes back up
+only after UpThreshold consecutive good cycles.  Every up/down change
+of the raw poll result is recorded in a per-device 64-bit history
+mask; the number of changes within the last FlapWindow cycles is the
+flap score, and a device whose score reaches FlapThreshold is shown as
+flapping until the score falls back to half the threshold.
+
+All devices are updated at once with vectorized NumPy operations and
+the state is persisted between cron invocations in a small .npz state
+file.
+
+Required inputs/variables:
+    optionsconfig.yaml StateTracking section (optional)
+        DownThreshold, UpThreshold, FlapWindow, FlapThreshold,
+        StateFile
+
+Outputs:
+    DeviceStates object providing per-device state and flap score
+
+Version log:
+v1      2026-1019   First release
+v2      2026-1019   A damaged state file starts with no state
+    instead of failing every cycle
+v3      2026-1019   Default DownThreshold 3 and UpThreshold 2, as in
+    the shipped optionsconfig.yaml
+
+Credits:
+"""
+__version__ = '3'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import os
+import zipfile
+import numpy as np
+
+
+# Script-global variables
+# Defaults match the shipped optionsconfig.yaml StateTracking section
+DEFAULT_DOWN_THRESHOLD = 3
+DEFAULT_UP_THRESHOLD = 2
+DEFAULT_FLAP_WINDOW = 20
+DEFAULT_FLAP_THRESHOLD = 6
+DEFAULT_STATEFILE = "devicestate.npz"
+
+GOOD = 0
+DOWN = 1
+FLAPPING = 2
+STATE_NAMES = ("good", "down", "flapping")
+
+# Number of set bits for every byte value, for vectorized popcount
+_POPCOUNT8 = np.array([bin(value).count("1") for value in range(256)],
+                      dtype=np.uint8)
+
+
+def popcount(values):
+    """Count set bits of every element of a uint64 array
+
+    :param values: numpy uint64 array
+    :returns: numpy int64 array of bit counts
+    """
+    as_bytes = np.ascontiguousarray(values, dtype=np.uint64).view(np.uint8)
+    return _POPCOUNT8[as_bytes].reshape(-1, 8).sum(axis=1, dtype=np.int64)
+
+
+class DeviceStates:
+    """Hysteresis and flap state for many devices
+
+    One entry per device in parallel NumPy arrays:
+        base - good or down after up/down thresholds are applied
+        flapping - whether the device is currently flapping
+        fail_run, ok_run - consecutive failed/good poll cycles
+        last_up - raw result of the previous poll cycle
+        history - bit per poll cycle, set when the raw result changed
+    """
+
+    def __init__(self, down_threshold=DEFAULT_DOWN_THRESHOLD,
+                 up_threshold=DEFAULT_UP_THRESHOLD,
+                 flap_window=DEFAULT_FLAP_WINDOW,
+                 flap_threshold=DEFAULT_FLAP_THRESHOLD):
+        self.down_threshold = int(down_threshold)
+        self.up_threshold = int(up_threshold)
+        self.flap_window = min(max(int(flap_window), 1), 64)
+        self.flap_threshold = int(flap_threshold)
+        self.window_mask = np.uint64((1 << self.flap_window) - 1)
+        self.index = {}
+        self.ips = []
+        self.base = np.zeros(0, dtype=np.uint8)
+        self.flapping = np.zeros(0, dtype=bool)
+        self.fail_run = np.zeros(0, dtype=np.uint32)
+        self.ok_run = np.zeros(0, dtype=np.uint32)
+        self.last_up = np.zeros(0, dtype=bool)
+        self.history = np.zeros(0, dtype=np.uint64)
+
+    def _arrays(self):
+        return ("base", "flapping", "fail_run", "ok_run", "last_up",
+                "history")
+
+    def _rows_for(self, ips, up=None):
+        """Return the row numbers for ips, adding rows for devices not
+        seen before; new devices start in the state of their first
+        poll result
+        """
+        rows = list(map(self.index.get, ips))
+        if None in rows:
+            new_ips = [ip for ip in dict.fromkeys(ips)
+                       if ip not in self.index]
+            first_up = {}
+            if up is not None:
+                first_up = dict(zip(ips, up))
+            start_up = np.array([bool(first_up.get(ip, True))
+                                 for ip in new_ips], dtype=bool)
+            for ip in new_ips:
+                self.index[ip] = len(self.ips)
+                self.ips.append(ip)
+            self.base = np.concatenate(
+                (self.base, np.where(start_up, GOOD, DOWN).astype(np.uint8)))
+            self.flapping = np.concatenate(
+                (self.flapping, np.zeros(len(new_ips), dtype=bool)))
+            self.fail_run = np.concatenate(
+                (self.fail_run, np.zeros(len(new_ips), dtype=np.uint32)))
+            self.ok_run = np.concatenate(
+                (self.ok_run, np.zeros(len(new_ips), dtype=np.uint32)))
+            self.last_up = np.concatenate((self.last_up, start_up))
+            self.history = np.concatenate(
+                (self.history, np.zeros(len(new_ips), dtype=np.uint64)))
+            rows = list(map(self.index.get, ips))
+        return np.array(rows, dtype=np.int64)
+
+    def update(self, ips, up):
+        """Apply one poll cycle of raw results
+
+        :param ips: list of device IP addresses probed this cycle
+        :param up: list of booleans aligned with ips; True when the
+            device answered at least one ping
+        :returns: None
+        """
+        rows = self._rows_for(ips, up)
+        up = np.asarray(up, dtype=bool)
+
+        changed = up != self.last_up[rows]
+        self.history[rows] = (self.history[rows] << np.uint64(1)) \
+            | changed.astype(np.uint64)
+        self.last_up[rows] = up
+
+        fail_run = np.where(up, 0, self.fail_run[rows] + 1)
+        ok_run = np.where(up, self.ok_run[rows] + 1, 0)
+        self.fail_run[rows] = fail_run
+        self.ok_run[rows] = ok_run
+
+        base = self.base[rows]
+        base = np.where((base == GOOD) & (fail_run >= self.down_threshold),
+                        DOWN, base)
+        base = np.where((base == DOWN) & (ok_run >= self.up_threshold),
+                        GOOD, base)
+        self.base[rows] = base
+
+        score = popcount(self.history[rows] & self.window_mask)
+        flapping = self.flapping[rows]
+        flapping = np.where(score >= self.flap_threshold, True,
+                            np.where(score <= self.flap_threshold // 2,
+                                     False, flapping))
+        self.flapping[rows] = flapping
+
+    def states(self, ips):
+        """Return the state code and flap score of devices
+
+        :param ips: list of device IP addresses
+        :returns: (states, scores) - numpy arrays aligned with ips of
+            state codes (GOOD, DOWN, FLAPPING) and flap scores
+        """
+        rows = self._rows_for(ips)
+        states = np.where(self.flapping[rows], FLAPPING, self.base[rows])
+        scores = popcount(self.history[rows] & self.window_mask)
+        return states.astype(np.uint8), scores
+
+    def summary(self, ips):
+        """Summarize state name and flap score of devices
+
+        :param ips: list of device IP addresses
+        :returns: list of (state, flap_score) tuples aligned with ips
+        """
+        states, scores = self.states(ips)
+        return [(STATE_NAMES[state], score)
+                for state, score in zip(states.tolist(), scores.tolist())]
+
+    def retain(self, ips):
+        """Drop devices no longer in inventory
+
+        :param ips: iterable of device IP addresses to keep
+        :returns: None
+        """
+        wanted = set(ips)
+        keep = [ip for ip in self.ips if ip in wanted]
+        if len(keep) == len(self.ips):
+            return
+        rows = np.array([self.index[ip] for ip in keep], dtype=np.int64)
+        for name in self._arrays():
+            setattr(self, name, getattr(self, name)[rows])
+        self.ips = keep
+        self.index = {ip: row for row, ip in enumerate(keep)}
+
+    def save(self, statefile):
+        """Atomically write device state to a .npz state file
+
+        :param statefile: path of the state file
+        :returns: None
+        """
+        tmpfile = statefile + ".tmp"
+        with open(tmpfile, "wb") as outfile:
+            np.savez(outfile, ips=np.array(self.ips, dtype=str),
+                     **{name: getattr(self, name) for name in self._arrays()})
+        os.replace(tmpfile, statefile)
+
+
+def load(stateparams=None):
+    """Load device state using StateTracking settings
+
+    A missing or unreadable state file starts every device fresh.
+
+    :param stateparams: dictionary of StateTracking settings from
+        optionsconfig.yaml [eg. DownThreshold, StateFile] or None for
+        defaults
+    :returns: DeviceStates object
+    """
+    stateparams = stateparams or {}
+    states = DeviceStates(
+        stateparams.get("DownThreshold", DEFAULT_DOWN_THRESHOLD),
+        stateparams.get("UpThreshold", DEFAULT_UP_THRESHOLD),
+        stateparams.get("FlapWindow", DEFAULT_FLAP_WINDOW),
+        stateparams.get("FlapThreshold", DEFAULT_FLAP_THRESHOLD))
+    statefile = stateparams.get("StateFile", DEFAULT_STATEFILE)
+    try:
+        with np.load(statefile) as saved:
+            arrays = {name: saved[name] for name in states._arrays()}
+            ips = saved["ips"].tolist()
+    except (OSError, KeyError, ValueError, EOFError,
+            zipfile.BadZipFile):
+        return states
+    if any(len(array) != len(ips) for array in arrays.values()):
+        return states
+    for name, array in arrays.items():
+        setattr(states, name, array.astype(getattr(states, name).dtype))
+    states.ips = ips
+    states.index = {ip: row for row, ip in enumerate(ips)}
+    return states
@@ -28,10 +28,18 @@ Version log:
 v1      2021-0317   Ported from AO workflows to Python
 v2      2021-0510   Refactored to enable for DevNet Automation 
 Exchange
+v3      2026-1019   Per-stage timing metrics
+v4      2026-1019   --profile option (cProfile, stack sampling,
+    tracemalloc)
+v5      2026-1019   Merges the devices into the inventory by
+    source precedence (InventoryMerge)
+v6      2026-1019   Streams the devices page by page (PageSize)
+    into batched inventory merges
+v7      2026-1019   Parses the response bytes with JSONCodec
 
 Credits:
 """
-__version__ = '2'
+__version__ = '7'
 __author__ = 'Jason Davis - jadavis@cisco.com'
 __license__ = "Cisco Sample Code License, Version 1.1 - https://developer.cisco.com/site/license/cisco-sample-code-license/"
 
@@ -41,8 +49,15 @@ import requests
 from requests.auth import HTTPBasicAuth
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 import json
+import JSONCodec
 import ReadEnvironmentVars
-import InsertUpdateMySQL
+import InventoryMerge
+import Metrics
+import Profiling
+
+
+# Script-global variables
+DEFAULT_PAGE_SIZE = 1000
 
 
 def get_aciapic_authtoken(server):
@@ -64,7 +79,7 @@ def get_aciapic_authtoken(server):
                                       verify=ssl_verify)
         # get token from login response structure
         # print(post_response.text)
-        auth = json.loads(post_response.text)
+        auth = JSONCodec.loads(post_response.content)
         if auth['imdata'][0].get('error') is not None:
             print('Got an error communication with APIC controller')
             if 'FAILED local authentication' in auth['imdata'][0]['error']['attributes']['text']:
@@ -81,7 +96,9 @@ def get_aciapic_authtoken(server):
 
 
 def get_aciapic_devices(server, authtoken):
-    url = "https://" + server["host"] + "/api/class/topSystem.json"
+    # Pages of PageSize topSystem objects, ordered so pages don't overlap
+    baseurl = "https://" + server["host"] + "/api/class/topSystem.json"
+    page_size = server.get("PageSize", DEFAULT_PAGE_SIZE)
     cookies = {}
     cookies['APIC-Cookie'] = authtoken
        
@@ -90,25 +107,31 @@ def get_aciapic_devices(server, authtoken):
     if ssl_verify == False:
         requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
-    #print(url)
-    #print(cookies['APIC-Cookie'])
-    #print(ssl_verify)
-    # Make REST API request
-    response = requests.request(
-        "GET",
-        url,
-        cookies=cookies,
-        verify=ssl_verify
-        )
-
-    #print(response.json())  
-    #print(response.text)  
-    return (response.text)
+    page_number = 0
+    while True:
+        url = baseurl + f"?order-by=topSystem.dn&page={page_number}&page-size={page_size}"
+        #print(url)
+        # Make REST API request
+        with Metrics.timer("get_aciapic_devices"):
+            response = requests.request(
+                "GET",
+                url,
+                cookies=cookies,
+                verify=ssl_verify
+                )
+
+        #print(response.text)  
+        page = JSONCodec.loads(response.content)
+        yield page
+        if len(page["imdata"]) < page_size or \
+                (page_number + 1) * page_size >= int(page.get("totalCount", 0)):
+            return
+        page_number += 1
 
 
 def extract_device_properties(server, deviceinventory):
     deviceparams=[]
-    inventory_json = json.loads(deviceinventory)
+    inventory_json = deviceinventory
     for item in inventory_json["imdata"]:
         #["topSystem"]["attributes"]
         #print(item)
@@ -127,18 +150,32 @@ def extract_device_properties(server, deviceinventory):
     return deviceparams
 
 
-def main():
-    serverlist = ReadEnvironmentVars.read_config_file("ACIAPIC")
-    deviceresults = []
+def stream_devices(serverlist):
+    # Devices of all controllers, fetched page by page as consumed
     for server in serverlist:
         print(f"Processing ACI APIC controller {server['host']}...")
-        authtoken = get_aciapic_authtoken(server)
-        devices = get_aciapic_devices(server, authtoken)
-        deviceresults.extend(extract_device_properties(server["host"], devices))
-        devicerecords = len(deviceresults)
-        print(f"  Running total records {devicerecords}")
-    InsertUpdateMySQL.insertsql(ReadEnvironmentVars.read_config_file("MySQL"),deviceresults)
+        with Metrics.timer("get_aciapic_authtoken"):
+            authtoken = get_aciapic_authtoken(server)
+        devicerecords = 0
+        for page in get_aciapic_devices(server, authtoken):
+            with Metrics.timer("extract_device_properties"):
+                devices = extract_device_properties(server["host"], page)
+            devicerecords += len(devices)
+            yield from devices
+        print(f"  Controller total records {devicerecords}")
+
+
+def main():
+    with Metrics.run("GetACIAPICDevices",
+                     ReadEnvironmentVars.read_config_file("Metrics")):
+        serverlist = ReadEnvironmentVars.read_config_file("ACIAPIC")
+        counts = InventoryMerge.merge(
+            ReadEnvironmentVars.read_config_file("MySQL"), "ACIAPIC",
+            InventoryMerge.records(InventoryMerge.CONTROLLER_COLUMNS,
+                                   stream_devices(serverlist)),
+            ReadEnvironmentVars.read_config_file("InventoryMerge"))
+        Metrics.gauge("devices", counts["records"])
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    Profiling.run(main)
\ No newline at end of file
@@ -20,6 +20,7 @@ Required inputs/variables:
         CheckSSLCert: True  # Or False, if you are not security conscious and using self-signed certs internally
         username: devnetuser
         password: Cisco123!
+        PageSize: 500  # Optional, devices per API request
 
 Outputs:
     Puts device information into MySQL inventory table
@@ -28,10 +29,18 @@ Version log:
 v1      2021-0304   Ported from AO workflows to Python
 v2      2021-0425   Refactored to enable for DevNet Automation 
 Exchange
+v3      2026-1019   Per-stage timing metrics
+v4      2026-1019   --profile option (cProfile, stack sampling,
+    tracemalloc)
+v5      2026-1019   Merges the devices into the inventory by
+    source precedence (InventoryMerge)
+v6      2026-1019   Streams the devices page by page (PageSize)
+    into batched inventory merges
+v7      2026-1019   Parses the response bytes with JSONCodec
 
 Credits:
 """
-__version__ = '2'
+__version__ = '7'
 __author__ = 'Jason Davis - jadavis@cisco.com'
 __license__ = "Cisco Sample Code License, Version 1.1 - https://developer.cisco.com/site/license/cisco-sample-code-license/"
 
@@ -40,9 +49,15 @@ import sys
 import requests
 from requests.auth import HTTPBasicAuth
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
-import json
+import JSONCodec
 import ReadEnvironmentVars
-import InsertUpdateMySQL
+import InventoryMerge
+import Metrics
+import Profiling
+
+
+# Script-global variables
+DEFAULT_PAGE_SIZE = 500  # the API's maximum
 
 
 def get_dnac_authtoken(server):
@@ -87,7 +102,7 @@ def get_dnac_authtoken(server):
         if response.status_code == 401:
             sys.exit(f'Unable to authenticate to server \'{server["host"]}\'.  Check configuration in optionsconfig.yaml')
         else:
-            resp_token = json.loads(response.text)
+            resp_token = JSONCodec.loads(response.content)
             return (resp_token["Token"])
 
 
@@ -95,14 +110,16 @@ def get_dnac_devices(server, authtoken):
     """Get DNA Center device list from REST API
     
     Uses server parameters to target a specific DNA Center server and
-    a supplied authentication token to perform a REST API extracting
-    all DNA Center devices.
+    a supplied authentication token to perform REST API requests
+    extracting all DNA Center devices, one page of PageSize devices at
+    a time.
     
     :param server: dictionary containing settings of the DNA Center server being polled [eg. host, username, password,  etc.]
     :param authtoken: authentication token used as cookie in API call
-    :returns: string of JSON data representing a list of dictionary records of devices and their parameters
+    :returns: generator of dictionaries of JSON pages of devices
     """
-    url = "https://" + server["host"] + "/dna/intent/api/v1/network-device"
+    baseurl = "https://" + server["host"] + "/dna/intent/api/v1/network-device"
+    page_size = server.get("PageSize", DEFAULT_PAGE_SIZE)
        
     # Handle SSL certificate verification and warnings - update per environment and security requirements
     ssl_verify = server["CheckSSLCert"]
@@ -113,28 +130,35 @@ def get_dnac_devices(server, authtoken):
     'Content-type': 'application/json'}
 
     #print(headers)
-    # Make REST API request
-    response = requests.request(
-        "GET",
-        url,
-        verify=ssl_verify,
-        headers=headers
-        )
-    
-    return (response.text)
+    offset = 1  # DNA Center offsets start at 1
+    while True:
+        url = baseurl + f"?offset={offset}&limit={page_size}"
+        # Make REST API request
+        with Metrics.timer("get_dnac_devices"):
+            response = requests.request(
+                "GET",
+                url,
+                verify=ssl_verify,
+                headers=headers
+                )
+        page = JSONCodec.loads(response.content)
+        yield page
+        if len(page["response"]) < page_size:
+            return
+        offset += page_size
 
 
 def extract_device_properties(server, deviceinventory):
     """Extract the device properties from JSON data
     
-    Extracts device properties from input string of JSON encoded data representing a list of device records (dictionaries)
+    Extracts device properties from one page of JSON data representing a list of device records (dictionaries)
     
     :param server: dictionary containing settings of the DNA Center server being polled [eg. host, username, password,  etc.]
-    :param deviceinventory: string of JSON encoded records (as list of dictionaries)
-    :returns: string of list of dictionary records of devices and their parameters
+    :param deviceinventory: dictionary of a JSON page of devices
+    :returns: list of tuples of devices and their parameters
     """
     deviceparams=[]
-    inventory_json = json.loads(deviceinventory)
+    inventory_json = deviceinventory
     #print(json.dumps(inventory_json, indent=4))
     for item in inventory_json["response"]:
         #print(item)
@@ -147,18 +171,39 @@ def extract_device_properties(server, deviceinventory):
     return deviceparams
 
 
-def main():
-    serverlist = ReadEnvironmentVars.read_config_file("DNACenter")
-    deviceresults = []
+def stream_devices(serverlist):
+    """Stream the devices of all DNA Center servers
+
+    Pages are only fetched as the devices are consumed, so one page is
+    held in memory at a time
+
+    :param serverlist: list of dictionaries of DNA Center server settings
+    :returns: generator of tuples of devices and their parameters
+    """
     for server in serverlist:
         print(f"Processing DNA Center server {server['host']}...")
-        authtoken = get_dnac_authtoken(server)
-        devices = get_dnac_devices(server, authtoken)
-        deviceresults.extend(extract_device_properties(server["host"], devices))
-        devicerecords = len(deviceresults)
-        print(f"  Running total records {devicerecords}")
-    InsertUpdateMySQL.insertsql(ReadEnvironmentVars.read_config_file("MySQL"),deviceresults)
+        with Metrics.timer("get_dnac_authtoken"):
+            authtoken = get_dnac_authtoken(server)
+        devicerecords = 0
+        for page in get_dnac_devices(server, authtoken):
+            with Metrics.timer("extract_device_properties"):
+                devices = extract_device_properties(server["host"], page)
+            devicerecords += len(devices)
+            yield from devices
+        print(f"  Server total records {devicerecords}")
+
+
+def main():
+    with Metrics.run("GetDNACDevices",
+                     ReadEnvironmentVars.read_config_file("Metrics")):
+        serverlist = ReadEnvironmentVars.read_config_file("DNACenter")
+        counts = InventoryMerge.merge(
+            ReadEnvironmentVars.read_config_file("MySQL"), "DNACenter",
+            InventoryMerge.records(InventoryMerge.CONTROLLER_COLUMNS,
+                                   stream_devices(serverlist)),
+            ReadEnvironmentVars.read_config_file("InventoryMerge"))
+        Metrics.gauge("devices", counts["records"])
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    Profiling.run(main)
\ No newline at end of file
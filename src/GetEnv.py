@@ -25,6 +25,17 @@ Required inputs/variables:
         username: devnetuser
         password: DevNet123!
 
+The parsed file is kept for the life of the process and re-read only
+when it changes, so the many getparam() calls of a poll cycle parse it
+once.  Each call returns a fresh copy, which callers may modify.
+
+Fast-start mode: with the environment variable
+DDCAM_FAST_START=1 (eg. in the crontab), the parsed file is
+also saved next to it as .optionsconfig.yaml.cache (mode 0600 - it
+holds the passwords), and later runs load that instead, without
+importing or running the YAML parser.  The cache is rebuilt whenever
+optionsconfig.yaml's modification time or size changes.
+
 Outputs:
     list of dictionary items reflecting the server parameters
 
@@ -32,15 +43,139 @@ Version log:
 v1      2021-0623   Created as normalized function across all
 v2      2023-0503   Updated to reduce module and function names
     DevNet Dashboard importing scripts
+v3      2026-1019   Parsed file cached per process, libyaml loader when
+    available, fast-start mode cache; yaml imported only to parse
 
 Credits:
 """
-__version__ = '2'
+__version__ = '3'
 __author__ = 'Jason Davis - jadavis@cisco.com'
 __license__ = "Cisco Sample Code License, Version 1.1 - https://developer.cisco.com/site/license/cisco-sample-code-license/"
 
 
 
+import os
+import sys
+import copy
+import marshal
+
+
+# Script-global variables
+CONFIG_FILE = "optionsconfig.yaml"
+FAST_START_VARIABLE = "DDCAM_FAST_START"
+
+# Parsed config files: absolute path -> (signature, dictionary)
+_configs = {}
+
+
+def _signature(status):
+    return (status.st_mtime_ns, status.st_size)
+
+
+def cache_file(filename=CONFIG_FILE):
+    """Fast-start cache file of a config file
+
+    :param filename: string of the YAML config file
+    :returns: string of the cache file name
+    """
+    (directory, name) = os.path.split(filename)
+    return os.path.join(directory, f".{name}.cache")
+
+
+def fast_start():
+    """Whether fast-start mode is enabled in the environment
+
+    :returns: boolean
+    """
+    return os.environ.get(FAST_START_VARIABLE, "").lower() in \
+        ("1", "true", "yes", "on")
+
+
+def parse_yaml(filename):
+    """Parse a YAML config file
+
+    :param filename: string of the YAML config file
+    :returns: dictionary of the file contents
+    """
+    import yaml
+
+    # The libyaml based loader is several times faster, when available
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(filename, "r") as ymlfile:
+        try:
+            cfg = yaml.load(ymlfile, Loader=loader)
+        except yaml.YAMLError as e:
+            print(e)
+            sys.exit(f"Unable to parse {filename}")
+    return cfg or {}
+
+
+def read_cache(filename, signature):
+    """Load a fast-start cache if it matches the config file
+
+    :param filename: string of the cache file
+    :param signature: tuple identifying the config file version
+    :returns: dictionary of the config, or None when missing or stale
+    """
+    try:
+        with open(filename, "rb") as cachefile:
+            (cached, cfg) = marshal.load(cachefile)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return cfg if cached == signature else None
+
+
+def write_cache(filename, signature, cfg):
+    """Save a fast-start cache; skipped when it can't be written
+
+    :param filename: string of the cache file
+    :param signature: tuple identifying the config file version
+    :param cfg: dictionary of the config
+    :returns: None
+    """
+    try:
+        data = marshal.dumps((signature, cfg))
+    except ValueError:  # types marshal can't store, eg. YAML timestamps
+        return
+    temporary = f"{filename}.{os.getpid()}"
+    try:
+        descriptor = os.open(temporary,
+                             os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, "wb") as cachefile:
+            cachefile.write(data)
+        os.replace(temporary, filename)
+    except OSError:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+
+
+def load(filename=CONFIG_FILE):
+    """Parsed config file, cached until the file changes
+
+    :param filename: string of the YAML config file
+    :returns: dictionary of the file contents; shared, not to be
+        modified
+    """
+    path = os.path.abspath(filename)
+    signature = _signature(os.stat(path))
+    (cached, cfg) = _configs.get(path, (None, None))
+    if cached == signature:
+        return cfg
+
+    cfg = None
+    if fast_start():
+        cfg = read_cache(cache_file(path), signature)
+    if cfg is None:
+        cfg = parse_yaml(path)
+        if fast_start():
+            write_cache(cache_file(path), signature, cfg)
+    _configs[path] = (signature, cfg)
+    return cfg
+
+
+
 def getparam(parameter):
     """Read environmental settings file
     
@@ -50,15 +185,7 @@ def getparam(parameter):
       to extract [eg. Webex_Key, PrimeInfrastructure, DNACenter, etc.]
     :returns: List of servertype entries defined in YAML config file
     """
-    import yaml
-
-    with open("optionsconfig.yaml", "r") as ymlfile:
-        try:
-            cfg = yaml.safe_load(ymlfile)
-        except yaml.YAMLError as e:
-            print(e)
-    
-    return cfg.get(parameter)
+    return copy.deepcopy(load().get(parameter))
 
 
 def main(parameter):
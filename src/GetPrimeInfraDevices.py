@@ -19,6 +19,7 @@ Required inputs/variables:
         CheckSSLCert: True  # Or False, if you are not security conscious and using self-signed certs internally
         username: devnetuser
         password: DevNet123!
+        PageSize: 1000  # Optional, devices per API request
 
 Outputs:
     Puts device information into MySQL inventory table
@@ -28,10 +29,18 @@ v1      2021-0220   Ported from AO workflows to Python
 v2      2021-0421   Refactored to enable for DevNet Automation 
 Exchange
 v3      2023-0622   Add more error handling
+v4      2026-1019   Per-stage timing metrics
+v5      2026-1019   --profile option (cProfile, stack sampling,
+    tracemalloc)
+v6      2026-1019   Merges the devices into the inventory by
+    source precedence (InventoryMerge)
+v7      2026-1019   Streams the devices page by page (PageSize)
+    into batched inventory merges
+v8      2026-1019   Parses the response bytes with JSONCodec
 
 Credits:
 """
-__version__ = '3'
+__version__ = '8'
 __author__ = 'Jason Davis - jadavis@cisco.com'
 __license__ = "Cisco Sample Code License, Version 1.1 - https://developer.cisco.com/site/license/cisco-sample-code-license/"
 
@@ -40,24 +49,30 @@ import sys
 import requests
 from requests.auth import HTTPBasicAuth
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
-import json
+import JSONCodec
 #import MySQLdb
 import ReadEnvironmentVars
-import InsertUpdateMySQL
+import InventoryMerge
+import Metrics
+import Profiling
+
+
+# Script-global variables
+DEFAULT_PAGE_SIZE = 1000
 
 
 def get_prime_infra_devices(server):
     """Extract Prime Infrastructure devices from REST API
     
     Reads Prime Infrastructure server REST API, extracting device list 
+    one page of PageSize devices at a time
     
     :param server: dictionary containing settings of the Prime Infrastructure server being polled [eg. host, username, password,  etc.]
-    :returns: string representing a JSON list of devices and their parameters
+    :returns: generator of dictionaries of JSON pages of devices
     """
 
     baseurl = "https://" + server["host"] + "/webacs/api/v4/data/Devices.json"
-    querystring = "?.full=true"
-    url = baseurl + querystring
+    page_size = server.get("PageSize", DEFAULT_PAGE_SIZE)
 
     # Provide username and password for basic authentication
     basicAuth = HTTPBasicAuth(server["username"], server["password"])
@@ -67,45 +82,55 @@ def get_prime_infra_devices(server):
     if ssl_verify == False:
         requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
-    # Make REST API request
-    try:
-        response = requests.request(
-            "GET",
-            url,
-            auth=basicAuth,
-            verify=ssl_verify
-            )
-    except requests.exceptions.ConnectionError:
-        # Maybe set up for a retry, or continue in a retry loop
-        sys.exit(f'Unable to connect to server \'{server["host"]}\'.  Check server state or configuration in optionsconfig.yaml')
-    except requests.exceptions.Timeout:
-        # Maybe set up for a retry, or continue in a retry loop
-        sys.exit(f'Unable to reach server \'{server["host"]}\' due to network timeout.  Try again later.')
-    except requests.exceptions.RequestException as e:
-        # catastrophic error. bail.
-        sys.exit(f'Unhandled error: {e}')
-    else:
+    first = 0
+    while True:
+        querystring = f"?.full=true&.firstResult={first}&.maxResults={page_size}"
+        url = baseurl + querystring
+
+        # Make REST API request
+        try:
+            with Metrics.timer("get_prime_infra_devices"):
+                response = requests.request(
+                    "GET",
+                    url,
+                    auth=basicAuth,
+                    verify=ssl_verify
+                    )
+        except requests.exceptions.ConnectionError:
+            # Maybe set up for a retry, or continue in a retry loop
+            sys.exit(f'Unable to connect to server \'{server["host"]}\'.  Check server state or configuration in optionsconfig.yaml')
+        except requests.exceptions.Timeout:
+            # Maybe set up for a retry, or continue in a retry loop
+            sys.exit(f'Unable to reach server \'{server["host"]}\' due to network timeout.  Try again later.')
+        except requests.exceptions.RequestException as e:
+            # catastrophic error. bail.
+            sys.exit(f'Unhandled error: {e}')
         if response.status_code == 401:
             sys.exit(f'Unable to authenticate to server \'{server["host"]}\'.  Check configuration in optionsconfig.yaml')
-        else:
-            return (response.text)
+
+        page = JSONCodec.loads(response.content)
+        yield page
+        query = page["queryResponse"]
+        if not query.get("entity") or int(query["@last"]) + 1 >= int(query["@count"]):
+            return
+        first = int(query["@last"]) + 1
 
 
 def extract_device_properties(server, deviceinventory):
-    """Extract devices properties from JSON string
+    """Extract devices properties from a page of JSON data
     
-    Reads device inventory as JSON, extracts the fields needed to add as inventory into MySQL
+    Reads one page of the device inventory, extracts the fields needed to add as inventory into MySQL
     
     :param server: dictionary containing settings of the Prime Infrastructure server being polled [eg. host, username, password,  etc.]
-    :param deviceinventory: string of JSON text representing Prime Infrastructure devices in a list
-    :returns: list of dictionary entries representing device parameters
+    :param deviceinventory: dictionary of a JSON page of Prime Infrastructure devices
+    :returns: list of tuples representing device parameters
     """
 
     deviceparams=[]
-    inventory_json = json.loads(deviceinventory)
-    if inventory_json["queryResponse"]["@count"] == 0:
+    inventory_json = deviceinventory
+    if inventory_json["queryResponse"]["@count"] in (0, "0"):
         sys.exit(f"Prime Infrastructure server {server} had NO inventory to export")
-    for entity in inventory_json["queryResponse"]["entity"]:
+    for entity in inventory_json["queryResponse"].get("entity", []):
         device_name = entity.get('devicesDTO', {}).get('deviceName', 'Unknown')
         ip_address = entity["devicesDTO"]["ipAddress"]
         device_type = entity.get('devicesDTO', {}).get('deviceType', 'Unknown')
@@ -116,17 +141,37 @@ def extract_device_properties(server, deviceinventory):
     return deviceparams
 
 
-def main():
-    serverlist = ReadEnvironmentVars.read_config_file("PrimeInfrastructure")
-    deviceresults = []
+def stream_devices(serverlist):
+    """Stream the devices of all Prime Infrastructure servers
+
+    Pages are only fetched as the devices are consumed, so one page is
+    held in memory at a time
+
+    :param serverlist: list of dictionaries of Prime Infrastructure server settings
+    :returns: generator of tuples representing device parameters
+    """
     for server in serverlist:
         print(f"Processing Prime Infrastructure server {server['host']}...")
-        deviceresults.extend(extract_device_properties(server["host"], get_prime_infra_devices(server)))
-        devicerecords = len(deviceresults)
-        print(f"  Running total records {devicerecords}")
-    #insupd_mysql(read_config_file("MySQL"),deviceresults)
-    InsertUpdateMySQL.insertsql(ReadEnvironmentVars.read_config_file("MySQL"),deviceresults)
+        devicerecords = 0
+        for page in get_prime_infra_devices(server):
+            with Metrics.timer("extract_device_properties"):
+                devices = extract_device_properties(server["host"], page)
+            devicerecords += len(devices)
+            yield from devices
+        print(f"  Server total records {devicerecords}")
+
+
+def main():
+    with Metrics.run("GetPrimeInfraDevices",
+                     ReadEnvironmentVars.read_config_file("Metrics")):
+        serverlist = ReadEnvironmentVars.read_config_file("PrimeInfrastructure")
+        counts = InventoryMerge.merge(
+            ReadEnvironmentVars.read_config_file("MySQL"), "PrimeInfrastructure",
+            InventoryMerge.records(InventoryMerge.CONTROLLER_COLUMNS,
+                                   stream_devices(serverlist)),
+            ReadEnvironmentVars.read_config_file("InventoryMerge"))
+        Metrics.gauge("devices", counts["records"])
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    Profiling.run(main)
\ No newline at end of file
@@ -26,21 +26,37 @@ Outputs:
 
 Version log:
 v1      2023-0626   First release
+v2      2026-1019   Per-stage timing metrics
+v3      2026-1019   --profile option (cProfile, stack sampling,
+    tracemalloc)
+v4      2026-1019   Merges the APs into the inventory by source
+    precedence (InventoryMerge)
+v5      2026-1019   Streams the APs, one controller at a time, into
+    batched inventory merges
 
 Credits:
 """
-__version__ = '1'
+__version__ = '5'
 __author__ = 'Jason Davis - jadavis@cisco.com'
 __license__ = "Cisco Sample Code License, Version 1.1 - " \
   "https://developer.cisco.com/site/license/cisco-sample-code-license/"
 
 
 import sys
-import InsertUpdateMySQLv3
+import InventoryMerge
 from ncclient import manager
 import xml.etree.ElementTree as ET
 import re
 import GetEnv
+import Metrics
+import Profiling
+
+
+# Script-global variables
+# Inventory column of each item of the remap_inventory tuples
+INVENTORY_COLUMNS = ("hostname", "mgmt_ip_address", "serial_number",
+                     "device_type", "device_group", "model", "source",
+                     "software_version", "location", "contacts", "do_ping")
 
 
 def strip_ns(xml_string):
@@ -97,42 +113,43 @@ def get_wap_info(wlc):
 
 
 def extract_xml(xmldata):
-    # Convert XML data from NETCONF results into dictionary
+    # Convert XML data from NETCONF results into generators of tuples,
+    #  read as they are consumed
     # print(ET.tostring(xmldata, encoding='utf8').decode('utf8'))
 
-    capwap_data = []
-    wap_map = []
-
-    for wap in xmldata.iter('capwap-data'):
-        wtp_mac = wap.find('wtp-mac').text
-        ip_addr = wap.find('ip-addr').text
-        serial_num = wap.find('device-detail/static-info/board-data/wtp-serial-num').text
-        ap_model = wap.find('device-detail/static-info/ap-models/model').text
-        version = wap.find('device-detail/wtp-version/sw-ver/version').text
-        release = wap.find('device-detail/wtp-version/sw-ver/release').text
-        maint = wap.find('device-detail/wtp-version/sw-ver/maint').text
-        # print(wtp_mac, ip_addr, serial_num, ap_model, version, release, maint)
-        capwap_data.append((wtp_mac, ip_addr, serial_num, ap_model,
-                           f'{version}.{release}.{maint}'))
-
-    for wap in xmldata.iter('ap-name-mac-map'):
-        wtp_mac = wap.find('wtp-mac').text
-        wtp_name = wap.find('wtp-name').text
-        eth_mac = wap.find('eth-mac').text
-        # print(wtp_mac, wtp_name, eth_mac)
-        wap_map.append((wtp_mac, wtp_name, eth_mac))
-
-    # print(capwap_data)
-    # print(wap_map)
-
-    return capwap_data, wap_map
+    def capwap_data():
+        for wap in xmldata.iter('capwap-data'):
+            wtp_mac = wap.find('wtp-mac').text
+            ip_addr = wap.find('ip-addr').text
+            serial_num = wap.find('device-detail/static-info/board-data/wtp-serial-num').text
+            ap_model = wap.find('device-detail/static-info/ap-models/model').text
+            version = wap.find('device-detail/wtp-version/sw-ver/version').text
+            release = wap.find('device-detail/wtp-version/sw-ver/release').text
+            maint = wap.find('device-detail/wtp-version/sw-ver/maint').text
+            # print(wtp_mac, ip_addr, serial_num, ap_model, version, release, maint)
+            yield (wtp_mac, ip_addr, serial_num, ap_model,
+                   f'{version}.{release}.{maint}')
+
+    def wap_map():
+        for wap in xmldata.iter('ap-name-mac-map'):
+            wtp_mac = wap.find('wtp-mac').text
+            wtp_name = wap.find('wtp-name').text
+            eth_mac = wap.find('eth-mac').text
+            # print(wtp_mac, wtp_name, eth_mac)
+            yield (wtp_mac, wtp_name, eth_mac)
+
+    return capwap_data(), wap_map()
 
 
 def merge_wap_data(controller, capwap_list, wap_map_list):
     # Merge wireless AP data into common list joined by wireless AP MAC
-    merged_list = [(controller,) + x + y[1:] for x in capwap_list
-                   for y in wap_map_list if x[0] == y[0]]
-    return merged_list
+    #  - one pass over each, through a MAC lookup of the name map
+    names = {}
+    for y in wap_map_list:
+        names.setdefault(y[0], []).append(y)
+    for x in capwap_list:
+        for y in names.get(x[0], []):
+            yield (controller,) + x + y[1:]
 
 
 def remap_inventory(deviceresults):
@@ -155,48 +172,37 @@ def remap_inventory(deviceresults):
     (controller, wtp_mac, ip_addr, serial_num, ap_model, sw_version,
         wtp_name, eth_mac)
     """
-    newinventory = []
     # print(f'Device results are\n{deviceresults}')
     for item in deviceresults:
         # print(item)
-        newinventory.append((item[6], item[2], item[3], 'Wireless AP',
-                             item[0], item[4], 'GetWLCAPs', item[5],
-                             None, None, 1))
-    return newinventory
+        yield (item[6], item[2], item[3], 'Wireless AP', item[0], item[4],
+               'GetWLCAPs', item[5], None, None, 1)
 
 
-def main():
-    mysqlenv = GetEnv.getparam("MySQL")
-    controllerlist = GetEnv.getparam("WLC")
-    deviceresults = []
+def stream_waps(controllerlist):
+    # Wireless APs of all controllers, one controller's reply at a time
     for controller in controllerlist:
         print(f"Processing WLC controller '{controller['alias']}' "
               f"/ {controller['host']}...")
-        xmlpayload = get_wap_info(controller)
+        with Metrics.timer("get_wap_info"):
+            xmlpayload = get_wap_info(controller)
         capwap_list, wap_map_list = extract_xml(xmlpayload)
-        merged_list = merge_wap_data(controller['alias'], capwap_list,
-                                     wap_map_list)
-        # print(f'Merged list of wireless Access Points:\n{merged_list}')
-        deviceresults += merged_list
-
-    print(f"Processing {len(deviceresults)} total wireless access points")
-    inventorylist = remap_inventory(deviceresults)
-
-    # Parameterized query time - nice...
-    SQL = f"""INSERT INTO {mysqlenv["database"]}.inventory
-    (hostname, mgmt_ip_address, serial_number, device_type,
-    device_group, model, source, software_version, location, contacts,
-    do_ping)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE hostname=VALUES(hostname),
-    serial_number=VALUES(serial_number),
-    device_type=VALUES(device_type),
-    model=VALUES(model),
-    software_version=VALUES(software_version)
-    """
+        yield from merge_wap_data(controller['alias'], capwap_list,
+                                  wap_map_list)
 
-    InsertUpdateMySQLv3.insertsql(mysqlenv, SQL, inventorylist)
+
+def main():
+    with Metrics.run("GetWLCAPs", GetEnv.getparam("Metrics")):
+        mysqlenv = GetEnv.getparam("MySQL")
+        controllerlist = GetEnv.getparam("WLC")
+        inventorylist = remap_inventory(stream_waps(controllerlist))
+        counts = InventoryMerge.merge(
+            mysqlenv, "WLC",
+            InventoryMerge.records(INVENTORY_COLUMNS, inventorylist),
+            GetEnv.getparam("InventoryMerge"))
+        print(f"Processed {counts['records']} total wireless access points")
+        Metrics.gauge("devices", counts["records"])
 
 
 if __name__ == "__main__":
-    main()
+    Profiling.run(main)
@@ -0,0 +1,514 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Merges the inventories of all sources into one row per device
+(InventoryMerge.py)
+
+#                                                                      #
+The same device can be reported by Prime Infrastructure, DNA Center,
+the ACI APICs and the WLCs, each with its own hostname, type or group.
+Upserting every collector's rows straight into the inventory table
+made the last collector to run win, and each run rewrote the fields
+the others had just written.
+
+Instead, each Get* collector hands its devices to merge().  Every
+source's latest view of a device is kept in the 'inventory_sources'
+table.  The values are normalized: whitespace is trimmed, empty and
+'Unknown' values count as missing, serial numbers are upper-cased and
+IP addresses are put in canonical form.  merge() reconciles the
+sources' views of each device in memory in one pass:
+
+    - records are joined into one device by mgmt_ip_address, and
+      records of different sources with the same serial_number are
+      one device even when reported with different IPs; the device
+      keeps the IP of the highest precedence source and the rows of
+      its other IPs are removed
+    - each field takes the value of the highest precedence source
+      that reports one - the Precedence list, or a per-field list in
+      FieldPrecedence - and is cleared when none does any more; the
+      columns the sources don't report (contacts, probe_type) keep
+      the inventory value
+    - do_ping is only taken from the sources when a device is added,
+      so pinging stays disabled where it was switched off by hand
+
+Only the inventory rows whose reconciled values differ from the table
+are written, so a collector run that changes nothing leaves the
+inventory table untouched and the result no longer depends on the
+order the collectors ran in.
+
+The devices are streamed: merge() pulls BatchSize records at a time
+from the collector's generator, stores them stamped with the run,
+reconciles just the devices they belong to and commits, before pulling
+the next batch.  Memory stays bounded by the batch (and the collector's
+current page) rather than the inventory size, and results are in the
+database as the collector goes.  When the collector is done, its
+records not stamped by this run - devices it no longer reports - are
+removed in batches and their devices reconciled again.  A device no
+source reports any more is removed from the inventory and pingresults
+tables; devices added to the inventory by hand, which no source ever
+reported, are left alone.
+Run this script to reconcile the inventory again after changing the
+precedence rules.
+
+Required inputs/variables:
+    optionsconfig.yaml InventoryMerge section (optional)
+        Precedence - list of sources, highest precedence first
+        FieldPrecedence - dictionary of field: list of sources
+        BatchSize - records written and committed at a time
+    optionsconfig.yaml MySQL section
+
+Outputs:
+    Rows of the inventory and inventory_sources tables
+
+Version log:
+v1      2026-1019   First release
+v2      2026-1019   Streams the records in batches, reconciling only
+    the devices of each batch
+v3      2026-1019   Batches changing the inventory increment the
+    QueryCache cycle generation
+v4      2026-1019   Removing duplicate devices invalidates the StateCache
+    snapshot, which would otherwise keep showing them
+v5      2026-1019   Devices no source reports any more are removed, and
+    fields only a removed source reported are cleared
+v6      2026-1019   Publishes the committed QueryCache generation
+
+Credits:
+"""
+__version__ = '6'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import time
+import ipaddress
+import DBConnect
+import QueryCache
+import GetEnv
+import Metrics
+import Profiling
+
+
+# Script-global variables
+DEFAULT_PRECEDENCE = ["DNACenter", "PrimeInfrastructure", "ACIAPIC", "WLC"]
+DEFAULT_BATCH_SIZE = 500
+
+# Inventory columns the sources report, besides mgmt_ip_address
+FIELDS = ("hostname", "serial_number", "device_type", "device_group",
+          "model", "source", "software_version", "location", "do_ping")
+
+# Fields only taken from the sources when the device is added
+INSERT_ONLY_FIELDS = ("do_ping",)
+
+# Tuple layout of the Prime Infrastructure, DNA Center and APIC
+#  collectors' device records
+CONTROLLER_COLUMNS = ("hostname", "mgmt_ip_address", "device_type",
+                      "device_group", "source", "do_ping")
+
+_MISSING = ("", "unknown")
+
+
+def _text(value):
+    if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+        return None
+    value = str(value).strip()
+    return None if value.lower() in _MISSING else value
+
+
+def normalize(record):
+    """Normalize one device record of a source
+
+    :param record: dictionary of inventory column: value
+    :returns: dictionary of mgmt_ip_address and FIELDS, or None when
+        the record has no valid IP address
+    """
+    try:
+        ip = ipaddress.ip_address(_text(record.get("mgmt_ip_address")))
+    except ValueError:
+        return None
+    normalized = {"mgmt_ip_address": ip.compressed}
+    for field in FIELDS:
+        normalized[field] = _text(record.get(field))
+    if normalized["serial_number"] is not None:
+        normalized["serial_number"] = \
+            normalized["serial_number"].replace(" ", "").upper()
+    if normalized["do_ping"] is not None:
+        normalized["do_ping"] = int(normalized["do_ping"])
+    return normalized
+
+
+def records(columns, rows):
+    """Turn a collector's device tuples into records
+
+    :param columns: tuple of the inventory column of each tuple item
+    :param rows: iterable of tuples of device parameters
+    :returns: generator of dictionaries of inventory column: value
+    """
+    return (dict(zip(columns, row)) for row in rows)
+
+
+def precedence(mergeparams):
+    """Sources in precedence order for each field
+
+    :param mergeparams: dictionary of InventoryMerge settings or None
+    :returns: dictionary of field: dictionary of source: rank, lowest
+        first
+    """
+    mergeparams = mergeparams or {}
+    ranks = {}
+    for field in ("mgmt_ip_address",) + FIELDS:
+        order = (mergeparams.get("FieldPrecedence") or {}).get(field) or \
+            mergeparams.get("Precedence", DEFAULT_PRECEDENCE)
+        ranks[field] = {collector: rank
+                        for rank, collector in enumerate(order)}
+    return ranks
+
+
+def group_devices(observations):
+    """Join the sources' records into devices
+
+    Records with the same IP are one device, as are records of
+    different sources with the same serial number.
+
+    :param observations: dictionary of (collector, IP): record
+    :returns: list of lists of (collector, IP) keys, one per device
+    """
+    parent = {}
+
+    def find(ip):
+        parent.setdefault(ip, ip)
+        while parent[ip] != ip:
+            parent[ip] = parent[parent[ip]]
+            ip = parent[ip]
+        return ip
+
+    serials = {}
+    for (collector, ip), record in observations.items():
+        find(ip)
+        serial = record["serial_number"]
+        if serial is None:
+            continue
+        for (other, other_ip) in serials.setdefault(serial, []):
+            if other != collector:
+                parent[find(ip)] = find(other_ip)
+        serials[serial].append((collector, ip))
+
+    devices = {}
+    for key in observations:
+        devices.setdefault(find(key[1]), []).append(key)
+    return list(devices.values())
+
+
+def reconcile(keys, observations, inventory, ranks):
+    """Reconcile the sources' records of one device
+
+    :param keys: list of (collector, IP) keys of the device's records
+    :param observations: dictionary of (collector, IP): record
+    :param inventory: dictionary of IP: dictionary of the current
+        inventory row
+    :param ranks: dictionary of field precedence from precedence()
+    :returns: ip, row, aliases - string of the device's IP, dictionary
+        of its reconciled inventory row and list of its other IPs
+    """
+    def ranked(field):
+        if len(keys) == 1:
+            return keys
+        order = ranks[field]
+        # Unlisted sources rank last, then by IP for a stable choice
+        return sorted(keys, key=lambda key: (order.get(key[0], len(order)),
+                                             key[0], key[1]))
+
+    ips = list(dict.fromkeys(ip for _, ip in ranked("mgmt_ip_address")))
+    ip = ips[0]
+    row = dict(inventory.get(ip) or {})
+    for field in FIELDS:
+        if field in INSERT_ONLY_FIELDS and ip in inventory:
+            continue
+        # None when no source reports the field (any more)
+        row[field] = next((observations[key][field]
+                           for key in ranked(field)
+                           if observations[key][field] is not None), None)
+    row["mgmt_ip_address"] = ip
+    return ip, row, ips[1:]
+
+
+def _changed(row, current):
+    return current is None or \
+        any(row.get(field) != current[field] for field in FIELDS)
+
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def batches(items, size):
+    """Group an iterable into lists, pulling only one list at a time
+
+    :param items: iterable
+    :param size: integer maximum items per list
+    :returns: generator of lists
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_observations(cursor, database, ips, serials=()):
+    """Load the sources' records of the devices of some IPs
+
+    Follows serial numbers, so a device's records under its other IPs
+    are included.
+
+    :param cursor: database cursor
+    :param database: string of the database name
+    :param ips: list of IPs
+    :param serials: list of serial numbers to follow as well
+    :returns: dictionary of (collector, IP): record
+    """
+    columns = ", ".join(FIELDS)
+    observations = {}
+    (queried_ips, queried_serials) = (set(), set())
+    (ips, serials) = (sorted(set(ips)), sorted(set(serials) - {None}))
+    while ips or serials:
+        clauses = []
+        if ips:
+            clauses.append(f"mgmt_ip_address IN ({_placeholders(ips)})")
+        if serials:
+            clauses.append(f"serial_number IN ({_placeholders(serials)})")
+        cursor.execute(f"""SELECT collector, mgmt_ip_address, {columns}
+        FROM {database}.inventory_sources
+        WHERE {" OR ".join(clauses)}
+        """, ips + serials)
+        for row in cursor.fetchall():
+            observations[(row[0], row[1])] = dict(zip(FIELDS, row[2:]))
+        queried_ips.update(ips)
+        queried_serials.update(serials)
+        ips = sorted({ip for (_, ip) in observations} - queried_ips)
+        serials = sorted({record["serial_number"]
+                          for record in observations.values()} -
+                         queried_serials - {None})
+    return observations
+
+
+def reconcile_ips(cursor, database, ips, serials, ranks):
+    """Reconcile the inventory rows of the devices of some IPs
+
+    The rows of IPs that no source reports any more are removed.
+
+    :param cursor: database cursor
+    :param database: string of the database name
+    :param ips: list of IPs
+    :param serials: list of serial numbers whose devices to reconcile
+        as well
+    :param ranks: dictionary of field precedence from precedence()
+    :returns: written, removed, orphaned - integer inventory rows
+        written, duplicate rows removed and rows of devices no source
+        reports removed
+    """
+    observations = load_observations(cursor, database, ips, serials)
+    reported = {ip for (_, ip) in observations}
+    device_ips = sorted(reported | set(ips))
+    columns = ", ".join(FIELDS)
+    cursor.execute(f"""SELECT mgmt_ip_address, {columns}
+    FROM {database}.inventory
+    WHERE mgmt_ip_address IN ({_placeholders(device_ips)})
+    """, device_ips)
+    inventory = {row[0]: dict(zip(FIELDS, row[1:]))
+                 for row in cursor.fetchall()}
+
+    rows = []
+    aliases = []
+    for keys in group_devices(observations):
+        (ip, row, other_ips) = reconcile(keys, observations, inventory,
+                                         ranks)
+        if _changed(row, inventory.get(ip)):
+            rows.append(tuple(row.get(field) for field in FIELDS) + (ip,))
+        aliases.extend((other,) for other in other_ips if other in inventory)
+    orphans = [(ip,) for ip in sorted(set(ips) - reported) if ip in inventory]
+    if rows:
+        updates = ", ".join(f"{field}=VALUES({field})" for field in FIELDS)
+        cursor.executemany(f"""INSERT INTO {database}.inventory
+        ({columns}, mgmt_ip_address)
+        VALUES ({_placeholders(FIELDS + ("mgmt_ip_address",))})
+        ON DUPLICATE KEY UPDATE {updates}
+        """, rows)
+    if aliases or orphans:
+        # The device is pinged and shown under its merged IP only, and
+        #  not at all once no source reports it
+        for table in ("inventory", "pingresults"):
+            cursor.executemany(f"""DELETE FROM {database}.{table}
+            WHERE mgmt_ip_address = %s
+            """, aliases + orphans)
+    return len(rows), len(aliases), len(orphans)
+
+
+def write_records(cursor, database, collector, received, run):
+    """Store a batch of a source's records, stamped with the run
+
+    :param cursor: database cursor
+    :param database: string of the database name
+    :param collector: string naming the source
+    :param received: dictionary of IP: normalized record
+    :param run: integer run stamp (ns)
+    :returns: None
+    """
+    ips = list(received)
+    columns = ", ".join(FIELDS)
+    cursor.execute(f"""SELECT mgmt_ip_address, last_seen, {columns}
+    FROM {database}.inventory_sources
+    WHERE collector = %s AND mgmt_ip_address IN ({_placeholders(ips)})
+    """, [collector] + ips)
+    for row in cursor.fetchall():
+        if row[1] == run:
+            # Listed again this run (eg. by a second server) - the
+            #  first listing's values win
+            record = received[row[0]]
+            for field, value in zip(FIELDS, row[2:]):
+                if value is not None:
+                    record[field] = value
+    updates = ", ".join(f"{field}=VALUES({field})"
+                        for field in FIELDS + ("last_seen",))
+    cursor.executemany(f"""INSERT INTO {database}.inventory_sources
+    (collector, mgmt_ip_address, {columns}, last_seen)
+    VALUES ({_placeholders(range(len(FIELDS) + 3))})
+    ON DUPLICATE KEY UPDATE {updates}
+    """, [(collector, ip) + tuple(record[field] for field in FIELDS) + (run,)
+          for ip, record in received.items()])
+
+
+def merge(serverparams, collector, devices, mergeparams=None):
+    """Merge a source's devices into the inventory
+
+    The devices are consumed in batches of BatchSize, each written and
+    committed before the next is pulled, so a generator of devices is
+    never read further ahead than one batch.  Once all are consumed,
+    the source's records not seen in this run are removed, along with
+    the inventory rows of the devices no other source reports.  When
+    devices were removed, the StateCache snapshot is invalidated so the
+    next ping cycle reads the results from MySQL.
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
+    :param collector: string naming the source (eg. 'DNACenter'), or
+        None to only reconcile the stored records
+    :param devices: iterable of dictionaries of inventory column:
+        value; the complete inventory of the source
+    :param mergeparams: dictionary of InventoryMerge settings or None
+    :returns: dictionary of counts of records and rows written
+    """
+    database = serverparams["database"]
+    batch_size = (mergeparams or {}).get("BatchSize", DEFAULT_BATCH_SIZE)
+    ranks = precedence(mergeparams)
+    run = time.time_ns()
+    queryparams = GetEnv.getparam("QueryCache")
+    bump = QueryCache.enabled(queryparams)
+    gen = None
+    counts = {"records": 0, "invalid": 0, "batches": 0,
+              "sources_removed": 0, "inventory_written": 0,
+              "duplicates_removed": 0, "devices_removed": 0}
+
+    def add(result):
+        nonlocal gen
+        counts["inventory_written"] += result[0]
+        counts["duplicates_removed"] += result[1]
+        counts["devices_removed"] += result[2]
+        if bump and any(result):
+            # The dashboard queries join the inventory
+            gen = QueryCache.bump_generation(cursor, database)
+
+    def commit():
+        nonlocal gen
+        db.commit()
+        if gen is not None:
+            QueryCache.publish(queryparams, serverparams, gen)
+            gen = None
+
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+    for batch in batches(devices if collector is not None else (),
+                         batch_size):
+        received = {}
+        for device in batch:
+            record = normalize(device)
+            if record is None:
+                counts["invalid"] += 1
+                continue
+            counts["records"] += 1
+            # A device listed twice (eg. by two servers) - first value wins
+            previous = received.setdefault(record["mgmt_ip_address"], record)
+            for field in FIELDS:
+                if previous[field] is None:
+                    previous[field] = record[field]
+        with Metrics.timer("merge_inventory"):
+            if received:
+                write_records(cursor, database, collector, received, run)
+                add(reconcile_ips(cursor, database, list(received), (),
+                                  ranks))
+            commit()
+        counts["batches"] += 1
+
+    while collector is not None:
+        # Sweep the devices the source no longer reports
+        cursor.execute(f"""SELECT mgmt_ip_address, serial_number
+        FROM {database}.inventory_sources
+        WHERE collector = %s AND last_seen < %s
+        LIMIT %s
+        """, (collector, run, batch_size))
+        removed = cursor.fetchall()
+        if not removed:
+            break
+        cursor.executemany(f"""DELETE FROM {database}.inventory_sources
+        WHERE collector = %s AND mgmt_ip_address = %s
+        """, [(collector, ip) for (ip, _) in removed])
+        add(reconcile_ips(cursor, database, [ip for (ip, _) in removed],
+                          [serial for (_, serial) in removed], ranks))
+        commit()
+        counts["sources_removed"] += len(removed)
+
+    last = ""
+    while collector is None:
+        # Reconcile every stored device, eg. after precedence changes
+        cursor.execute(f"""SELECT DISTINCT mgmt_ip_address
+        FROM {database}.inventory_sources
+        WHERE mgmt_ip_address > %s
+        ORDER BY mgmt_ip_address
+        LIMIT %s
+        """, (last, batch_size))
+        ips = [row[0] for row in cursor.fetchall()]
+        if not ips:
+            break
+        add(reconcile_ips(cursor, database, ips, (), ranks))
+        commit()
+        last = ips[-1]
+    cursor.close()
+    db.close()
+    if counts["duplicates_removed"] or counts["devices_removed"]:
+        import StateCache
+        cacheparams = GetEnv.getparam("StateCache")
+        if StateCache.enabled(cacheparams):
+            # The snapshot still has the removed pingresults rows
+            StateCache.invalidate(cacheparams)
+
+    print(f"Inventory merge: {counts['records']} records "
+          f"({counts['invalid']} invalid) in {counts['batches']} batches, "
+          f"{counts['inventory_written']} inventory rows written, "
+          f"{counts['duplicates_removed']} duplicates and "
+          f"{counts['devices_removed']} unreported devices removed")
+    for name, value in counts.items():
+        Metrics.gauge(f"merge_{name}", value)
+    return counts
+
+
+def main():
+    with Metrics.run("InventoryMerge", GetEnv.getparam("Metrics")):
+        merge(GetEnv.getparam("MySQL"), None, [],
+              GetEnv.getparam("InventoryMerge"))
+
+
+if __name__ == "__main__":
+    Profiling.run(main)
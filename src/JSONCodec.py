@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Pluggable JSON codec for payload parsing (JSONCodec.py)
+
+#                                                                      #
+The fping output of every poll cycle, the controller REST API pages
+and the regional poller batches are all JSON documents of thousands
+of devices.  This module parses and encodes them with the fastest
+library installed - orjson, then ujson, falling back to the standard
+library json module - so the speed-up is there when the optional
+package is installed and nothing breaks when it is not.
+
+loads() takes bytes as well as strings, so payloads are parsed straight
+from subprocess output or requests' response.content, without the copy
+of a .decode() - or the character set detection of response.text.
+dumps() always returns compact UTF-8 bytes.  Every backend raises a
+ValueError subclass on malformed input, like json.JSONDecodeError.
+
+Run 'python Benchmark.py --json-codecs' to time the installed backends
+on realistic payloads.
+
+Required inputs/variables:
+    Optional packages orjson or ujson (pip install orjson)
+
+Outputs:
+    Parsed Python objects / bytes of JSON
+
+Version log:
+v1      2026-1019   First release
+
+Credits:
+"""
+__version__ = '1'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import json
+import importlib
+
+
+# Script-global variables
+BACKENDS = ("orjson", "ujson", "json")
+
+backend = None
+_loads = None
+_dumps = None
+
+
+def _stdlib_dumps(obj, default=None):
+    return json.dumps(obj, separators=(",", ":"),
+                      default=default).encode("utf-8")
+
+
+def _codec(name):
+    # loads and dumps functions of a backend; ImportError if missing
+    if name == "json":
+        return json.loads, _stdlib_dumps
+    module = importlib.import_module(name)
+    if name == "orjson":
+        return module.loads, \
+            lambda obj, default=None: module.dumps(obj, default=default)
+    return module.loads, \
+        lambda obj, default=None: module.dumps(
+            obj, default=default, ensure_ascii=False).encode("utf-8")
+
+
+def available():
+    """Installed backends, fastest first
+
+    :returns: list of backend names
+    """
+    names = []
+    for name in BACKENDS:
+        try:
+            _codec(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def use(name=None):
+    """Select the backend
+
+    :param name: string of a backend name, or None for the fastest
+        installed one
+    :returns: string of the selected backend name
+    :raises ImportError: when the named backend is not installed
+    """
+    global backend, _loads, _dumps
+    for candidate in BACKENDS if name is None else (name,):
+        try:
+            (_loads, _dumps) = _codec(candidate)
+        except ImportError:
+            if name is not None:
+                raise
+            continue
+        backend = candidate
+        return backend
+
+
+def loads(data):
+    """Parse a JSON document
+
+    :param data: bytes or string of JSON
+    :returns: parsed object
+    :raises ValueError: when the data is not valid JSON
+    """
+    return _loads(data)
+
+
+def dumps(obj, default=None):
+    """Encode an object as compact JSON
+
+    :param obj: object to encode
+    :param default: optional function converting objects the backend
+        can't encode (eg. float for Decimal)
+    :returns: bytes of UTF-8 JSON
+    """
+    return _dumps(obj, default=default)
+
+
+use()
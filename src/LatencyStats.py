@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Rolling per-device latency statistics (LatencyStats.py)
+
+#                                                                      #
+Keeps a rolling window of the last N poll cycle latency samples for
+every device in a compact NumPy ring buffer (one float32 row per
+device, one column per poll cycle).  Percentiles (p50/p95/p99) and
+jitter are computed for all devices at once with vectorized NumPy
+operations rather than per device.
+
+The ring buffer is persisted between cron invocations in a small
+.npz state file so the window survives across poll cycles.
+
+Required inputs/variables:
+    optionsconfig.yaml LatencyStats section (optional)
+        Window - number of poll cycles kept per device
+        StateFile - path of the .npz file holding the ring buffer
+        UseP95 - classify latent devices by p95 instead of the
+            3-packet average
+
+Outputs:
+    LatencyStats object providing percentile/jitter summaries
+
+Version log:
+v1      2026-1019   First release
+v2      2026-1019   A damaged state file starts a fresh window
+    instead of failing every cycle
+
+Credits:
+"""
+__version__ = '2'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import os
+import zipfile
+import numpy as np
+
+
+# Script-global variables
+DEFAULT_WINDOW = 60
+DEFAULT_STATEFILE = "latencystats.npz"
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyStats:
+    """Rolling window of latency samples for many devices
+
+    Samples are stored in a 2-D float32 array (devices x window) used
+    as a ring buffer.  Every call to record() is one poll cycle and
+    advances the shared write cursor by one column; devices without a
+    sample for the cycle (down, not probed) get NaN for that slot.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = int(window)
+        self.index = {}
+        self.ips = []
+        self.samples = np.full((0, self.window), np.nan, dtype=np.float32)
+        self.cursor = -1
+
+    def _rows_for(self, ips):
+        """Return the ring buffer row numbers for ips, adding new rows
+        for devices not seen before
+        """
+        new_ips = [ip for ip in dict.fromkeys(ips) if ip not in self.index]
+        if new_ips:
+            for ip in new_ips:
+                self.index[ip] = len(self.ips)
+                self.ips.append(ip)
+            grow = np.full((len(new_ips), self.window), np.nan,
+                           dtype=np.float32)
+            self.samples = np.vstack((self.samples, grow))
+        return np.fromiter((self.index[ip] for ip in ips), dtype=np.int64,
+                           count=len(ips))
+
+    def record(self, ips, latencies):
+        """Record one poll cycle of latency samples
+
+        :param ips: list of device IP addresses probed this cycle
+        :param latencies: list of latency values in ms aligned with
+            ips; None for devices that did not answer
+        :returns: None
+        """
+        rows = self._rows_for(ips)
+        values = np.array([np.nan if value is None else float(value)
+                           for value in latencies], dtype=np.float32)
+        self.cursor = (self.cursor + 1) % self.window
+        self.samples[:, self.cursor] = np.nan
+        self.samples[rows, self.cursor] = values
+
+    def retain(self, ips):
+        """Drop devices no longer in inventory from the ring buffer
+
+        :param ips: iterable of device IP addresses to keep
+        :returns: None
+        """
+        wanted = set(ips)
+        keep = [ip for ip in self.ips if ip in wanted]
+        if len(keep) == len(self.ips):
+            return
+        rows = [self.index[ip] for ip in keep]
+        self.samples = self.samples[rows]
+        self.ips = keep
+        self.index = {ip: row for row, ip in enumerate(keep)}
+
+    def _chronological(self):
+        # Re-order columns oldest sample first
+        order = (np.arange(self.window) + self.cursor + 1) % self.window
+        return self.samples[:, order]
+
+    def percentiles(self, percentiles=PERCENTILES):
+        """Compute latency percentiles for all devices
+
+        Vectorized equivalent of numpy.nanpercentile (linear
+        interpolation) along the sample axis: NaN sorts to the end of
+        each row, so only the first n valid values of a row are used.
+
+        :param percentiles: sequence of percentiles (0-100)
+        :returns: float32 array (devices x len(percentiles)); NaN where
+            a device has no samples in the window
+        """
+        ordered = np.sort(self.samples, axis=1)
+        valid = np.count_nonzero(~np.isnan(self.samples), axis=1)
+        fraction = np.asarray(percentiles, dtype=np.float64) / 100.0
+        position = (np.maximum(valid, 1) - 1)[:, None] * fraction[None, :]
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, np.maximum(valid, 1)[:, None] - 1)
+        weight = (position - lower).astype(np.float32)
+        low_values = np.take_along_axis(ordered, lower, axis=1)
+        high_values = np.take_along_axis(ordered, upper, axis=1)
+        result = low_values + (high_values - low_values) * weight
+        result[valid == 0] = np.nan
+        return result
+
+    def jitter(self):
+        """Compute jitter for all devices
+
+        Jitter is the mean absolute difference between consecutive
+        samples in the window; gaps (NaN) are skipped.
+
+        :returns: float32 array of jitter per device; NaN where a
+            device has fewer than two consecutive samples
+        """
+        deltas = np.abs(np.diff(self._chronological(), axis=1))
+        counts = np.count_nonzero(~np.isnan(deltas), axis=1)
+        totals = np.nansum(deltas, axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = (totals / counts).astype(np.float32)
+        result[counts == 0] = np.nan
+        return result
+
+    def summary(self, ips):
+        """Summarize p50/p95/p99 latency and jitter for devices
+
+        :param ips: list of device IP addresses
+        :returns: list of (p50, p95, p99, jitter) tuples aligned with
+            ips, values rounded to 2 decimals or None when unknown
+        """
+        rows = self._rows_for(ips)
+        table = np.column_stack((self.percentiles(), self.jitter()))[rows]
+        table = np.round(table.astype(np.float64), 2)
+        return [tuple(None if np.isnan(value) else value for value in row)
+                for row in table.tolist()]
+
+    def save(self, statefile):
+        """Atomically write the ring buffer to a .npz state file
+
+        :param statefile: path of the state file
+        :returns: None
+        """
+        tmpfile = statefile + ".tmp"
+        with open(tmpfile, "wb") as outfile:
+            np.savez(outfile, ips=np.array(self.ips, dtype=str),
+                     samples=self.samples, cursor=self.cursor)
+        os.replace(tmpfile, statefile)
+
+
+def load(statefile=DEFAULT_STATEFILE, window=DEFAULT_WINDOW):
+    """Load rolling latency statistics from a state file
+
+    A missing, unreadable or damaged state file, or one written with a
+    different window size, starts a fresh window.
+
+    :param statefile: path of the .npz state file
+    :param window: number of poll cycles kept per device
+    :returns: LatencyStats object
+    """
+    stats = LatencyStats(window)
+    try:
+        with np.load(statefile) as state:
+            samples = state["samples"]
+            ips = state["ips"].tolist()
+            cursor = int(state["cursor"])
+    except (OSError, KeyError, ValueError, EOFError,
+            zipfile.BadZipFile):
+        return stats
+    if samples.shape != (len(ips), stats.window):
+        return stats
+    stats.samples = samples.astype(np.float32)
+    stats.ips = ips
+    stats.index = {ip: row for row, ip in enumerate(ips)}
+    stats.cursor = cursor
+    return stats
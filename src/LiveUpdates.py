@@ -0,0 +1,399 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Live dashboard updates over server-sent events (LiveUpdates.py)
+
+#                                                                      #
+The dashboard pages reload every 300 seconds, so a NOC screen learns
+of an outage minutes after the poll cycle found it.  This small
+asyncio HTTP service pushes every device's state changes to the open
+dashboard pages as soon as a poll cycle commits:
+
+    GET /events - server-sent events (text/event-stream)
+        'state' - every device's state and the fleet counts; sent
+            when a page connects, or reconnects having missed updates
+        'delta' - the devices whose state changed, the devices
+            removed and the fleet counts, after each poll cycle
+    GET /state  - every device's state as JSON, with an ETag
+    GET /health - 'ok' and the number of connected pages
+
+The service watches the StateCache snapshot the pinger writes after
+every committed cycle (checked every WatchInterval seconds) and reads
+pingresults from MySQL every DatabaseInterval seconds when there is
+no fresh snapshot (eg. with sharded or regional pollers).  Devices are
+classified exactly like the dashboard cells.  Each change is
+serialized once and the same bytes are written to every connected
+page, so one process serves hundreds of viewers; a page whose unsent
+data exceeds MaxBuffer is disconnected and reconnects with a full
+state.  Set Dashboard LiveURL (eg. /live behind an Apache ProxyPass)
+so the published pages subscribe to the events.
+
+Required inputs/variables:
+    optionsconfig.yaml LiveUpdates section (optional)
+        Host, Port - address the service listens on
+        WatchInterval - seconds between checks of the snapshot
+        DatabaseInterval - seconds between MySQL reads without one
+        KeepAlive - seconds between keep-alive comments to the pages
+        MaxClients - connected pages served at once
+        MaxBuffer - bytes of unsent data before a page is dropped
+        AllowOrigin - Access-Control-Allow-Origin header, when pages
+            are served from another origin than the service
+    optionsconfig.yaml StateCache, QueryCache, Sharding,
+        RegionalPollers, MySQL, LatencyThreshold and LatencyStats
+        sections
+
+Outputs:
+    HTTP service
+
+Version log:
+v1      2026-1019   First release
+v2      2026-1019   Reads MySQL through the QueryCache
+
+Credits:
+"""
+__version__ = '2'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import os
+import sys
+import time
+import asyncio
+import JSONCodec
+import GetEnv
+import Profiling
+
+
+# Script-global variables
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_WATCH_INTERVAL = 1.0
+DEFAULT_DATABASE_INTERVAL = 15
+DEFAULT_KEEPALIVE = 15
+DEFAULT_MAX_CLIENTS = 1000
+DEFAULT_MAX_BUFFER = 1048576
+REQUEST_TIMEOUT = 10
+# Milliseconds before a disconnected page reconnects
+RETRY_MS = 5000
+STAT_NAMES = ("down", "up", "dropping", "latent", "flapping")
+DEVICE_FIELDS = ("class", "stale", "hostname", "reachable_pct",
+                 "avg_latency", "max_latency", "down_count", "lastup",
+                 "flap_score")
+STATUS_TEXT = {200: "OK", 304: "Not Modified", 400: "Bad Request",
+               404: "Not Found", 405: "Method Not Allowed",
+               503: "Service Unavailable"}
+
+
+def _number(value):
+    return None if value is None else float(value)
+
+
+def device_states(snapshot, threshold, use_p95=False):
+    """Dashboard state of every device
+
+    :param snapshot: StateCache.DeviceSnapshot of the ping results
+    :param threshold: latency threshold in ms, as LatencyThreshold
+    :param use_p95: boolean; classify latent devices by p95 latency
+    :returns: devices, stats - dictionary of IP: tuple of
+        DEVICE_FIELDS and dictionary of STAT_NAMES: device count
+    """
+    import CreateAvailabilityDashboard
+
+    rows = snapshot.rows()
+    (order, classes, stats) = CreateAvailabilityDashboard.classify_columns(
+        snapshot.array, threshold, use_p95)
+    devices = {}
+    for (index, endpointclass) in zip(order.tolist(), classes):
+        row = rows[index]
+        devices[row[1]] = (endpointclass, bool(row[13]), row[0], row[2],
+                           _number(row[3]), _number(row[4]), row[6],
+                           None if row[5] is None else str(row[5]), row[9])
+    return devices, dict(zip(STAT_NAMES, stats))
+
+
+def _event(kind, event_id, payload):
+    return b"id: " + event_id.encode() + b"\nevent: " + kind.encode() + \
+        b"\ndata: " + JSONCodec.dumps(payload) + b"\n\n"
+
+
+class LiveState:
+    """Latest device states and their serialized events
+
+    Every change is serialized once - as a full state and as a delta
+    from the previous one - and shared by all connected pages.
+    """
+
+    def __init__(self):
+        # Event ids restart with the service; the token tells a page
+        #  reconnecting to a restarted service that it missed updates
+        self.token = format(time.time_ns(), "x")
+        self.generation = 0
+        self.devices = {}
+        self.stats = {}
+        self.event_id = None
+        self.previous_id = None
+        self.state_json = None
+        self.state_event = None
+        self.delta_event = None
+
+    def update(self, devices, stats):
+        """Apply the latest device states
+
+        :param devices: dictionary of IP: tuple of DEVICE_FIELDS
+        :param stats: dictionary of STAT_NAMES: device count
+        :returns: bytes of the delta event, or None when nothing changed
+            (or for the first states)
+        """
+        changed = {ip: state for ip, state in devices.items()
+                   if self.devices.get(ip) != state}
+        removed = [ip for ip in self.devices if ip not in devices]
+        if self.event_id is not None and not changed and not removed \
+                and stats == self.stats:
+            return None
+
+        self.generation += 1
+        self.previous_id = self.event_id
+        self.event_id = f"{self.token}-{self.generation}"
+        first = not self.devices and self.previous_id is None
+        self.devices = devices
+        self.stats = stats
+        state = {"id": self.event_id, "time": int(time.time()),
+                 "fields": DEVICE_FIELDS, "stats": stats, "devices": devices}
+        self.state_json = JSONCodec.dumps(state)
+        self.state_event = b"id: " + self.event_id.encode() + \
+            b"\nevent: state\ndata: " + self.state_json + b"\n\n"
+        if first:
+            self.delta_event = None
+            return None
+        self.delta_event = _event("delta", self.event_id, {
+            "id": self.event_id, "previous": self.previous_id,
+            "time": state["time"], "fields": DEVICE_FIELDS,
+            "stats": stats, "devices": changed, "removed": removed})
+        return self.delta_event
+
+    def catch_up(self, last_event_id):
+        """Events a connecting page needs to be up to date
+
+        :param last_event_id: string of the page's Last-Event-ID or None
+        :returns: bytes
+        """
+        if self.event_id is None or last_event_id == self.event_id:
+            return b""
+        if last_event_id == self.previous_id and \
+                self.delta_event is not None:
+            return self.delta_event
+        return self.state_event
+
+
+class LiveServer:
+    """Serves the device states and pushes their changes
+
+    :param liveparams: dictionary of LiveUpdates settings or None
+    :param load: function returning (devices, stats), see
+        device_states(); called in a worker thread
+    :param source_version: function returning a value that changes
+        when load() may return new states
+    """
+
+    def __init__(self, liveparams, load, source_version):
+        liveparams = liveparams or {}
+        self.params = liveparams
+        self.load = load
+        self.source_version = source_version
+        self.state = LiveState()
+        self.clients = set()
+        self.max_clients = liveparams.get("MaxClients", DEFAULT_MAX_CLIENTS)
+        self.max_buffer = liveparams.get("MaxBuffer", DEFAULT_MAX_BUFFER)
+        origin = liveparams.get("AllowOrigin")
+        self.cors = f"Access-Control-Allow-Origin: {origin}\r\n" \
+            if origin else ""
+
+    def broadcast(self, data):
+        """Write the same bytes to every connected page
+
+        :param data: bytes of an event or comment
+        :returns: integer number of pages written to
+        """
+        for writer in list(self.clients):
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                # Too slow to keep up; it reconnects for a full state
+                self.clients.discard(writer)
+                writer.transport.abort()
+                continue
+            writer.write(data)
+        return len(self.clients)
+
+    async def refresh(self):
+        """Load the states and push the changes
+
+        :returns: integer number of pages notified, 0 when unchanged
+        """
+        loop = asyncio.get_running_loop()
+        (devices, stats) = await loop.run_in_executor(None, self.load)
+        delta = self.state.update(devices, stats)
+        if delta is None:
+            return 0
+        return self.broadcast(delta)
+
+    async def watch(self):
+        interval = self.params.get("WatchInterval", DEFAULT_WATCH_INTERVAL)
+        version = None
+        while True:
+            current = self.source_version()
+            if current != version:
+                try:
+                    notified = await self.refresh()
+                except Exception as e:  # keep serving the last states
+                    print(f"Loading the device states failed: {e}",
+                          file=sys.stderr)
+                else:
+                    version = current
+                    if notified:
+                        print(f"{time.strftime('%H:%M:%S')} update "
+                              f"{self.state.event_id} sent to {notified} "
+                              f"pages")
+            await asyncio.sleep(interval)
+
+    async def keepalive(self):
+        interval = self.params.get("KeepAlive", DEFAULT_KEEPALIVE)
+        while True:
+            await asyncio.sleep(interval)
+            # Keeps proxies from timing out idle streams and finds
+            #  pages that went away
+            self.broadcast(b": keepalive\n\n")
+
+    def respond(self, writer, status, body=b"",
+                content_type="text/plain; charset=utf-8", headers=""):
+        writer.write(f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                     f"Content-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Cache-Control: no-cache\r\n{self.cors}{headers}"
+                     f"Connection: close\r\n\r\n".encode() + body)
+
+    async def stream(self, reader, writer, headers):
+        if len(self.clients) >= self.max_clients:
+            self.respond(writer, 503, b"Too many connected pages\n")
+            return
+        writer.write(f"HTTP/1.1 200 OK\r\n"
+                     f"Content-Type: text/event-stream\r\n"
+                     f"Cache-Control: no-cache\r\n{self.cors}"
+                     f"X-Accel-Buffering: no\r\n\r\n"
+                     f"retry: {RETRY_MS}\n\n".encode())
+        writer.write(self.state.catch_up(headers.get("last-event-id")))
+        self.clients.add(writer)
+        try:
+            # Pages send nothing more; returns when they disconnect
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(writer)
+
+    async def handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"),
+                                             REQUEST_TIMEOUT)
+            lines = request.decode("latin-1").split("\r\n")
+            (method, target, _) = lines[0].split(" ", 2)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                asyncio.TimeoutError, ConnectionError):
+            writer.close()
+            return
+        except ValueError:
+            self.respond(writer, 400)
+            writer.close()
+            return
+        headers = {}
+        for line in lines[1:]:
+            (name, _, value) = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        path = target.split("?", 1)[0]
+
+        try:
+            if method != "GET":
+                self.respond(writer, 405, headers="Allow: GET\r\n")
+            elif path == "/events":
+                await self.stream(reader, writer, headers)
+            elif path == "/state":
+                if self.state.state_json is None:
+                    self.respond(writer, 503, b"No device states yet\n")
+                elif headers.get("if-none-match") == \
+                        f'"{self.state.event_id}"':
+                    self.respond(writer, 304)
+                else:
+                    self.respond(writer, 200, self.state.state_json,
+                                 "application/json",
+                                 f'ETag: "{self.state.event_id}"\r\n')
+            elif path == "/health":
+                self.respond(writer, 200,
+                             f"ok {len(self.clients)} pages\n".encode())
+            else:
+                self.respond(writer, 404)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        host = self.params.get("Host", DEFAULT_HOST)
+        port = self.params.get("Port", DEFAULT_PORT)
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving live updates on http://{host}:{port}/events")
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.watch(),
+                                 self.keepalive())
+
+
+def main():
+    import StateCache
+    import ShardLeases
+    import RegionalPollers
+
+    liveparams = GetEnv.getparam("LiveUpdates") or {}
+    serverparams = GetEnv.getparam("MySQL")
+    threshold = GetEnv.getparam("LatencyThreshold")
+    use_p95 = (GetEnv.getparam("LatencyStats") or {}).get("UseP95", False)
+    cacheparams = GetEnv.getparam("StateCache")
+    queryparams = GetEnv.getparam("QueryCache")
+    # Like the renderer: sharded and regional pollers each see only
+    #  their own devices and don't write the snapshot
+    if not StateCache.enabled(cacheparams) or \
+            ShardLeases.enabled(GetEnv.getparam("Sharding")) or \
+            RegionalPollers.enabled(GetEnv.getparam("RegionalPollers")):
+        cacheparams = None
+    snapshotfile = (cacheparams or {}).get("SnapshotFile",
+                                           StateCache.DEFAULT_SNAPSHOT_FILE)
+    max_age = (cacheparams or {}).get("MaxAge", StateCache.DEFAULT_MAX_AGE)
+    database_interval = liveparams.get("DatabaseInterval",
+                                       DEFAULT_DATABASE_INTERVAL)
+
+    def source_version():
+        if cacheparams is not None:
+            try:
+                status = os.stat(snapshotfile)
+            except OSError:
+                status = None
+            if status is not None and time.time() - status.st_mtime <= max_age:
+                return status.st_mtime_ns
+        return -int(time.monotonic() // database_interval)
+
+    def load():
+        snapshot = StateCache.read_snapshot(cacheparams) \
+            if cacheparams is not None else None
+        if snapshot is None:
+            snapshot = StateCache.load_results(None, serverparams,
+                                               queryparams)
+        return device_states(snapshot, threshold, use_p95)
+
+    try:
+        asyncio.run(LiveServer(liveparams, load, source_version).serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    Profiling.run(main)
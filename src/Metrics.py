@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Per-stage timing and counters for the project scripts (Metrics.py)
+
+#                                                                      #
+Lightweight instrumentation for the entry point scripts.  Stages are
+timed with 'with Metrics.timer("stage"):' blocks, and counters/gauges
+record device counts, etc.  At the end of a run the results are
+written to a Prometheus node_exporter textfile collector file
+(<TextfileDir>/ddcam_<job>.prom) and appended to a JSON-lines log.
+
+When metrics are disabled (the default) timer() hands back a shared
+no-op context manager and count()/gauge() return immediately, so the
+instrumentation costs next to nothing on the hot path.
+
+Counters (count) are cumulative across runs - the previous totals are
+read back from the job's textfile - while gauges and stage durations
+describe the latest run.
+
+Required inputs/variables:
+    optionsconfig.yaml Metrics section (optional)
+        Enabled - True to record metrics
+        TextfileDir - directory of the Prometheus textfile collector
+        JSONLog - JSON-lines file each run is appended to
+
+Outputs:
+    ddcam_<job>.prom textfile and JSON-lines run log
+
+Version log:
+v1      2026-1019   First release
+
+Credits:
+"""
+__version__ = '1'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import os
+import re
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# Script-global variables
+_enabled = False
+_settings = {}
+_job = ""
+_stages = {}
+_counters = {}
+_gauges = {}
+
+_TOTAL_LINE = re.compile(r'^(ddcam_\w+_total)\{job="[^"]*"\} (\S+)$')
+
+
+class _NullTimer:
+    """No-op context manager handed out while metrics are disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    """Context manager adding its wall time to a stage"""
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _stages[self.stage] = _stages.get(self.stage, 0.0) \
+            + time.perf_counter() - self.start
+        return False
+
+
+def configure(metricsparams, job):
+    """Configure metrics for a script run
+
+    :param metricsparams: dictionary of Metrics settings from
+        optionsconfig.yaml [eg. Enabled, TextfileDir, JSONLog] or None
+    :param job: string naming the script, used as the 'job' label
+    :returns: None
+    """
+    global _enabled, _settings, _job
+    _settings = metricsparams or {}
+    _enabled = bool(_settings.get("Enabled", False))
+    _job = job
+    _stages.clear()
+    _counters.clear()
+    _gauges.clear()
+
+
+def enabled():
+    """Whether metrics are being recorded for this run"""
+    return _enabled
+
+
+def timer(stage):
+    """Time a stage
+
+    :param stage: string naming the stage
+    :returns: context manager; repeated stages accumulate
+    """
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(stage)
+
+
+def count(name, value=1):
+    """Increment a cumulative counter (ddcam_<name>_total)
+
+    :param name: string naming the counter
+    :param value: number to add
+    :returns: None
+    """
+    if not _enabled:
+        return
+    _counters[name] = _counters.get(name, 0) + value
+
+
+def gauge(name, value):
+    """Set a gauge (ddcam_<name>) for this run
+
+    :param name: string naming the gauge
+    :param value: number
+    :returns: None
+    """
+    if not _enabled:
+        return
+    _gauges[name] = value
+
+
+def _previous_totals(promfile):
+    # Cumulative counters carried over from the previous run's textfile
+    totals = {}
+    try:
+        with open(promfile, "r") as infile:
+            for line in infile:
+                match = _TOTAL_LINE.match(line.strip())
+                if match:
+                    totals[match.group(1)] = float(match.group(2))
+    except OSError:
+        pass
+    return totals
+
+
+def flush(duration=None, success=True):
+    """Write the Prometheus textfile and append to the JSON-lines log
+
+    :param duration: optional float run duration in seconds
+    :param success: boolean; whether the run completed
+    :returns: None
+    """
+    if not _enabled:
+        return
+    label = f'{{job="{_job}"}}'
+    timestamp = time.time()
+    lines = [
+        "# HELP ddcam_stage_duration_seconds Wall time of each stage in "
+        "the last run",
+        "# TYPE ddcam_stage_duration_seconds gauge"]
+    for stage, seconds in _stages.items():
+        lines.append(f'ddcam_stage_duration_seconds{{job="{_job}",'
+                     f'stage="{stage}"}} {seconds:.6f}')
+    if duration is not None:
+        lines += ["# TYPE ddcam_run_duration_seconds gauge",
+                  f"ddcam_run_duration_seconds{label} {duration:.6f}"]
+    lines += ["# TYPE ddcam_last_run_success gauge",
+              f"ddcam_last_run_success{label} {int(bool(success))}",
+              "# TYPE ddcam_last_run_timestamp_seconds gauge",
+              f"ddcam_last_run_timestamp_seconds{label} {timestamp:.0f}"]
+    for name, value in sorted(_gauges.items()):
+        lines += [f"# TYPE ddcam_{name} gauge",
+                  f"ddcam_{name}{label} {value}"]
+
+    textfile_dir = _settings.get("TextfileDir")
+    if textfile_dir:
+        promfile = os.path.join(textfile_dir, f"ddcam_{_job}.prom")
+        totals = _previous_totals(promfile)
+        for name, value in sorted(_counters.items()):
+            totals[f"ddcam_{name}_total"] = \
+                totals.get(f"ddcam_{name}_total", 0) + value
+        for metric, value in sorted(totals.items()):
+            lines += [f"# TYPE {metric} counter",
+                      f"{metric}{label} {value:g}"]
+        os.makedirs(textfile_dir, exist_ok=True)
+        # node_exporter only reads *.prom, so the temp file is ignored
+        tmpfile = promfile + ".tmp"
+        with open(tmpfile, "w") as outfile:
+            outfile.write("\n".join(lines) + "\n")
+        os.replace(tmpfile, promfile)
+
+    jsonlog = _settings.get("JSONLog")
+    if jsonlog:
+        record = {"timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                  "job": _job,
+                  "success": bool(success),
+                  "duration_s": None if duration is None
+                  else round(duration, 6),
+                  "stages": {stage: round(seconds, 6)
+                             for stage, seconds in _stages.items()},
+                  "counters": _counters,
+                  "gauges": _gauges}
+        if os.path.dirname(jsonlog):
+            os.makedirs(os.path.dirname(jsonlog), exist_ok=True)
+        with open(jsonlog, "a") as outfile:
+            outfile.write(json.dumps(record) + "\n")
+
+
+@contextmanager
+def run(job, metricsparams):
+    """Instrument a whole script run
+
+    Configures metrics, times the run and flushes the results when the
+    block exits, including on errors and sys.exit().
+
+    :param job: string naming the script
+    :param metricsparams: dictionary of Metrics settings or None
+    """
+    configure(metricsparams, job)
+    start = time.perf_counter()
+    success = False
+    try:
+        yield
+        success = True
+    finally:
+        flush(time.perf_counter() - start, success)
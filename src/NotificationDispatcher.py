@@ -0,0 +1,671 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Delivers device state change notifications (NotificationDispatcher.py)
+
+#                                                                      #
+Picks up the state changes the poll cycles queue in the Notifications
+Outbox (see Notifications.py) and delivers them to the notification
+channels - webhooks, Webex rooms, email and syslog.  For every channel
+the changes are:
+
+    deduplicated - a change to the state last notified for a device,
+        eg. from a restarted or overlapping poller, is dropped
+    coalesced    - changes are collected for BatchWindow seconds and
+        sent as one message; a device changing more than once in that
+        time is listed once with its latest state, and one that changed
+        back is left out.  At most MaxEvents devices are listed, the
+        rest are counted per state and device_group
+    rate limited - at most RateLimit messages per RatePeriod seconds
+        (a token bucket, so bursts up to RateLimit pass); further
+        changes wait and are merged into the next message
+
+Each channel delivers on its own thread, so a slow or unreachable
+channel only delays its own messages, never the other channels or the
+ping loop.  A failed delivery is retried after RetryInterval seconds,
+merged with the changes that arrived meanwhile.  The state last
+notified, the changes not yet sent and the rate limits are kept in
+StateFile, so nothing is lost when the service restarts or runs from
+cron with --once.
+
+Run as a service next to the pinger, or from cron:
+    $ python NotificationDispatcher.py
+    $ python NotificationDispatcher.py --once
+Send a test message to a channel:
+    $ python NotificationDispatcher.py --test noc-webhook
+A local mock webhook receiver, printing what it receives, for tests:
+    $ python NotificationDispatcher.py --mock-webhook 8099
+
+Required inputs/variables:
+    optionsconfig.yaml Notifications section
+        Outbox - directory of the queued changes
+        StateFile - file of the notified states, pending changes and
+            rate limits
+        WatchInterval - seconds between checks of the Outbox
+        Channels - list of channels, each with Name, Type (webhook,
+            webex, email or syslog), States, BatchWindow, MaxEvents,
+            RateLimit, RatePeriod, Timeout, RetryInterval and the
+            settings of its type
+    optionsconfig.yaml MySQL section, for the devices' hostnames
+
+Outputs:
+    Notification messages
+
+Version log:
+v1      2026-1019   First release
+v2      2026-1019   Queued changes are saved before their batch files are
+    removed and before the best-effort hostname lookup; a failed
+    delivery of any kind is retried, rate limit tokens are only spent
+    on sent messages; an unknown syslog Facility is a configuration
+    error
+
+Credits:
+"""
+__version__ = '2'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import os
+import sys
+import time
+import socket
+import asyncio
+import concurrent.futures
+import DBConnect
+import GetEnv
+import JSONCodec
+import Notifications
+import Profiling
+
+
+# Script-global variables
+DEFAULT_STATEFILE = "notifystate.json"
+DEFAULT_WATCH_INTERVAL = 5
+DEFAULT_BATCH_WINDOW = 30
+DEFAULT_MAX_EVENTS = 20
+DEFAULT_RATE_LIMIT = 12
+DEFAULT_RATE_PERIOD = 3600
+DEFAULT_TIMEOUT = 10
+DEFAULT_RETRY_INTERVAL = 60
+STATES = ("down", "flapping", "good")
+WEBEX_URL = "https://webexapis.com/v1/messages"
+# Settings each channel type can't do without
+REQUIRED = {"webhook": ("URL",), "webex": ("Token", "RoomId"),
+            "email": ("To",), "syslog": ("Host",)}
+# Syslog severity of a message by its worst state: err, warning, notice
+SYSLOG_SEVERITY = {"down": 3, "flapping": 4, "good": 5}
+SYSLOG_FACILITIES = {"user": 1, "daemon": 3,
+                     **{f"local{n}": 16 + n for n in range(8)}}
+INVENTORY_CHUNK = 500
+
+
+def lookup_inventory(serverparams, ips):
+    """Hostname, device_group and source of devices
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, username, password,  etc.]
+    :param ips: iterable of device IPs
+    :returns: dictionary of IP: (hostname, device_group, source)
+    """
+    ips = sorted(ips)
+    inventory = {}
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+    for start in range(0, len(ips), INVENTORY_CHUNK):
+        chunk = ips[start:start + INVENTORY_CHUNK]
+        cursor.execute(f"""SELECT mgmt_ip_address, hostname, device_group,
+        source FROM {serverparams["database"]}.inventory
+        WHERE mgmt_ip_address IN ({", ".join(["%s"] * len(chunk))})
+        """, chunk)
+        inventory.update((row[0], tuple(row[1:]))
+                         for row in cursor.fetchall())
+    cursor.close()
+    db.close()
+    return inventory
+
+
+def build_message(events, max_events=DEFAULT_MAX_EVENTS):
+    """Build the message of a channel's coalesced changes
+
+    Devices whose outage is explained by their Topology parents are
+    counted, and listed after the others.
+
+    :param events: list of event dictionaries (ip, from, to, time,
+        suppressed, changes, hostname, device_group, source)
+    :param max_events: integer maximum number of devices listed
+    :returns: dictionary of title, counts, groups, suppressed, events
+        and more
+    """
+    events = sorted(events, key=lambda event: (
+        event["suppressed"], STATES.index(event["to"]),
+        event.get("hostname") or "", event["ip"]))
+    counts = {}
+    groups = {}
+    for event in events:
+        counts[event["to"]] = counts.get(event["to"], 0) + 1
+        group = groups.setdefault(event.get("device_group") or "Unassigned",
+                                  {})
+        group[event["to"]] = group.get(event["to"], 0) + 1
+    suppressed = sum(1 for event in events if event["suppressed"])
+    title = "DD-CAM: " + ", ".join(f"{counts[state]} {state}"
+                                   for state in STATES if state in counts)
+    if suppressed:
+        title += f" ({suppressed} behind down parents)"
+    return {"title": title, "counts": counts, "groups": groups,
+            "suppressed": suppressed, "events": events[:max_events],
+            "more": max(len(events) - max_events, 0)}
+
+
+def format_text(message, markdown=False):
+    """Format a message as text lines
+
+    :param message: dictionary from build_message
+    :param markdown: boolean; Markdown, eg. for Webex, instead of text
+    :returns: string
+    """
+    lines = [f"**{message['title']}**" if markdown else message["title"]]
+    bullet = "- " if markdown else ""
+    for event in message["events"]:
+        since = time.strftime("%H:%M:%S", time.localtime(event["time"]))
+        line = f"{bullet}{event['to']} since {since}: " \
+            f"{event.get('hostname') or '-'} ({event['ip']}) " \
+            f"{event.get('device_group') or ''} - was {event['from']}"
+        if event["suppressed"]:
+            line += ", behind down parents"
+        lines.append(line.replace("  ", " "))
+    if message["more"]:
+        lines.append(f"{bullet}... and {message['more']} more")
+        for group, counts in sorted(message["groups"].items()):
+            lines.append(f"{bullet}{group}: " +
+                         ", ".join(f"{counts[state]} {state}"
+                                   for state in STATES if state in counts))
+    return "\n".join(lines)
+
+
+def post_json(url, payload, headers=None, timeout=DEFAULT_TIMEOUT,
+              verify=True):
+    """POST a JSON document
+
+    :raises OSError: when the request fails or the status isn't 2xx
+    """
+    import ssl
+    import urllib.request
+
+    request = urllib.request.Request(
+        url, data=JSONCodec.dumps(payload), method="POST",
+        headers={"Content-Type": "application/json", **(headers or {})})
+    context = None
+    if not verify:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    with urllib.request.urlopen(request, timeout=timeout,
+                                context=context) as response:
+        response.read()
+
+
+def send_webhook(params, message):
+    post_json(params["URL"], message, params.get("Headers"),
+              params.get("Timeout", DEFAULT_TIMEOUT),
+              params.get("CheckSSLCert", True))
+
+
+def send_webex(params, message):
+    post_json(params.get("URL", WEBEX_URL),
+              {"roomId": params["RoomId"],
+               "markdown": format_text(message, markdown=True)},
+              {"Authorization": f"Bearer {params['Token']}"},
+              params.get("Timeout", DEFAULT_TIMEOUT))
+
+
+def send_email(params, message):
+    import smtplib
+    from email.message import EmailMessage
+
+    recipients = params["To"]
+    if isinstance(recipients, str):
+        recipients = [recipients]
+    mail = EmailMessage()
+    mail["Subject"] = message["title"]
+    mail["From"] = params.get("From", f"ddcam@{socket.getfqdn()}")
+    mail["To"] = ", ".join(recipients)
+    mail.set_content(format_text(message))
+    with smtplib.SMTP(params.get("SMTPHost", "localhost"),
+                      params.get("SMTPPort", 25),
+                      timeout=params.get("Timeout", DEFAULT_TIMEOUT)) as smtp:
+        if params.get("StartTLS", False):
+            smtp.starttls()
+        if params.get("Username"):
+            smtp.login(params["Username"], params.get("Password", ""))
+        smtp.send_message(mail)
+
+
+def send_syslog(params, message):
+    severity = min(SYSLOG_SEVERITY[state] for state in message["counts"]) \
+        if message["counts"] else SYSLOG_SEVERITY["good"]
+    priority = SYSLOG_FACILITIES[params.get("Facility", "local0")] * 8 + \
+        severity
+    header = f"<{priority}>{time.strftime('%b %d %H:%M:%S')} " \
+        f"{socket.gethostname()} ddcam: "
+    (family, kind, proto, _, address) = socket.getaddrinfo(
+        params["Host"], params.get("Port", 514), type=socket.SOCK_DGRAM)[0]
+    with socket.socket(family, kind, proto) as sock:
+        for line in format_text(message).splitlines():
+            sock.sendto((header + line).encode("utf-8")[:1024], address)
+
+
+SINKS = {"webhook": send_webhook, "webex": send_webex, "email": send_email,
+         "syslog": send_syslog}
+
+
+class TokenBucket:
+    """At most rate messages per period seconds, in bursts up to rate"""
+
+    def __init__(self, rate, period, tokens=None, updated=None):
+        self.rate = rate
+        self.period = period
+        self.tokens = float(rate if tokens is None else tokens)
+        self.updated = time.time() if updated is None else updated
+
+    def _refill(self, now):
+        self.tokens = min(self.rate, self.tokens + max(now - self.updated, 0)
+                          * self.rate / self.period)
+        self.updated = now
+
+    def wait(self, now):
+        """Seconds until a message may be sent"""
+        self._refill(now)
+        return max(1 - self.tokens, 0) * self.period / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class Channel:
+    """A notification channel and its pending changes
+
+    :param params: dictionary of the channel's settings
+    :param saved: dictionary of channel name: saved state (notified,
+        pending, since, tokens, updated), from read_state
+    """
+
+    def __init__(self, params, saved):
+        self.params = params
+        self.kind = str(params.get("Type", "webhook")).lower()
+        self.name = params.get("Name") or self.kind
+        if self.kind not in SINKS:
+            sys.exit(f"Notifications channel {self.name}: unknown Type "
+                     f"'{self.kind}'")
+        missing = [key for key in REQUIRED[self.kind] if not params.get(key)]
+        if missing:
+            sys.exit(f"Notifications channel {self.name}: missing "
+                     f"{', '.join(missing)}")
+        if self.kind == "syslog" and \
+                params.get("Facility", "local0") not in SYSLOG_FACILITIES:
+            sys.exit(f"Notifications channel {self.name}: unknown Facility "
+                     f"'{params['Facility']}'")
+        state = saved.get(self.name, {})
+        self.states = set(params.get("States") or STATES)
+        self.window = params.get("BatchWindow", DEFAULT_BATCH_WINDOW)
+        self.max_events = params.get("MaxEvents", DEFAULT_MAX_EVENTS)
+        self.timeout = params.get("Timeout", DEFAULT_TIMEOUT)
+        self.retry_interval = params.get("RetryInterval",
+                                         DEFAULT_RETRY_INTERVAL)
+        self.bucket = TokenBucket(params.get("RateLimit", DEFAULT_RATE_LIMIT),
+                                  params.get("RatePeriod",
+                                             DEFAULT_RATE_PERIOD),
+                                  state.get("tokens"), state.get("updated"))
+        # IP: state last notified, or known not to need notifying
+        self.notified = state.get("notified", {})
+        # IP: coalesced event not sent yet
+        self.pending = state.get("pending", {})
+        self.since = state.get("since")
+        self.retry_at = 0
+        self.sending = False
+        # One thread per channel, so a slow channel delays only itself
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def state(self):
+        return {"notified": self.notified, "pending": self.pending,
+                "since": self.since, "tokens": self.bucket.tokens,
+                "updated": self.bucket.updated}
+
+    def add(self, event):
+        """Coalesce a change into the pending ones
+
+        :param event: dictionary of the event
+        :returns: None
+        """
+        ip = event["ip"]
+        pending = self.pending.get(ip)
+        if pending is None:
+            if self.notified.get(ip) == event["to"]:
+                # Already notified
+                return
+            pending = dict(event, changes=0)
+            pending["from"] = self.notified.get(ip, event["from"])
+            self.pending[ip] = pending
+            if self.since is None:
+                self.since = time.time()
+        pending.update(to=event["to"], time=event["time"],
+                       suppressed=event["suppressed"])
+        pending["changes"] += 1
+        if pending["to"] == pending["from"]:
+            # Changed back before it was sent
+            self.notified[ip] = pending["from"]
+            del self.pending[ip]
+
+    def due(self, now, force=False):
+        """Seconds until the pending changes are sent
+
+        :param now: float epoch seconds
+        :param force: boolean; don't wait for the BatchWindow
+        :returns: float seconds, or None when nothing is pending or a
+            message is being sent
+        """
+        if not self.pending or self.sending:
+            return None
+        wait = max(self.retry_at - now, self.bucket.wait(now))
+        if not force:
+            wait = max(wait, self.since + self.window - now)
+        return max(wait, 0)
+
+    def take(self):
+        events = self.pending
+        self.pending = {}
+        self.since = None
+        return events
+
+    def restore(self, events):
+        """Put back the changes of a failed delivery
+
+        :param events: dictionary of IP: event, from take()
+        :returns: None
+        """
+        for ip, event in events.items():
+            newer = self.pending.get(ip)
+            if newer is None:
+                self.pending[ip] = event
+                continue
+            newer["from"] = event["from"]
+            newer["changes"] += event["changes"]
+            if newer["to"] == newer["from"]:
+                self.notified[ip] = newer["from"]
+                del self.pending[ip]
+        if self.pending and self.since is None:
+            self.since = time.time()
+
+    def delivered(self, events):
+        for ip, event in events.items():
+            self.notified[ip] = event["to"]
+
+
+def read_state(statefile):
+    """Read the saved channel states
+
+    :param statefile: string of the state file name
+    :returns: dictionary of channel name: state; empty when the file
+        is missing or unreadable
+    """
+    try:
+        with open(statefile, "rb") as infile:
+            state = JSONCodec.loads(infile.read())
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+class Dispatcher:
+    """Collects the queued changes and delivers them to the channels
+
+    :param notifyparams: dictionary of Notifications settings
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, username, password,  etc.]
+    """
+
+    def __init__(self, notifyparams, serverparams):
+        self.params = notifyparams
+        self.serverparams = serverparams
+        self.statefile = notifyparams.get("StateFile", DEFAULT_STATEFILE)
+        state = read_state(self.statefile)
+        self.channels = [Channel(params, state)
+                         for params in notifyparams.get("Channels") or []]
+        names = [channel.name for channel in self.channels]
+        if not names:
+            sys.exit("Notifications has no Channels")
+        if len(set(names)) < len(names):
+            sys.exit("Notifications channel Names must be unique")
+        self.tasks = set()
+
+    def save_state(self):
+        tmpfile = self.statefile + ".tmp"
+        with open(tmpfile, "wb") as outfile:
+            outfile.write(JSONCodec.dumps(
+                {channel.name: channel.state() for channel in self.channels}))
+        os.replace(tmpfile, self.statefile)
+
+    async def collect(self):
+        """Move the queued changes to the channels
+
+        The changes are saved in the StateFile before their batch files
+        are removed, so none are lost if the service stops in between.
+        The hostnames of the pending changes are then looked up; when
+        MySQL is unreachable they are looked up again next time.
+
+        :returns: integer number of changes collected
+        """
+        loop = asyncio.get_running_loop()
+        batches = await loop.run_in_executor(
+            None, Notifications.read_batches, self.params)
+        events = [dict(event, time=batch["time"])
+                  for (_, batch) in batches for event in batch["events"]]
+        for event in events:
+            for channel in self.channels:
+                channel.add(event)
+        if batches:
+            self.save_state()
+            for (filename, _) in batches:
+                os.remove(filename)
+
+        unnamed = [event for channel in self.channels
+                   for event in channel.pending.values()
+                   if "hostname" not in event]
+        if unnamed:
+            try:
+                inventory = await loop.run_in_executor(
+                    None, lookup_inventory, self.serverparams,
+                    {event["ip"] for event in unnamed})
+            except Exception as e:
+                print(f"Inventory lookup failed, retrying later: {e!r}",
+                      file=sys.stderr)
+            else:
+                for event in unnamed:
+                    (event["hostname"], event["device_group"],
+                     event["source"]) = inventory.get(event["ip"],
+                                                      (None, None, None))
+                self.save_state()
+        return len(events)
+
+    async def deliver(self, channel):
+        """Send a channel's pending changes as one message"""
+        channel.sending = True
+        events = channel.take()
+        listed = [event for event in events.values()
+                  if event["to"] in channel.states]
+        try:
+            if listed:
+                message = build_message(listed, channel.max_events)
+                await asyncio.wait_for(
+                    asyncio.get_running_loop().run_in_executor(
+                        channel.executor, SINKS[channel.kind],
+                        channel.params, message),
+                    channel.timeout)
+                channel.bucket.take(time.time())
+                print(f"Channel {channel.name}: {message['title']}")
+        except Exception as e:
+            print(f"Channel {channel.name}: delivery failed, retrying in "
+                  f"{channel.retry_interval} s: {e!r}", file=sys.stderr)
+            channel.restore(events)
+            channel.retry_at = time.time() + channel.retry_interval
+        else:
+            channel.delivered(events)
+        finally:
+            channel.sending = False
+            self.save_state()
+
+    def start_due(self, force=False):
+        now = time.time()
+        for channel in self.channels:
+            if channel.due(now, force) == 0:
+                task = asyncio.ensure_future(self.deliver(channel))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+    async def run(self, once=False):
+        """Deliver the queued changes
+
+        :param once: boolean; deliver what is queued and pending now,
+            without waiting for the BatchWindow, and return
+        :returns: None
+        """
+        interval = self.params.get("WatchInterval", DEFAULT_WATCH_INTERVAL)
+        while True:
+            try:
+                await self.collect()
+            except Exception as e:
+                # Keep delivering what is pending; collect again next time
+                print(f"Collecting the queued changes failed: {e!r}",
+                      file=sys.stderr)
+            self.start_due(once)
+            if once:
+                await asyncio.gather(*self.tasks)
+                return
+            await asyncio.sleep(interval)
+
+    def test(self, name):
+        """Send a test message to a channel
+
+        :param name: string of the channel name
+        :returns: None
+        """
+        channel = next((channel for channel in self.channels
+                        if channel.name == name), None)
+        if channel is None:
+            sys.exit(f"No Notifications channel named {name}")
+        event = {"ip": "192.0.2.1", "from": "good", "to": "down",
+                 "time": int(time.time()), "suppressed": False,
+                 "changes": 1, "hostname": "ddcam-test",
+                 "device_group": "Test", "source": "NotificationDispatcher"}
+        message = build_message([event])
+        message["title"] = "DD-CAM: test message"
+        try:
+            SINKS[channel.kind](channel.params, message)
+        except (OSError, ValueError) as e:
+            sys.exit(f"Channel {name}: delivery failed: {e!r}")
+        print(f"Channel {name}: test message sent")
+
+
+async def mock_webhook(host, port, delay=0.0, status=204, logfile=None):
+    """Local webhook receiver for tests
+
+    Prints every request's body, optionally appends it to a JSON-lines
+    file, and answers with status after delay seconds - eg. to check
+    that a slow channel doesn't hold up the others.
+
+    :returns: None; serves until interrupted
+    """
+    from http import HTTPStatus
+
+    async def handle(reader, writer):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+            lines = head.decode("latin-1").split("\r\n")
+            length = 0
+            for line in lines[1:]:
+                (name, _, value) = line.partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value)
+            body = await reader.readexactly(length)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                asyncio.TimeoutError, ConnectionError, ValueError):
+            writer.close()
+            return
+        await asyncio.sleep(delay)
+        print(f"{lines[0]} - {body.decode('utf-8', 'replace')}", flush=True)
+        if logfile:
+            with open(logfile, "ab") as outfile:
+                outfile.write(body + b"\n")
+        writer.write(f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                     f"Content-Length: 0\r\nConnection: close\r\n\r\n"
+                     .encode())
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"Mock webhook listening on http://{host}:{port}/")
+    async with server:
+        await server.serve_forever()
+
+
+def parse_args():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Deliver the device state change notifications")
+    parser.add_argument("--once", action="store_true",
+                        help="deliver the queued changes now, without "
+                             "waiting for BatchWindow, and exit (eg. "
+                             "from cron)")
+    parser.add_argument("--test", metavar="CHANNEL",
+                        help="send a test message to a channel and exit")
+    parser.add_argument("--mock-webhook", metavar="[HOST:]PORT",
+                        help="run a local webhook receiver printing what "
+                             "it receives, for tests")
+    parser.add_argument("--mock-delay", type=float, default=0.0,
+                        help="seconds the mock webhook waits before "
+                             "answering (default: 0)")
+    parser.add_argument("--mock-status", type=int, default=204,
+                        help="HTTP status the mock webhook answers with "
+                             "(default: 204)")
+    parser.add_argument("--mock-log", metavar="FILE",
+                        help="JSON-lines file the mock webhook appends "
+                             "the received messages to")
+    return parser.parse_args()
+
+
+def main():
+    options = parse_args()
+    if options.mock_webhook:
+        (host, _, port) = options.mock_webhook.rpartition(":")
+        try:
+            asyncio.run(mock_webhook(host or "127.0.0.1", int(port),
+                                     options.mock_delay, options.mock_status,
+                                     options.mock_log))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    notifyparams = GetEnv.getparam("Notifications") or {}
+    if not Notifications.enabled(notifyparams):
+        print("Notifications are not Enabled; no changes will be queued",
+              file=sys.stderr)
+    dispatcher = Dispatcher(notifyparams, GetEnv.getparam("MySQL"))
+    if options.test:
+        dispatcher.test(options.test)
+        return
+    try:
+        asyncio.run(dispatcher.run(options.once))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dispatcher.save_state()
+
+
+if __name__ == "__main__":
+    Profiling.run(main)
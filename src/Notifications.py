@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Queue of device state change notifications (Notifications.py)
+
+#                                                                      #
+Every poll cycle of PingAndUpdateInventory.py queues the devices whose
+state (good, down or flapping, after StateTracking hysteresis) changed
+as one batch file in the Outbox directory.  Writing the file is all
+the ping loop does; NotificationDispatcher.py picks the batches up,
+deduplicates and coalesces them and delivers them to the notification
+channels, so neither a mass outage nor a slow channel can hold up a
+poll cycle.
+
+A batch holds the cycle's time, the poller and one event per changed
+device:
+
+    ip          - mgmt_ip_address
+    from, to    - the previous and new state
+    suppressed  - true when all the device's Topology parents were
+                  down, so its outage is caused by theirs
+
+When the dispatcher isn't running, at most MaxQueued batches are kept;
+the oldest are dropped.
+
+Required inputs/variables:
+    optionsconfig.yaml Notifications section (optional)
+        Enabled - queue the state changes of every poll cycle
+        Outbox - directory of the queued batches
+        MaxQueued - batches kept in the Outbox
+
+Outputs:
+    Batch files in the Outbox directory
+
+Version log:
+v1      2026-1019   First release
+v2      2026-1019   read_batches leaves the batch files to the caller,
+    which removes them once their changes are saved
+
+Credits:
+"""
+__version__ = '2'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import os
+import sys
+import time
+import JSONCodec
+
+
+# Script-global variables
+DEFAULT_OUTBOX = "notifications"
+DEFAULT_MAX_QUEUED = 1440
+BATCH_SUFFIX = ".json"
+
+
+def enabled(notifyparams):
+    return bool((notifyparams or {}).get("Enabled", False))
+
+
+def queue_events(notifyparams, changes, timestamp, poller=None,
+                 suppressed=()):
+    """Queue the state changes of a poll cycle
+
+    :param notifyparams: dictionary of Notifications settings
+    :param changes: list of (IP, previous state, state) tuples
+    :param timestamp: integer epoch seconds of the poll cycle
+    :param poller: optional string naming the poller
+    :param suppressed: set of IPs of devices behind down parents
+    :returns: string of the batch file name, or None when there were
+        no changes
+    """
+    if not changes:
+        return None
+    outbox = notifyparams.get("Outbox", DEFAULT_OUTBOX)
+    os.makedirs(outbox, exist_ok=True)
+    created = time.time_ns()
+    batch = {"created": created, "time": timestamp, "poller": poller,
+             "events": [{"ip": ip, "from": previous, "to": state,
+                         "suppressed": ip in suppressed}
+                        for (ip, previous, state) in changes]}
+    # Names sort oldest first; the poller keeps pollers sharing an
+    #  Outbox apart
+    filename = os.path.join(outbox, f"{created:020d}-{poller or 'local'}"
+                                    f"{BATCH_SUFFIX}")
+    tmpfile = filename + ".tmp"
+    with open(tmpfile, "wb") as outfile:
+        outfile.write(JSONCodec.dumps(batch))
+    os.replace(tmpfile, filename)
+
+    queued = sorted(name for name in os.listdir(outbox)
+                    if name.endswith(BATCH_SUFFIX))
+    excess = len(queued) - notifyparams.get("MaxQueued", DEFAULT_MAX_QUEUED)
+    for name in queued[:max(excess, 0)]:
+        os.remove(os.path.join(outbox, name))
+    return filename
+
+
+def read_batches(notifyparams):
+    """Read the queued batches, oldest first
+
+    The batch files are left in place; the caller removes them once
+    their changes are safely stored.  Unreadable batch files are
+    renamed to '.rejected'.
+
+    :param notifyparams: dictionary of Notifications settings
+    :returns: list of (file name, dictionary of the batch) tuples
+    """
+    outbox = notifyparams.get("Outbox", DEFAULT_OUTBOX)
+    if not os.path.isdir(outbox):
+        return []
+    batches = []
+    for name in sorted(os.listdir(outbox)):
+        if not name.endswith(BATCH_SUFFIX):
+            continue
+        filename = os.path.join(outbox, name)
+        try:
+            with open(filename, "rb") as infile:
+                batch = JSONCodec.loads(infile.read())
+            if not isinstance(batch, dict) or \
+                    not isinstance(batch.get("events"), list):
+                raise ValueError("not a notification batch")
+        except (OSError, ValueError) as e:
+            print(f"Rejected notification batch {name}: {e}",
+                  file=sys.stderr)
+            os.replace(filename, filename + ".rejected")
+            continue
+        batches.append((filename, batch))
+    return batches
@@ -0,0 +1,360 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Runs inventory sync, ping and dashboard as one pipeline
+(Orchestrator.py)
+
+#                                                                      #
+Single long-running entry point replacing the cron chain of the Get*
+inventory scripts, PingAndUpdateInventory.py and
+CreateAvailabilityDashboard.py.  The stages form a small task graph:
+
+    collectors -> load_results -> ping -> render
+
+Inventory sync (the Get* collectors) runs on a slow schedule and ping
+on a fast one; the dashboard is rendered right after every ping cycle
+has committed.  Results are handed between the stages in memory - the
+renderer works from the rows the pinger just committed instead of
+re-reading the pingresults table - while MySQL remains the persistence
+layer the rows are loaded from at startup and after inventory syncs.
+Interpreter startup, imports and configuration are paid once.
+
+A failing task (eg. an unreachable controller) is reported and retried
+on its next schedule; the tasks depending on it are not triggered.
+
+Required inputs/variables:
+    optionsconfig.yaml Orchestrator section (optional)
+        InventoryInterval - seconds between inventory syncs
+        PollInterval - seconds between ping cycles
+        Collectors - list of Get* scripts run for inventory sync
+    --once - run every task once and exit, eg. from cron
+
+Outputs:
+    Same as the individual scripts: inventory and pingresults tables,
+    dashboard pages and metrics
+
+Version log:
+v1      2026-1019   First release
+v2      2026-1019   Shares the StateCache snapshot with the standalone
+    scripts
+v3      2026-1019   Keeps the results as a columnar DeviceSnapshot
+v4      2026-1019   Vectorized classification and ordering
+v5      2026-1019   Runs as one of several sharded workers (Sharding)
+v6      2026-1019   Runs as a regional or the central poller
+    (RegionalPollers)
+v7      2026-1019   Shares the poll cycle lock with the standalone
+    pinger; keeps unprobed devices' results, marked stale
+v8      2026-1019   Re-reads the results from MySQL after inventory
+    syncs, which may merge duplicate devices (InventoryMerge)
+v9      2026-1019   Passes Dashboard LiveURL to the published pages
+v10     2026-1019   Groups the outages of children of down parents
+    (Topology) on the published pages
+v11     2026-1019   Reads the results from MySQL through the QueryCache
+v12     2026-1019   main() takes the options and Orchestrator settings,
+    for Simulator.py
+v13     2026-1019   Exits on a MaxCellsPerPage that isn't a positive
+    integer
+v14     2026-1019   Renders with the ping cycle's Topology parent map,
+    and saves it with the StateCache snapshot
+
+Credits:
+"""
+__version__ = '14'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import sys
+import time
+import argparse
+import importlib
+import traceback
+from datetime import datetime
+import GetEnv
+import Metrics
+import Profiling
+import PingAndUpdateInventory
+import CreateAvailabilityDashboard
+import StateCache
+import ShardLeases
+import RegionalPollers
+import Topology
+
+
+# Script-global variables
+DEFAULT_INVENTORY_INTERVAL = 3600
+DEFAULT_POLL_INTERVAL = 120
+DEFAULT_COLLECTORS = ["GetPrimeInfraDevices", "GetDNACDevices",
+                      "GetACIAPICDevices", "GetWLCAPs"]
+
+
+class Task:
+    """One stage of the pipeline
+
+    :param name: string naming the task
+    :param function: callable taking the shared context dictionary
+    :param interval: seconds between scheduled runs, or None to run
+        only when a task it depends on has run
+    :param after: tuple of names of the tasks it depends on
+    """
+
+    def __init__(self, name, function, interval=None, after=()):
+        self.name = name
+        self.function = function
+        self.interval = interval
+        self.after = tuple(after)
+        self.next_run = 0.0
+
+
+class TaskGraph:
+    """Runs tasks in dependency order when scheduled or triggered"""
+
+    def __init__(self, tasks):
+        self.tasks = {task.name: task for task in tasks}
+        self.order = []
+        visiting = set()
+
+        def visit(task):
+            if task in self.order:
+                return
+            if task.name in visiting:
+                sys.exit(f"Orchestrator task graph has a cycle at "
+                         f"'{task.name}'")
+            visiting.add(task.name)
+            for name in task.after:
+                if name not in self.tasks:
+                    sys.exit(f"Orchestrator task '{task.name}' depends on "
+                             f"unknown task '{name}'")
+                visit(self.tasks[name])
+            self.order.append(task)
+
+        for task in tasks:
+            visit(task)
+
+    def run_due(self, context, force=False):
+        """Run the tasks that are due or triggered
+
+        :param context: dictionary shared by the tasks for handing over
+            results in memory
+        :param force: boolean; run every task, eg. at startup
+        :returns: list of names of the tasks that completed
+        """
+        completed = []
+        for task in self.order:
+            now = time.monotonic()
+            due = task.interval is not None and now >= task.next_run
+            triggered = any(name in completed for name in task.after)
+            if not (force or due or triggered):
+                continue
+            if task.interval is not None:
+                task.next_run = now + task.interval
+            print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} "
+                  f"Running task {task.name}")
+            try:
+                task.function(context)
+            except SystemExit as e:
+                print(f"Task {task.name} failed: {e}", file=sys.stderr)
+                continue
+            except Exception:
+                print(f"Task {task.name} failed:", file=sys.stderr)
+                traceback.print_exc()
+                continue
+            completed.append(task.name)
+        return completed
+
+    def next_due(self):
+        """Monotonic time the next scheduled task is due"""
+        return min(task.next_run for task in self.order
+                   if task.interval is not None)
+
+
+def run_collectors(context):
+    """Task: sync inventory with every configured Get* collector"""
+    for name in context["orchestrator"].get("Collectors",
+                                            DEFAULT_COLLECTORS):
+        print(f"Running collector {name}")
+        try:
+            importlib.import_module(name).main()
+        except SystemExit as e:
+            if e.code:
+                print(f"Collector {name} failed: {e}", file=sys.stderr)
+        except Exception:
+            print(f"Collector {name} failed:", file=sys.stderr)
+            traceback.print_exc()
+
+
+def load_results(context):
+    """Task: load the ping results from the snapshot or database"""
+    # After an inventory sync the snapshot may still hold devices the
+    #  inventory merge has since removed as duplicates
+    cacheparams = None if "results" in context else context["statecache"]
+    context["results"] = StateCache.load_results(cacheparams,
+                                                 context["mysqlenv"],
+                                                 context["querycache"])
+
+
+def ping(context):
+    """Task: run a ping cycle and apply it to the in-memory results"""
+    if "results" not in context:
+        load_results(context)
+    with Metrics.run("PingAndUpdateInventory", context["metrics"]), \
+            PingAndUpdateInventory.cycle_lock(context["worker_id"]) as locked:
+        if not locked:
+            # A standalone PingAndUpdateInventory.py cycle is running
+            print("Previous poll cycle still running, skipping this one")
+            Metrics.count("cycles_skipped")
+            return
+        with Metrics.timer("get_mysql_inventory"):
+            (devicelist, inventory) = \
+                PingAndUpdateInventory.get_mysql_inventory(context["mysqlenv"])
+        with Metrics.timer("assign_devices"):
+            (devicelist, worker) = PingAndUpdateInventory.assign_devices(
+                context["mysqlenv"], devicelist, context["worker_id"])
+        (sqldata_down, sqldata_up, stale, parents) = ([], [], [], None)
+        if devicelist:
+            (sqldata_down, sqldata_up, stale, parents) = \
+                PingAndUpdateInventory.ping_devices(context["mysqlenv"],
+                                                    devicelist, worker)
+        # The parent map covers the whole inventory, not just the
+        #  worker's devices; render() builds it when no cycle ran
+        context["parents"] = parents
+        regionparams = context["regionalpollers"]
+        if RegionalPollers.enabled(regionparams) and \
+                worker == RegionalPollers.central_name(regionparams):
+            with Metrics.timer("ingest_spool"):
+                RegionalPollers.ingest_spool(regionparams,
+                                             context["mysqlenv"])
+        if worker is not None:
+            # The other pollers' results are only in the database
+            with Metrics.timer("get_mysql_pingresults"):
+                context["results"] = StateCache.DeviceSnapshot.from_rows(
+                    CreateAvailabilityDashboard.get_mysql_pingresults(
+                        context["mysqlenv"], context["querycache"]))
+            return
+        with Metrics.timer("apply_ping_cycle"):
+            context["results"].apply_ping_cycle(inventory, sqldata_down,
+                                                sqldata_up, stale)
+        if StateCache.enabled(context["statecache"]):
+            # Keeps the standalone renderer and later restarts off MySQL
+            with Metrics.timer("write_snapshot"):
+                if parents is not None:
+                    StateCache.write_parents(context["statecache"], parents)
+                StateCache.write_snapshot(context["statecache"],
+                                          context["results"])
+
+
+def render(context):
+    """Task: publish the dashboards from the in-memory results"""
+    with Metrics.run("CreateAvailabilityDashboard", context["metrics"]):
+        snapshot = context["results"]
+        with Metrics.timer("snapshot_rows"):
+            rows = snapshot.rows()
+        with Metrics.timer("classify_columns"):
+            (order, classes, stats) = \
+                CreateAvailabilityDashboard.classify_columns(
+                    snapshot.array, context["latency_threshold"],
+                    context["use_p95"])
+        results_list = [rows[index] for index in order.tolist()]
+        parents = None
+        if Topology.enabled(context["topology"]):
+            parents = context.get("parents")
+            if parents is None:
+                with Metrics.timer("topology"):
+                    parents = Topology.dependencies(context["mysqlenv"],
+                                                    context["topology"])
+        with Metrics.timer("publish_dashboards"):
+            published = CreateAvailabilityDashboard.publish_dashboards(
+                context["dashboard_location"], results_list, stats,
+                context["latency_threshold"], context["use_p95"],
+                context["max_cells"], classes, context["live_url"], parents)
+        print(f"Number of dashboard pages published: {len(published)}")
+        Metrics.gauge("devices", len(results_list))
+        Metrics.gauge("pages_published", len(published))
+
+
+def build_graph(orchestratorparams):
+    """Build the pipeline task graph
+
+    :param orchestratorparams: dictionary of Orchestrator settings from
+        optionsconfig.yaml or None for defaults
+    :returns: TaskGraph
+    """
+    orchestratorparams = orchestratorparams or {}
+    return TaskGraph([
+        Task("collectors", run_collectors,
+             orchestratorparams.get("InventoryInterval",
+                                    DEFAULT_INVENTORY_INTERVAL)),
+        Task("load_results", load_results, after=("collectors",)),
+        Task("ping", ping,
+             orchestratorparams.get("PollInterval", DEFAULT_POLL_INTERVAL),
+             after=("load_results",)),
+        Task("render", render, after=("ping",)),
+    ])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Run inventory sync, ping and dashboard as one pipeline")
+    parser.add_argument("--once", action="store_true",
+                        help="run every task once and exit")
+    parser.add_argument("--worker-id",
+                        help="name of this worker when Sharding is "
+                             "enabled, or of this poller when "
+                             "RegionalPollers is enabled (default: "
+                             "WorkerId/Name or hostname)")
+    return parser.parse_args()
+
+
+def main(options=None, orchestratorparams=None):
+    """Run the pipeline
+
+    :param options: optional argparse namespace (once, worker_id);
+        parsed from the command line when None
+    :param orchestratorparams: optional dictionary of Orchestrator
+        settings replacing those of optionsconfig.yaml, eg. the
+        scaled intervals of a Simulator.py replay
+    """
+    if options is None:
+        options = parse_args()
+    if orchestratorparams is None:
+        orchestratorparams = GetEnv.getparam("Orchestrator") or {}
+    context = {
+        "orchestrator": orchestratorparams,
+        "mysqlenv": GetEnv.getparam("MySQL"),
+        "metrics": GetEnv.getparam("Metrics"),
+        "statecache": GetEnv.getparam("StateCache"),
+        "querycache": GetEnv.getparam("QueryCache"),
+        "sharding": GetEnv.getparam("Sharding"),
+        "regionalpollers": GetEnv.getparam("RegionalPollers"),
+        "worker_id": options.worker_id,
+        "latency_threshold": GetEnv.getparam("LatencyThreshold"),
+        "dashboard_location": GetEnv.getparam("DashboardFile"),
+        "use_p95": (GetEnv.getparam("LatencyStats") or {}).get("UseP95",
+                                                               False),
+        "max_cells": CreateAvailabilityDashboard.max_cells_per_page(
+            GetEnv.getparam("Dashboard")),
+        "live_url": (GetEnv.getparam("Dashboard") or {}).get("LiveURL", ""),
+        "topology": GetEnv.getparam("Topology"),
+    }
+    if ShardLeases.enabled(context["sharding"]) or \
+            RegionalPollers.enabled(context["regionalpollers"]):
+        # Every poller's results are in the database, not the snapshot
+        context["statecache"] = None
+    graph = build_graph(orchestratorparams)
+
+    completed = graph.run_due(context, force=True)
+    if options.once:
+        if "render" not in completed:
+            sys.exit("Orchestrator pipeline did not complete")
+        return
+    try:
+        while True:
+            time.sleep(max(0.0, graph.next_due() - time.monotonic()))
+            graph.run_due(context)
+    except KeyboardInterrupt:
+        print("Orchestrator stopped")
+
+
+if __name__ == "__main__":
+    Profiling.run(main)
@@ -15,27 +15,75 @@ Required inputs/variables can be defined in the optionsconfig.py file
     
 v1      2021-0702   DevNet Automation Exchange publication
 v2      2023-0628   Code clean-up and reachable_pct fix
+v3      2026-1019   Rolling p50/p95/p99 latency and jitter statistics
+v4      2026-1019   Hysteresis and flap detection for device state
+v5      2026-1019   Database connections through DBConnect (MySQL or
+    SQLite)
+v6      2026-1019   Per-stage timing metrics
+v7      2026-1019   --profile option (cProfile, stack sampling,
+    tracemalloc)
+v8      2026-1019   Poll cycle split out as ping_devices() for the
+    Orchestrator
+v9      2026-1019   Writes the StateCache snapshot for the renderer;
+    datetime_lastup is the poll cycle's timestamp
+v10     2026-1019   Columnar StateCache snapshot
+v11     2026-1019   Multi-worker mode with database shard leases
+    (Sharding, --worker-id)
+v12     2026-1019   Site-aware regional pollers (RegionalPollers);
+    pingresults records the poller that measured each device
+v13     2026-1019   Time-budgeted, chunked ping cycles (PollCycle);
+    unprobed devices are marked stale and overlapping cycles skipped
+v14     2026-1019   TCP, HTTPS and SNMP probes by inventory probe_type
+    (Probes), recorded in pingresults
+v15     2026-1019   Parses the fping output bytes with JSONCodec
+v16     2026-1019   Probes, the thread pool, LatencyStats, FlapDetection
+    and StateCache (numpy) imported where first used, so skipped
+    cycles and ICMP-only cycles start faster
+v17     2026-1019   Adds committed cycles to the SLA daily aggregates
+    (SLAEngine)
+v18     2026-1019   Children of down parents (Topology) are probed with
+    fewer packets
+v19     2026-1019   Queues each cycle's device state changes for the
+    NotificationDispatcher (Notifications)
+v20     2026-1019   Commits increment the QueryCache cycle generation
+v21     2026-1019   Saves the cycle's Topology parent map with the
+    StateCache snapshot, for the renderer
+v22     2026-1019   Publishes the committed QueryCache generation
 
 Credits:
 """
 
 __filename__ = 'PingAndUpdateInventory.py'
-__version__ = '2'
+__version__ = '22'
 __author__ = 'Jason Davis - jadavis@cisco.com'
 __license__ = "Cisco Sample Code License, Version 1.1 - " \
     "https://developer.cisco.com/site/license/cisco-sample-code-license/"
 
 
 import sys
-import json
-import MySQLdb
+import time
+import fcntl
+import argparse
+import contextlib
+import DBConnect
 import subprocess
 from datetime import datetime
 import GetEnv
+import Metrics
+import Profiling
+import ShardLeases
+import RegionalPollers
+import SLAEngine
+import JSONCodec
+import Topology
+import Notifications
+import QueryCache
 
 
 # Script-global variables
 PINGFILE = "pingfile.txt"
+DEFAULT_LOCKFILE = "pingcycle.lock"
+FPING_OPTIONS = ["-c3"]
 
 
 def get_mysql_devicelist(serverparams):
@@ -48,10 +96,7 @@ def get_mysql_devicelist(serverparams):
     :returns: pinglist - string containing list of devices to ping
     """
 
-    db=MySQLdb.connect(host=serverparams["host"],
-                       user=serverparams["username"],
-                       passwd=serverparams["password"],
-                       db=serverparams["database"])
+    db=DBConnect.connect(serverparams)
 
     cursor=db.cursor()
     SQL = f"""SELECT mgmt_ip_address, do_ping
@@ -77,25 +122,152 @@ def get_mysql_devicelist(serverparams):
     return pinglist
 
 
-def write_to_file(in_devicelist):
-    with open(PINGFILE, "w") as outfile:
+def get_mysql_inventory(serverparams):
+    """Get device list and inventory details from MySQL database
+
+    Like get_mysql_devicelist, but also returns the inventory details
+    the dashboard rows are joined with.
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server being polled [eg. host, username, password,  etc.]
+    :returns: devicelist, inventory - list of device IPs to ping and
+        dictionary of IP: (hostname, source, device_group) of all
+        inventory devices
+    """
+
+    db=DBConnect.connect(serverparams)
+
+    cursor=db.cursor()
+    SQL = f"""SELECT mgmt_ip_address, hostname, source, device_group, do_ping
+    FROM {serverparams["database"]}.inventory
+    """
+
+    cursor.execute(SQL)
+    rows = cursor.fetchall()
+    cursor.close()
+    db.close()
+
+    inventory = {row[0]: (row[1], row[2], row[3]) for row in rows}
+    devicelist = [row[0] for row in rows
+                  if row[4] == 1 and row[0] != '0.0.0.0']
+    print("Number of database records retrieved: " + str(len(devicelist)))
+    if len(devicelist) == 0:
+        sys.exit(f'MySQL server {serverparams["host"]} had NO inventory to process\n'
+                 'Have you run the "Get*" inventory import scripts yet?')
+
+    return devicelist, inventory
+
+
+def write_to_file(in_devicelist, pingfile=PINGFILE):
+    with open(pingfile, "w") as outfile:
         outfile.write("\n".join(in_devicelist))
 
 
-def execute_fping():
+def execute_fping(pingfile=PINGFILE, timeout=None, options=FPING_OPTIONS):
     """Execute fping utility
     
     Executes the fping (fast ping) utility by passing desired
     arguments and redirecting in the ping file.
     
-    :param None: 
-    :returns: string containing list of devices and their ping results
+    :param pingfile: string of the ping file name
+    :param timeout: optional seconds after which fping is killed
+    :param options: list of fping count/timeout arguments
+    :returns: bytes of JSON containing list of devices and their ping
+        results
+    :raises subprocess.TimeoutExpired: when fping ran out of time
+    """
+
+    with open(pingfile, "r") as infile:
+        output = subprocess.run(["fping", *options, "-q", "--json"],
+                                stdin=infile,
+                                capture_output=True,
+                                timeout=timeout)
+    return output.stdout
+
+
+def probe_devices(devicelist, pingfile=PINGFILE, budget=None,
+                  chunk_size=None, probe_types=None, probeparams=None,
+                  suppressed=None, topoparams=None):
+    """Ping devices in chunks within a time budget
+
+    Runs fping over chunks of the ICMP devices one after the other,
+    while the devices with another probe_type are probed on an asyncio
+    event loop in a background thread.  When the budget runs out, the
+    running fping is killed and the devices of that chunk and the
+    chunks after it are left unprobed, as are the devices whose probes
+    are still running; the results of the completed ones are kept.
+    Suppressed devices - children of down parents - are probed last,
+    with the Topology SuppressedPackets instead of 3.
+
+    :param devicelist: list of device IPs to ping
+    :param pingfile: string of the ping file name
+    :param budget: optional seconds for the whole device list
+    :param chunk_size: optional number of devices per fping run;
+        defaults to all ICMP devices
+    :param probe_types: optional dictionary of IP: probe_type of the
+        devices not pinged with fping
+    :param probeparams: dictionary of Probes settings or None
+    :param suppressed: optional set of IPs of the suppressed devices
+    :param topoparams: dictionary of Topology settings or None
+    :returns: sqldata_down, sqldata_up, unprobed - lists of tuples for
+        devices that are down and up and the list of unprobed IPs
     """
 
-    output = subprocess.run("fping -c3 -q --json < " + PINGFILE, 
-                            shell=True, 
-                            capture_output=True)
-    return output.stdout.decode()
+    deadline = None if budget is None else time.monotonic() + budget
+    probe_types = probe_types or {}
+    suppressed = suppressed or set()
+    icmp_devices = [ip for ip in devicelist if ip not in probe_types]
+    probes = None
+    if len(icmp_devices) < len(devicelist):
+        import concurrent.futures
+        import Probes
+
+        targets = {ip: probe_types[ip] for ip in devicelist
+                   if ip in probe_types}
+        attempts = {ip: Topology.probe_attempts(topoparams)
+                    for ip in targets if ip in suppressed}
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        probes = executor.submit(Probes.run, targets, probeparams, budget,
+                                 attempts)
+        executor.shutdown(wait=False)
+
+    chunk_size = chunk_size or len(icmp_devices) or 1
+    chunks = []
+    for (devices, options) in (
+            ([ip for ip in icmp_devices if ip not in suppressed],
+             FPING_OPTIONS),
+            ([ip for ip in icmp_devices if ip in suppressed],
+             Topology.fping_options(topoparams))):
+        chunks += [(devices[start:start + chunk_size], options)
+                   for start in range(0, len(devices), chunk_size)]
+    sqldata_down = []
+    sqldata_up = []
+    unprobed = []
+    for number, (chunk, options) in enumerate(chunks):
+        timeout = None
+        if deadline is not None:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                unprobed = [ip for (chunk, _) in chunks[number:]
+                            for ip in chunk]
+                break
+        write_to_file(chunk, pingfile)
+        try:
+            pingresults = execute_fping(pingfile, timeout, options)
+        except subprocess.TimeoutExpired:
+            unprobed = [ip for (chunk, _) in chunks[number:] for ip in chunk]
+            break
+        (chunk_down, chunk_up) = convert_json_to_sqldata(pingresults)
+        sqldata_down += chunk_down
+        sqldata_up += chunk_up
+
+    if probes is not None:
+        (hosts, probes_unprobed) = probes.result()
+        (probes_down, probes_up) = convert_hosts_to_sqldata(hosts)
+        sqldata_down += probes_down
+        sqldata_up += probes_up
+        unprobed += probes_unprobed
+    return sqldata_down, sqldata_up, unprobed
 
 
 def convert_json_to_sqldata(in_pingresults):
@@ -105,19 +277,30 @@ def convert_json_to_sqldata(in_pingresults):
     JSON records, then creates a list of entries formatted with 
     necessary parameters and stats
     
-    :param in_pingresults: string containing a JSON-like list of 
-        device ping results
+    :param in_pingresults: bytes or string containing a JSON-like list
+        of device ping results
     :returns: endpoints_down, endpoints_up - list of endpoints that 
         are down and those that are up
     """
 
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    json_results = json.loads(in_pingresults)
+    json_results = JSONCodec.loads(in_pingresults)
     # print(json_results)
+    return convert_hosts_to_sqldata(json_results["hosts"])
+
+
+def convert_hosts_to_sqldata(endpoints):
+    """Convert per-device ping results to SQL data
+
+    :param endpoints: dictionary of IP: fping-style results (xmt, rcv,
+        loss_percentage, min, avg, max), from fping or Probes
+    :returns: endpoints_down, endpoints_up - list of endpoints that
+        are down and those that are up
+    """
+
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     endpoints_up = []
     endpoints_down = []
 
-    endpoints = json_results["hosts"]
     #print(endpoints)
     for endpoint in endpoints:
         if endpoints[endpoint]["loss_percentage"] == 100:
@@ -136,70 +319,551 @@ def convert_json_to_sqldata(in_pingresults):
     return endpoints_down, endpoints_up
 
 
-def insupd_mysql_pingresults(serverparams, status, sql_values):
-    """Insert/Update MySQL with Ping Results
-    
-    Performs Inserts/Updates into MySQL with final results
+def get_probe_types(serverparams, devicelist):
+    """Get the devices probed by other means than ICMP
 
     :param serverparams: dictionary containing settings of the MySQL
-      server being polled [eg. host, username, password,  etc.]
-    :param status: string containing the device status - up or down
-    :sql_values: list of tuples containing the SQL values to be
-      inserted/updated
-    :returns: None
+        server [eg. host, username, password,  etc.]
+    :param devicelist: list of device IPs to ping
+    :returns: dictionary of IP: normalized probe_type of the devices
+        in devicelist with a valid probe_type other than icmp
     """
 
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    db=MySQLdb.connect(host=serverparams["host"],
-                       user=serverparams["username"],
-                       passwd=serverparams["password"],
-                       db=serverparams["database"])
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+    cursor.execute(f"""SELECT mgmt_ip_address, probe_type
+    FROM {serverparams["database"]}.inventory
+    WHERE probe_type IS NOT NULL AND probe_type != '' AND probe_type != 'icmp'
+    """)
+    rows = cursor.fetchall()
+    cursor.close()
+    db.close()
 
-    cursor=db.cursor()
+    if not rows:
+        return {}
+    import Probes
+
+    devices = set(devicelist)
+    probe_types = {}
+    for (ip, spec) in rows:
+        if ip not in devices:
+            continue
+        try:
+            (kind, _) = Probes.parse_probe(spec)
+        except ValueError as e:
+            print(f"Device {ip}: {e}, pinging with fping instead")
+            continue
+        if kind != "icmp":
+            probe_types[ip] = spec.strip().lower()
+    return probe_types
+
+
+def add_probe_type(probe_types, sqldata_down, sqldata_up):
+    """Add the probe type each device was checked with
+
+    :param probe_types: dictionary of IP: probe_type of the devices not
+        pinged with fping
+    :param sqldata_down: list of tuples for devices that are down
+    :param sqldata_up: list of tuples for devices that are up
+    :returns: sqldata_down, sqldata_up - with the probe_type column
+        appended
+    """
+    return ([row + (probe_types.get(row[0], "icmp"),)
+             for row in sqldata_down],
+            [row + (probe_types.get(row[0], "icmp"),) for row in sqldata_up])
+
+
+def add_latency_stats(statsparams, devicelist, sqldata_down, sqldata_up):
+    """Add rolling latency statistics to ping results
+
+    Records this cycle's average latency of every device into the
+    rolling window kept in the LatencyStats state file and appends
+    the resulting p50/p95/p99 latency and jitter to each SQL record.
+
+    :param statsparams: dictionary of LatencyStats settings from
+        optionsconfig.yaml [eg. Window, StateFile] or None for defaults
+    :param devicelist: list of device IPs in the current inventory
+    :param sqldata_down: list of tuples for devices that are down
+    :param sqldata_up: list of tuples for devices that are up
+    :returns: sqldata_down, sqldata_up - lists of tuples extended with
+        (p50, p95, p99, jitter)
+    """
+    import LatencyStats
+
+    statsparams = statsparams or {}
+    statefile = statsparams.get("StateFile", LatencyStats.DEFAULT_STATEFILE)
+    stats = LatencyStats.load(statefile,
+                              statsparams.get("Window",
+                                              LatencyStats.DEFAULT_WINDOW))
+    stats.retain(devicelist)
+
+    ips = [row[0] for row in sqldata_down] + [row[0] for row in sqldata_up]
+    latencies = [None] * len(sqldata_down) + [row[2] for row in sqldata_up]
+    stats.record(ips, latencies)
+    summary = stats.summary(ips)
+    stats.save(statefile)
+
+    down_count = len(sqldata_down)
+    sqldata_down = [row + summary[i] for i, row in enumerate(sqldata_down)]
+    sqldata_up = [row + summary[down_count + i]
+                  for i, row in enumerate(sqldata_up)]
+    return sqldata_down, sqldata_up
+
+
+def add_device_state(stateparams, devicelist, sqldata_down, sqldata_up,
+                     changes=None):
+    """Add hysteresis/flap device state to ping results
+
+    Applies this cycle's up/down results to the device state machine
+    kept in the StateTracking state file and appends the resulting
+    state (good, down or flapping) and flap score to each SQL record.
+
+    :param stateparams: dictionary of StateTracking settings from
+        optionsconfig.yaml [eg. DownThreshold, StateFile] or None for
+        defaults
+    :param devicelist: list of device IPs in the current inventory
+    :param sqldata_down: list of tuples for devices that are down
+    :param sqldata_up: list of tuples for devices that are up
+    :param changes: optional list the (IP, previous state, state) of
+        the devices whose state changed are appended to; devices seen
+        for the first time have no previous state and aren't included
+    :returns: sqldata_down, sqldata_up - lists of tuples extended with
+        (state, flap_score)
+    """
+    import FlapDetection
+
+    states = FlapDetection.load(stateparams)
+    states.retain(devicelist)
+
+    ips = [row[0] for row in sqldata_down] + [row[0] for row in sqldata_up]
+    if changes is not None:
+        known = [ip for ip in ips if ip in states.index]
+        previous = dict(zip(known, (state for (state, _)
+                                    in states.summary(known))))
+    states.update(ips, [False] * len(sqldata_down) + [True] * len(sqldata_up))
+    summary = states.summary(ips)
+    if changes is not None:
+        changes += [(ip, previous[ip], summary[i][0])
+                    for i, ip in enumerate(ips)
+                    if ip in previous and previous[ip] != summary[i][0]]
+    states.save((stateparams or {}).get("StateFile",
+                                        FlapDetection.DEFAULT_STATEFILE))
+
+    down_count = len(sqldata_down)
+    sqldata_down = [row + summary[i] for i, row in enumerate(sqldata_down)]
+    sqldata_up = [row + summary[down_count + i]
+                  for i, row in enumerate(sqldata_up)]
+    return sqldata_down, sqldata_up
+
+
+def upsert_pingresults(cursor, database, status, sql_values):
+    """Execute the pingresults upserts of one device status
+
+    :param cursor: DB-API cursor; the caller commits
+    :param database: string of the database name
+    :param status: string containing the device status - up or down
+    :param sql_values: list of tuples containing the SQL values to be
+      inserted/updated, including the rolling latency statistics,
+      device state, probe type and poller
+    :returns: integer number of records affected
+    """
 
-    # print(status)
-    # print(sql_values)
     if status == "down":
-        SQL = f"""INSERT INTO {serverparams["database"]}.pingresults
+        SQL = f"""INSERT INTO {database}.pingresults
         (mgmt_ip_address, reachable_pct, avg_latency, min_latency,
-        max_latency, down_count) 
-        VALUES (%s, %s, %s, %s, %s, %s) 
+        max_latency, down_count, p50_latency, p95_latency, p99_latency,
+        jitter, state, flap_score, probe_type, poller, stale) 
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 0) 
         ON DUPLICATE KEY UPDATE reachable_pct=0,
             avg_latency=VALUES(avg_latency),
             min_latency=VALUES(min_latency),
             max_latency=VALUES(max_latency),
-            down_count=down_count+1
+            down_count=down_count+1,
+            p50_latency=VALUES(p50_latency),
+            p95_latency=VALUES(p95_latency),
+            p99_latency=VALUES(p99_latency),
+            jitter=VALUES(jitter),
+            state=VALUES(state),
+            flap_score=VALUES(flap_score),
+            probe_type=VALUES(probe_type),
+            poller=VALUES(poller),
+            stale=0
         """
     else:
-        SQL = f"""INSERT INTO {serverparams["database"]}.pingresults 
+        SQL = f"""INSERT INTO {database}.pingresults 
         (mgmt_ip_address, reachable_pct, avg_latency, min_latency,
-         max_latency, datetime_lastup, down_count)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
+         max_latency, datetime_lastup, down_count, p50_latency,
+         p95_latency, p99_latency, jitter, state, flap_score, probe_type,
+         poller, stale)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
+         0)
         ON DUPLICATE KEY UPDATE reachable_pct=VALUES(reachable_pct), 
          avg_latency=VALUES(avg_latency),
          min_latency=VALUES(min_latency),
          max_latency=VALUES(max_latency),
-         datetime_lastup='{str(timestamp)}',
-         down_count=0
+         datetime_lastup=VALUES(datetime_lastup),
+         down_count=0,
+         p50_latency=VALUES(p50_latency),
+         p95_latency=VALUES(p95_latency),
+         p99_latency=VALUES(p99_latency),
+         jitter=VALUES(jitter),
+         state=VALUES(state),
+         flap_score=VALUES(flap_score),
+         probe_type=VALUES(probe_type),
+         poller=VALUES(poller),
+         stale=0
         """
 
+    if not sql_values:
+        return 0
     #print(SQL)
     cursor.executemany(SQL, sql_values)
+    return cursor.rowcount
+
+
+def insupd_mysql_pingresults(serverparams, status, sql_values, bump=False):
+    """Insert/Update MySQL with Ping Results
+    
+    Performs Inserts/Updates into MySQL with final results
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server being polled [eg. host, username, password,  etc.]
+    :param status: string containing the device status - up or down
+    :sql_values: list of tuples containing the SQL values to be
+      inserted/updated, including the rolling latency statistics,
+      device state, probe type and poller
+    :param bump: boolean; increment the QueryCache cycle generation in
+      the same transaction and publish it once committed
+    :returns: None
+    """
+
+    db=DBConnect.connect(serverparams)
+
+    cursor=db.cursor()
+
+    # print(status)
+    # print(sql_values)
+    affected = upsert_pingresults(cursor, serverparams["database"], status,
+                                  sql_values)
+    if bump:
+        gen = QueryCache.bump_generation(cursor, serverparams["database"])
     db.commit()
-    print("Number of database records affected: " + str(cursor.rowcount))
+    print("Number of database records affected: " + str(affected))
+
+    cursor.close()
+    db.close()
+    if bump:
+        QueryCache.publish(GetEnv.getparam("QueryCache"), serverparams, gen)
+
+
+def set_stale(cursor, database, ips):
+    """Mark devices whose results were not refreshed this cycle
+
+    :param cursor: DB-API cursor; the caller commits
+    :param database: string of the database name
+    :param ips: list of IPs of the unprobed devices
+    :returns: None
+    """
+
+    if ips:
+        cursor.executemany(f"""UPDATE {database}.pingresults SET stale = 1
+        WHERE mgmt_ip_address = %s
+        """, [(ip,) for ip in ips])
+
 
+def mark_stale(serverparams, ips, bump=False):
+    """Mark unprobed devices stale in the pingresults table
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, username, password,  etc.]
+    :param ips: list of IPs of the unprobed devices
+    :param bump: boolean; increment the QueryCache cycle generation in
+        the same transaction and publish it once committed
+    :returns: None
+    """
+
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+    set_stale(cursor, serverparams["database"], ips)
+    if bump:
+        gen = QueryCache.bump_generation(cursor, serverparams["database"])
+    db.commit()
     cursor.close()
     db.close()
+    if bump:
+        QueryCache.publish(GetEnv.getparam("QueryCache"), serverparams, gen)
+
+
+@contextlib.contextmanager
+def cycle_lock(name=None):
+    """Hold the poll cycle lock, so cycles of a poller never overlap
+
+    A non-blocking flock on the PollCycle LockFile; the lock is
+    released when the process exits, even if it is killed.
+
+    :param name: optional string naming this worker or poller, for a
+        per-poller lock file
+    :yields: boolean - False when another cycle holds the lock
+    """
+
+    lockfile = (GetEnv.getparam("PollCycle") or {}).get("LockFile",
+                                                        DEFAULT_LOCKFILE)
+    if name:
+        lockfile = ShardLeases.worker_file(lockfile, name)
+    with open(lockfile, "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def add_poller(poller, sqldata_down, sqldata_up):
+    """Add the name of the poller that measured the devices
+
+    :param poller: string of the poller name, or None for the single
+        central poller
+    :param sqldata_down: list of tuples for devices that are down
+    :param sqldata_up: list of tuples for devices that are up
+    :returns: sqldata_down, sqldata_up - with the poller column appended
+    """
+    return ([row + (poller,) for row in sqldata_down],
+            [row + (poller,) for row in sqldata_up])
+
+
+def assign_devices(serverparams, devicelist, name=None):
+    """Devices this poller pings when the inventory is split
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, username, password,  etc.]
+    :param devicelist: list of device IPs of the whole inventory
+    :param name: optional string naming this worker or poller, eg.
+        from --worker-id
+    :returns: devicelist, poller - the devices assigned to this poller
+        and its name, or the whole device list and None when this is
+        the only poller
+    """
+
+    regionparams = GetEnv.getparam("RegionalPollers")
+    shardparams = GetEnv.getparam("Sharding")
+    if RegionalPollers.enabled(regionparams):
+        if ShardLeases.enabled(shardparams):
+            sys.exit("RegionalPollers and Sharding can't both be enabled")
+        poller = RegionalPollers.poller_name(regionparams, name)
+        devicelist = RegionalPollers.assign_devices(regionparams,
+                                                    serverparams, devicelist,
+                                                    poller)
+    elif ShardLeases.enabled(shardparams):
+        poller = ShardLeases.worker_id(shardparams, name)
+        devicelist = ShardLeases.assign_devices(shardparams, serverparams,
+                                                devicelist, poller)
+    else:
+        return devicelist, None
+    Metrics.gauge("devices_assigned", len(devicelist))
+    return devicelist, poller
+
+
+def update_state_cache(cacheparams, serverparams, inventory, sqldata_down,
+                       sqldata_up, stale=(), parents=None):
+    """Update the StateCache snapshot with a committed ping cycle
+
+    Applies the cycle to the previous snapshot or, when that is missing
+    or stale, reads the just committed results back from MySQL.  The
+    cycle's Topology parent map is saved with it.
+
+    :param cacheparams: dictionary of StateCache settings from
+        optionsconfig.yaml
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, username, password,  etc.]
+    :param inventory: dictionary of IP: (hostname, source, device_group)
+    :param sqldata_down: list of tuples for devices that are down
+    :param sqldata_up: list of tuples for devices that are up
+    :param stale: list of IPs of devices left unprobed
+    :param parents: dictionary of child IP: tuple of parent IPs, or
+        None when Topology is disabled
+    :returns: None
+    """
+    import StateCache
+
+    if parents is not None:
+        StateCache.write_parents(cacheparams, parents)
+    snapshot = StateCache.read_snapshot(cacheparams)
+    if snapshot is None:
+        snapshot = StateCache.load_results(None, serverparams)
+    else:
+        snapshot.apply_ping_cycle(inventory, sqldata_down, sqldata_up, stale)
+    StateCache.write_snapshot(cacheparams, snapshot)
+
+
+def ping_devices(serverparams, devicelist, worker=None):
+    """Ping devices and update the pingresults table
+
+    Runs one poll cycle over the device list: pings the devices - or
+    probes them as their inventory probe_type says - within the
+    PollCycle time budget, adds the rolling latency statistics and
+    device state and commits the results to the pingresults table - or,
+    on a regional poller with the spool transport, sends them to the
+    central poller as a batch.  Devices whose Topology parents were
+    all down last cycle are probed with fewer packets.  Devices left
+    unprobed when the budget ran out keep their previous results,
+    marked stale.  The devices whose state changed are queued for the
+    NotificationDispatcher when Notifications are enabled.
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, username, password,  etc.]
+    :param devicelist: list of device IPs to ping
+    :param worker: optional string naming this sharded worker or
+        regional poller; recorded as the poller of the results and
+        keeps its ping and state files apart from other local pollers
+    :returns: sqldata_down, sqldata_up, stale, parents - lists of
+        tuples of the results of devices that are down and up, as
+        committed, the list of IPs of the unprobed devices and the
+        dictionary of child IP: tuple of parent IPs (None when Topology
+        is disabled)
+    """
+    import LatencyStats
+    import FlapDetection
+
+    statsparams = dict(GetEnv.getparam("LatencyStats") or {})
+    stateparams = dict(GetEnv.getparam("StateTracking") or {})
+    pingfile = PINGFILE
+    if worker:
+        pingfile = ShardLeases.worker_file(PINGFILE, worker)
+        statsparams["StateFile"] = ShardLeases.worker_file(
+            statsparams.get("StateFile", LatencyStats.DEFAULT_STATEFILE),
+            worker)
+        stateparams["StateFile"] = ShardLeases.worker_file(
+            stateparams.get("StateFile", FlapDetection.DEFAULT_STATEFILE),
+            worker)
+
+    pollparams = GetEnv.getparam("PollCycle") or {}
+    with Metrics.timer("get_probe_types"):
+        probe_types = get_probe_types(serverparams, devicelist)
+    Metrics.gauge("devices_probed", len(probe_types))
+    topoparams = GetEnv.getparam("Topology")
+    suppressed = set()
+    parents = None
+    if Topology.enabled(topoparams):
+        with Metrics.timer("topology"):
+            parents = Topology.dependencies(serverparams, topoparams)
+            suppressed = Topology.suppressed_devices(
+                serverparams, topoparams, devicelist, parents)
+        if suppressed:
+            print(f"{len(suppressed)} devices behind down parents probed "
+                  f"with fewer packets")
+    Metrics.gauge("devices_suppressed", len(suppressed))
+    with Metrics.timer("fping"):
+        (sqldata_down, sqldata_up, stale) = probe_devices(
+            devicelist, pingfile, pollparams.get("Budget"),
+            pollparams.get("ChunkSize"), probe_types,
+            GetEnv.getparam("Probes"), suppressed, topoparams)
+    cycle_time = int(time.time())
+    if stale:
+        print(f"Poll cycle budget exceeded: {len(stale)} of "
+              f"{len(devicelist)} devices not probed, marked stale")
+        Metrics.count("cycle_overruns")
+    with Metrics.timer("latency_stats"):
+        (sqldata_down, sqldata_up) = add_latency_stats(
+            statsparams, devicelist, sqldata_down, sqldata_up)
+    notifyparams = GetEnv.getparam("Notifications")
+    changes = [] if Notifications.enabled(notifyparams) else None
+    with Metrics.timer("device_state"):
+        (sqldata_down, sqldata_up) = add_device_state(
+            stateparams, devicelist, sqldata_down, sqldata_up, changes)
+    (sqldata_down, sqldata_up) = add_probe_type(probe_types, sqldata_down,
+                                                sqldata_up)
+    regionparams = GetEnv.getparam("RegionalPollers")
+    batched = RegionalPollers.sends_batches(regionparams, worker)
+    if batched:
+        # The batch names the poller once instead of on every row
+        with Metrics.timer("send_batch"):
+            (batch_id, data) = RegionalPollers.encode_batch(
+                worker, sqldata_down, sqldata_up, stale)
+            RegionalPollers.send_batch(regionparams, batch_id, data)
+        print(f"Sent batch {batch_id} ({len(data)} bytes)")
+        Metrics.count("batch_bytes", len(data))
+    with Metrics.timer("add_poller"):
+        (sqldata_down, sqldata_up) = add_poller(worker, sqldata_down,
+                                                sqldata_up)
+    if not batched:
+        # Each commit invalidates the cached dashboard queries with it
+        bump = QueryCache.enabled(GetEnv.getparam("QueryCache"))
+        with Metrics.timer("insupd_mysql_pingresults"):
+            insupd_mysql_pingresults(serverparams, "down", sqldata_down, bump)
+            insupd_mysql_pingresults(serverparams, "up", sqldata_up, bump)
+        if stale:
+            with Metrics.timer("mark_stale"):
+                mark_stale(serverparams, stale, bump)
+        slaparams = GetEnv.getparam("SLA")
+        if SLAEngine.enabled(slaparams):
+            with Metrics.timer("sla_aggregates"):
+                SLAEngine.record(serverparams, slaparams, cycle_time,
+                                 sqldata_down, sqldata_up)
+    if changes:
+        # Delivery is up to the NotificationDispatcher, never this loop
+        with Metrics.timer("queue_notifications"):
+            Notifications.queue_events(notifyparams, changes, cycle_time,
+                                       worker, suppressed)
+        Metrics.count("state_changes", len(changes))
+    Metrics.gauge("devices", len(devicelist))
+    Metrics.gauge("devices_down", len(sqldata_down))
+    Metrics.gauge("devices_up", len(sqldata_up))
+    Metrics.gauge("devices_stale", len(stale))
+    Metrics.count("ping_cycles")
+    return sqldata_down, sqldata_up, stale, parents
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Ping the inventory and update pingresults")
+    parser.add_argument("--worker-id",
+                        help="name of this worker when Sharding is "
+                             "enabled, or of this poller when "
+                             "RegionalPollers is enabled (default: "
+                             "WorkerId/Name or hostname)")
+    return parser.parse_args()
 
 
 def main():
-    mysqlenv = GetEnv.getparam("MySQL")
-    devicelist = get_mysql_devicelist(mysqlenv)
-    write_to_file(devicelist)
-    pingresults = execute_fping()
-    (sqldata_down, sqldata_up) = convert_json_to_sqldata(pingresults)
-    insupd_mysql_pingresults(mysqlenv, "down", sqldata_down)
-    insupd_mysql_pingresults(mysqlenv, "up", sqldata_up)
+    options = parse_args()
+    with Metrics.run("PingAndUpdateInventory", GetEnv.getparam("Metrics")), \
+            cycle_lock(options.worker_id) as locked:
+        if not locked:
+            # Skip rather than pile up behind a cycle still running
+            print("Previous poll cycle still running, skipping this one")
+            Metrics.count("cycles_skipped")
+            return
+        mysqlenv = GetEnv.getparam("MySQL")
+        with Metrics.timer("get_mysql_inventory"):
+            (devicelist, inventory) = get_mysql_inventory(mysqlenv)
+        with Metrics.timer("assign_devices"):
+            (devicelist, worker) = assign_devices(mysqlenv, devicelist,
+                                                  options.worker_id)
+        (sqldata_down, sqldata_up, stale, parents) = ([], [], [], None)
+        if devicelist:
+            (sqldata_down, sqldata_up, stale, parents) = ping_devices(
+                mysqlenv, devicelist, worker)
+        else:
+            print(f"Poller {worker} has no devices assigned this cycle")
+        regionparams = GetEnv.getparam("RegionalPollers")
+        if RegionalPollers.enabled(regionparams) and \
+                worker == RegionalPollers.central_name(regionparams):
+            with Metrics.timer("ingest_spool"):
+                RegionalPollers.ingest_spool(regionparams, mysqlenv)
+        cacheparams = GetEnv.getparam("StateCache")
+        # A sharded worker or regional poller only sees its own devices;
+        #  the renderer reads the shared pingresults table instead
+        if worker is None:
+            import StateCache
+            if StateCache.enabled(cacheparams):
+                with Metrics.timer("update_state_cache"):
+                    update_state_cache(cacheparams, mysqlenv, inventory,
+                                       sqldata_down, sqldata_up, stale,
+                                       parents)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    Profiling.run(main)
\ No newline at end of file
@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Multi-protocol reachability probes (Probes.py)
+
+#                                                                      #
+Many devices drop ICMP at the control plane, and a ping reply does not
+prove the management plane is alive.  The inventory probe_type column
+selects, per device, how PingAndUpdateInventory.py checks it:
+
+    icmp (or empty) - fping, as before
+    tcp[:ports]     - TCP connect to the first listening port of
+                      TCPPorts (default 22, 443 and 830)
+    https[:port]    - TLS handshake and an HTTP HEAD request answered
+                      with any HTTP status (default port 443)
+    snmp[:port]     - SNMPv2c GET of sysUpTime.0 answered without an
+                      error (default port 161)
+
+eg. 'tcp:830' or 'https:8443'.  All non-ICMP probes of a cycle run as
+asyncio tasks on one event loop, sharing one MaxConcurrency limit on
+open sockets, while fping pings the ICMP devices.  Like fping -c3,
+every device gets Attempts probes; each successful one counts as a
+received packet and its connect/response time as its latency, so the
+results feed the same pingresults columns, statistics and states.
+Certificates are not verified - the check is reachability, not trust.
+
+Required inputs/variables:
+    optionsconfig.yaml Probes section (optional)
+        Attempts - probes per device per cycle
+        Timeout - seconds per probe
+        MaxConcurrency - probes in flight at once
+        TCPPorts - ports tried by tcp probes, in order
+        HTTPSPath - path requested by https probes
+        SNMPCommunity - SNMPv2c community of snmp probes
+    Command line, for ad hoc checks: <IP address> <probe type>
+
+Outputs:
+    fping-style result per device (xmt, rcv, loss_percentage, min,
+    avg, max)
+
+Version log:
+v1      2026-1019   First release
+v2      2026-1019   Per-device attempts, for the suppressed children of
+    down parents (Topology)
+v3      2026-1019   An HTTPS probe that times out no longer waits for the
+    device's TLS shutdown
+
+Credits:
+"""
+__version__ = '3'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import ssl
+import sys
+import json
+import socket
+import time
+import random
+import asyncio
+import GetEnv
+
+
+# Script-global variables
+DEFAULT_ATTEMPTS = 3
+DEFAULT_TIMEOUT = 1.0
+DEFAULT_MAX_CONCURRENCY = 500
+DEFAULT_TCP_PORTS = [22, 443, 830]
+DEFAULT_HTTPS_PATH = "/"
+DEFAULT_SNMP_COMMUNITY = "public"
+DEFAULT_PORTS = {"tcp": None, "https": [443], "snmp": [161]}
+
+# SNMP sysUpTime.0 (1.3.6.1.2.1.1.3.0), BER encoded
+_SYSUPTIME_OID = bytes([0x2b, 6, 1, 2, 1, 1, 3, 0])
+_PROBE_ERRORS = (OSError, asyncio.TimeoutError, ValueError, EOFError)
+
+
+def parse_probe(spec, probeparams=None):
+    """Parse an inventory probe_type
+
+    :param spec: string such as 'tcp', 'tcp:22,830' or 'https:8443';
+        empty or 'icmp' for fping
+    :param probeparams: dictionary of Probes settings or None
+    :returns: (kind, list of ports); ports is empty for icmp
+    :raises ValueError: for an unknown probe type or port
+    """
+    kind, _, ports = (spec or "icmp").strip().lower().partition(":")
+    if kind == "icmp":
+        return kind, []
+    if kind not in DEFAULT_PORTS:
+        raise ValueError(f"unknown probe type '{spec}'")
+    ports = [int(port) for port in ports.split(",") if port.strip()]
+    if any(not 0 < port < 65536 for port in ports):
+        raise ValueError(f"invalid port in probe type '{spec}'")
+    if not ports:
+        ports = DEFAULT_PORTS[kind] or \
+            list((probeparams or {}).get("TCPPorts", DEFAULT_TCP_PORTS))
+    return kind, ports
+
+
+def _tlv(tag, value):
+    length = len(value)
+    if length < 0x80:
+        return bytes([tag, length]) + value
+    size = (length.bit_length() + 7) // 8
+    return bytes([tag, 0x80 | size]) + length.to_bytes(size, "big") + value
+
+
+def _integer(value):
+    return _tlv(0x02, value.to_bytes((value.bit_length() + 8) // 8, "big",
+                                     signed=True))
+
+
+def _read_tlv(data, pos):
+    tag, length = data[pos], data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        size = length & 0x7f
+        length = int.from_bytes(data[pos:pos + size], "big")
+        pos += size
+    if pos + length > len(data):
+        raise ValueError("truncated SNMP message")
+    return tag, data[pos:pos + length], pos + length
+
+
+def snmp_get_request(community, request_id):
+    """SNMPv2c GetRequest for sysUpTime.0
+
+    :param community: string of the SNMP community
+    :param request_id: integer request id
+    :returns: bytes of the message
+    """
+    varbind = _tlv(0x30, _tlv(0x30, _tlv(0x06, _SYSUPTIME_OID) + b"\x05\x00"))
+    pdu = _tlv(0xa0, _integer(request_id) + _integer(0) + _integer(0) +
+               varbind)
+    return _tlv(0x30, _integer(1) + _tlv(0x04, community.encode()) + pdu)
+
+
+def snmp_response_ok(data, request_id):
+    """Whether a message answers a GetRequest without an error
+
+    :param data: bytes of the received message
+    :param request_id: integer request id of the GetRequest
+    :returns: boolean
+    """
+    try:
+        tag, message, _ = _read_tlv(data, 0)
+        pos = 0
+        for _ in range(2):  # version, community
+            _, _, pos = _read_tlv(message, pos)
+        tag, pdu, _ = _read_tlv(message, pos)
+        _, response_id, pos = _read_tlv(pdu, 0)
+        _, error_status, _ = _read_tlv(pdu, pos)
+    except (IndexError, ValueError):
+        return False
+    return tag == 0xa2 and \
+        int.from_bytes(response_id, "big", signed=True) == request_id and \
+        int.from_bytes(error_status, "big") == 0
+
+
+class _SNMPClient(asyncio.DatagramProtocol):
+
+    def __init__(self, request, address, response):
+        self.request = request
+        self.address = address
+        self.response = response
+
+    def connection_made(self, transport):
+        transport.sendto(self.request, self.address)
+
+    def datagram_received(self, data, addr):
+        if not self.response.done():
+            self.response.set_result(data)
+
+    def error_received(self, exc):
+        if not self.response.done():
+            self.response.set_exception(exc)
+
+
+async def _close(writer):
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except (OSError, ssl.SSLError):
+        pass
+
+
+class ProbeRunner:
+    """Runs the non-ICMP probes of a poll cycle on one event loop
+
+    :param probeparams: dictionary of Probes settings or None
+    """
+
+    def __init__(self, probeparams=None):
+        probeparams = probeparams or {}
+        self.params = probeparams
+        self.attempts = probeparams.get("Attempts", DEFAULT_ATTEMPTS)
+        self.timeout = probeparams.get("Timeout", DEFAULT_TIMEOUT)
+        self.max_concurrency = probeparams.get("MaxConcurrency",
+                                               DEFAULT_MAX_CONCURRENCY)
+        self.semaphore = None
+        self._ssl_context = None
+
+    @property
+    def ssl_context(self):
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context()
+            self._ssl_context.check_hostname = False
+            self._ssl_context.verify_mode = ssl.CERT_NONE
+        return self._ssl_context
+
+    async def check_tcp(self, ip, port):
+        (reader, writer) = await asyncio.open_connection(ip, port)
+        await _close(writer)
+
+    async def check_https(self, ip, port):
+        (reader, writer) = await asyncio.open_connection(
+            ip, port, ssl=self.ssl_context)
+        try:
+            path = self.params.get("HTTPSPath", DEFAULT_HTTPS_PATH)
+            writer.write(f"HEAD {path} HTTP/1.0\r\nHost: {ip}\r\n\r\n"
+                         .encode())
+            await writer.drain()
+            status = await reader.readline()
+        except BaseException:
+            # Timed out or failed: don't wait for the device's TLS
+            #  shutdown as well
+            writer.transport.abort()
+            raise
+        await _close(writer)
+        if not status.startswith(b"HTTP/"):
+            raise ValueError("no HTTP response")
+
+    async def check_snmp(self, ip, port):
+        loop = asyncio.get_running_loop()
+        response = loop.create_future()
+        request_id = random.randint(1, 2**31 - 1)
+        request = snmp_get_request(self.params.get("SNMPCommunity",
+                                                   DEFAULT_SNMP_COMMUNITY),
+                                   request_id)
+        # Not connected - multi-homed agents may answer from another
+        #  address; the request id identifies the response
+        (transport, _) = await loop.create_datagram_endpoint(
+            lambda: _SNMPClient(request, (ip, port), response),
+            family=socket.AF_INET6 if ":" in ip else socket.AF_INET)
+        try:
+            data = await response
+        finally:
+            transport.close()
+        if not snmp_response_ok(data, request_id):
+            raise ValueError("no SNMP sysUpTime response")
+
+    async def attempt(self, check, ip, ports):
+        """One probe; the first port that answers counts
+
+        :returns: float latency in ms, or None when no port answered
+        """
+        for port in ports:
+            async with self.semaphore:
+                start = time.perf_counter()
+                try:
+                    await asyncio.wait_for(check(ip, port), self.timeout)
+                except _PROBE_ERRORS:
+                    continue
+                return (time.perf_counter() - start) * 1000
+        return None
+
+    async def probe(self, ip, spec, attempts=None):
+        """Probe one device Attempts times
+
+        :param ip: string of the device IP
+        :param spec: string of the device's probe_type
+        :param attempts: optional number of probes instead of Attempts
+        :returns: dictionary of fping-style results
+        """
+        kind, ports = parse_probe(spec, self.params)
+        check = getattr(self, f"check_{kind}")
+        attempts = attempts or self.attempts
+        latencies = []
+        for _ in range(attempts):
+            latency = await self.attempt(check, ip, ports)
+            if latency is not None:
+                latencies.append(latency)
+        result = {"xmt": attempts, "rcv": len(latencies),
+                  "loss_percentage": (attempts - len(latencies)) *
+                  100 // attempts}
+        if latencies:
+            result.update(min=round(min(latencies), 2),
+                          avg=round(sum(latencies) / len(latencies), 2),
+                          max=round(max(latencies), 2))
+        return result
+
+    async def run(self, targets, budget=None, attempts=None):
+        """Probe devices concurrently
+
+        :param targets: dictionary of IP: probe_type
+        :param budget: optional seconds for all devices; probes still
+            running then are cancelled
+        :param attempts: optional dictionary of IP: number of probes of
+            the devices probed other than Attempts times
+        :returns: hosts, unprobed - dictionary of IP: fping-style
+            results and list of IPs not probed within the budget
+        """
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        attempts = attempts or {}
+        hosts = {}
+
+        async def probe(ip, spec):
+            hosts[ip] = await self.probe(ip, spec, attempts.get(ip))
+
+        tasks = [asyncio.ensure_future(probe(ip, spec))
+                 for ip, spec in targets.items()]
+        if tasks:
+            (_, pending) = await asyncio.wait(tasks, timeout=budget)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        return hosts, [ip for ip in targets if ip not in hosts]
+
+
+def run(targets, probeparams=None, budget=None, attempts=None):
+    """Probe devices concurrently on a new event loop
+
+    :param targets: dictionary of IP: probe_type
+    :param probeparams: dictionary of Probes settings or None
+    :param budget: optional seconds for all devices
+    :param attempts: optional dictionary of IP: number of probes
+    :returns: hosts, unprobed - dictionary of IP: fping-style results
+        and list of IPs not probed within the budget
+    """
+    return asyncio.run(ProbeRunner(probeparams).run(targets, budget,
+                                                    attempts))
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python Probes.py <IP address> <probe type>")
+    (ip, spec) = sys.argv[1:]
+    try:
+        (kind, _) = parse_probe(spec)
+    except ValueError as e:
+        sys.exit(str(e))
+    if kind == "icmp":
+        sys.exit("icmp devices are pinged with fping")
+    (hosts, _) = run({ip: spec}, GetEnv.getparam("Probes"))
+    print(json.dumps({"hosts": hosts}))
+
+
+if __name__ == "__main__":
+    main()
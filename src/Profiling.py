@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Built-in profiling mode for the entry point scripts (Profiling.py)
+
+#                                                                      #
+Runs an entry point script's main() normally, or - when the script is
+started with '--profile' - under cProfile, a sampling profiler and
+tracemalloc, so slow or memory-hungry cycles can be investigated in
+production without editing any code:
+
+    $ python CreateAvailabilityDashboard.py --profile
+    $ python PingAndUpdateInventory.py --profile=sample --profile-dir /tmp/prof
+
+cProfile hooks every function call, which slows the run down and can
+defeat CPython fast paths (eg. in-place string concatenation), so its
+timings may be skewed.  '--profile=sample' only samples the call stack
+and shows true wall time proportions at almost no cost.
+
+Required inputs/variables:
+    --profile[=cprofile|sample] - enable profiling for this run
+        cprofile (default) - cProfile, stack sampling and tracemalloc
+        sample - stack sampling only
+    --profile-dir - directory for the profile files (default: profiles)
+    --profile-interval - sampling interval in seconds (default: 0.005)
+
+Outputs (in the profile directory, prefixed <script>-<timestamp>):
+    .collapsed - sampled call stacks in collapsed-stack format for
+        flamegraph.pl or speedscope
+    .pstats - cProfile statistics, eg. for 'python -m pstats' or
+        snakeviz (cprofile mode)
+    .tracemalloc.txt - top allocation sites by size (cprofile mode)
+    A short summary of the top functions is printed at the end
+
+Version log:
+v1      2026-1019   First release
+v2      2026-1019   Profilers and argparse imported only when --profile
+    is on the command line, keeping them off the normal start-up path
+
+Credits:
+"""
+__version__ = '2'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from datetime import datetime
+
+
+# Script-global variables
+DEFAULT_PROFILE_DIR = "profiles"
+DEFAULT_INTERVAL = 0.005
+TOP_ALLOCATIONS = 25
+TOP_FUNCTIONS = 20
+
+
+class StackSampler(threading.Thread):
+    """Samples the call stack of one thread at a fixed interval
+
+    Stacks are counted in collapsed-stack form, outermost frame first:
+    'file:function;file:function ...'.
+    """
+
+    def __init__(self, thread_id, interval=DEFAULT_INTERVAL):
+        super().__init__(name="StackSampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:"
+                             f"{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def top_functions(self, count=TOP_FUNCTIONS):
+        """Functions most often on top of the sampled stacks
+
+        :param count: integer number of functions
+        :returns: list of (function, samples) tuples
+        """
+        leaves = Counter()
+        for stack, samples in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += samples
+        return leaves.most_common(count)
+
+    def write_collapsed(self, filename):
+        """Write the sampled stacks in collapsed-stack format
+
+        :param filename: string of the output file
+        :returns: None
+        """
+        with open(filename, "w") as outfile:
+            for stack, samples in self.stacks.most_common():
+                outfile.write(f"{stack} {samples}\n")
+
+
+def parse_args(argv=None):
+    """Parse and remove the profiling options from the command line
+
+    :param argv: list of arguments; defaults to sys.argv[1:]
+    :returns: (options, remaining arguments)
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--profile", nargs="?", const="cprofile",
+                        choices=("cprofile", "sample"))
+    parser.add_argument("--profile-dir", default=DEFAULT_PROFILE_DIR)
+    parser.add_argument("--profile-interval", type=float,
+                        default=DEFAULT_INTERVAL)
+    return parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+
+
+def write_tracemalloc(filename, snapshot, current, peak):
+    """Write the top allocation sites of a tracemalloc snapshot
+
+    :param filename: string of the output file
+    :param snapshot: tracemalloc.Snapshot
+    :param current, peak: traced memory in bytes
+    :returns: None
+    """
+    import tracemalloc
+
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")))
+    with open(filename, "w") as outfile:
+        outfile.write(f"Peak traced memory: {peak / 1024:.1f} KiB, "
+                      f"still allocated: {current / 1024:.1f} KiB\n\n")
+        for stat in snapshot.statistics("traceback")[:TOP_ALLOCATIONS]:
+            outfile.write(f"{stat.size / 1024:.1f} KiB in "
+                          f"{stat.count} blocks\n")
+            for line in stat.traceback.format():
+                outfile.write(f"    {line}\n")
+            outfile.write("\n")
+
+
+def profile(function, name, mode="cprofile", profile_dir=DEFAULT_PROFILE_DIR,
+            interval=DEFAULT_INTERVAL):
+    """Profile a function
+
+    :param function: callable taking no arguments, eg. a script's main
+    :param name: string used as file name prefix, eg. the script name
+    :param mode: string; 'cprofile' for cProfile, stack sampling and
+        tracemalloc, 'sample' for stack sampling only
+    :param profile_dir: string of the output directory
+    :param interval: float sampling interval in seconds
+    :returns: return value of function
+    """
+    import pstats
+    import cProfile
+    import tracemalloc
+
+    os.makedirs(profile_dir, exist_ok=True)
+    prefix = os.path.join(profile_dir,
+                          f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    files = [prefix + ".collapsed"]
+
+    sampler = StackSampler(threading.get_ident(), interval)
+    profiler = None
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        tracemalloc.start(10)
+    start = time.perf_counter()
+    sampler.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        return function()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        sampler.stop()
+        elapsed = time.perf_counter() - start
+        sampler.write_collapsed(prefix + ".collapsed")
+        print(f"\nProfiled {name} in {elapsed:.3f} s "
+              f"({sum(sampler.stacks.values())} samples)", file=sys.stderr)
+
+        if profiler is not None:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            write_tracemalloc(prefix + ".tracemalloc.txt", snapshot,
+                              current, peak)
+            profiler.dump_stats(prefix + ".pstats")
+            files += [prefix + ".pstats", prefix + ".tracemalloc.txt"]
+            print(f"Peak traced memory {peak / 1024 / 1024:.1f} MiB",
+                  file=sys.stderr)
+            pstats.Stats(prefix + ".pstats", stream=sys.stderr) \
+                .sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        else:
+            print("Top functions by samples:", file=sys.stderr)
+            for function_name, samples in sampler.top_functions():
+                print(f"  {samples:8} {function_name}", file=sys.stderr)
+        print(f"Profile files: {', '.join(files)}", file=sys.stderr)
+
+
+def run(main):
+    """Run an entry point's main(), profiled when --profile is given
+
+    The profiling options are removed from sys.argv before main() runs,
+    so scripts with their own argument parsing are unaffected.
+
+    :param main: the script's main function, taking no arguments
+    :returns: return value of main
+    """
+    if not any(arg.startswith("--profile") for arg in sys.argv[1:]):
+        return main()
+    options, remaining = parse_args()
+    sys.argv[1:] = remaining
+    if not options.profile:
+        return main()
+    name = os.path.splitext(os.path.basename(sys.argv[0]))[0] or "main"
+    return profile(main, name, options.profile, options.profile_dir,
+                   options.profile_interval)
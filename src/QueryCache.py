@@ -0,0 +1,401 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Read-through cache of the dashboard queries (QueryCache.py)
+
+#                                                                      #
+get_mysql_pingresults reads the whole pingresults table, joined to the
+inventory, yet its content only changes when a poll cycle commits.  Its
+results are cached under the cycle generation - a counter in the
+query_generation table that PingAndUpdateInventory.py,
+RegionalPollers.py and InventoryMerge.py increment in the same
+transaction as every write to the pingresults or inventory tables.
+
+A read first looks up the generation, then serves the result cached
+under that generation, or runs the query and caches its result.  A
+result cached under an older generation is never served, so the cache
+can't return data older than the latest committed cycle.
+
+When CacheDir is set, the writers also publish each generation they
+commit to a small file there, right after the commit, and reads take
+the generation from that file: repeated reads within a cycle cost a
+file read instead of a database round trip.  Writers on other hosts
+(sharded workers, regional pollers with the database transport) can't
+publish to it, so a published generation is only trusted for
+GenerationMaxAge seconds before reads look it up in the
+query_generation table (a single primary key row) again.  Without
+CacheDir every read looks it up there.
+
+Results are kept in memory, for the long-running Orchestrator and the
+renderer, and - when CacheDir is set - in JSON files, so the
+standalone cron scripts share them between runs.  Both are limited in
+size and evict the least recently used results first.  The results are
+rows of scalars, as the DB-API returns them; datetime and Decimal
+values are tagged in the files so they read back as the same types.
+Only this application should be able to write to CacheDir; it is
+created accessible to its owner only.
+
+Required inputs/variables:
+    optionsconfig.yaml QueryCache section (optional)
+        Enabled - cache the results; writers increment the generation
+        MaxEntries - results kept in memory
+        MaxBytes - bytes of (JSON encoded) results kept in memory
+        CacheDir - directory of cached results shared between processes
+        MaxDiskBytes - bytes of results kept in CacheDir
+        GenerationMaxAge - seconds a generation published in CacheDir
+            is used before the table is read again
+    query_generation table (see mysql-table-ddl.sql)
+
+Outputs:
+    Cached query results, in memory and in CacheDir, and the published
+    generation in CacheDir
+
+Version log:
+v1      2026-1019   First release
+v2      2026-1019   CacheDir files are JSON instead of pickle, so a file
+    planted there can't run code
+v3      2026-1019   Writers publish the committed generation to CacheDir,
+    which reads check instead of the query_generation table
+
+Credits:
+"""
+__version__ = '3'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import os
+import time
+import fcntl
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+import DBConnect
+import JSONCodec
+import Metrics
+
+
+# Script-global variables
+DEFAULT_MAX_ENTRIES = 32
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+DEFAULT_GENERATION_MAX_AGE = 60
+CACHE_SUFFIX = ".json"
+GENERATION_PREFIX = "generation-"
+
+# In-memory results of this process - key: (generation, size, value),
+#  least recently used first
+_results = OrderedDict()
+
+
+def enabled(queryparams):
+    return bool((queryparams or {}).get("Enabled", False))
+
+
+def bump_generation(cursor, database):
+    """Increment the cycle generation, invalidating the cached results
+
+    Run it in the transaction writing the tables the cached queries
+    read, so the new results and the new generation commit together;
+    publish() the generation once committed.
+
+    :param cursor: DB-API cursor; the caller commits
+    :param database: string of the database name
+    :returns: integer generation the transaction commits
+    """
+    cursor.execute(f"""INSERT INTO {database}.query_generation
+    (id, generation) VALUES (1, 1)
+    ON DUPLICATE KEY UPDATE generation = generation + 1
+    """)
+    # The row stays locked by this transaction until it commits
+    cursor.execute(f"""SELECT generation FROM {database}.query_generation
+    WHERE id = 1
+    """)
+    return cursor.fetchone()[0]
+
+
+def bump(serverparams, queryparams=None):
+    """Increment the cycle generation in a transaction of its own
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
+    :param queryparams: dictionary of QueryCache settings or None
+    :returns: None
+    """
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+    gen = bump_generation(cursor, serverparams["database"])
+    db.commit()
+    cursor.close()
+    db.close()
+    publish(queryparams, serverparams, gen)
+
+
+def generation(serverparams):
+    """Latest committed cycle generation
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
+    :returns: integer generation, 0 before the first write
+    """
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+    cursor.execute(f"""SELECT generation
+    FROM {serverparams["database"]}.query_generation
+    WHERE id = 1
+    """)
+    row = cursor.fetchone()
+    cursor.close()
+    db.close()
+    return row[0] if row is not None else 0
+
+
+def _server_key(serverparams):
+    return (serverparams.get("engine"), serverparams.get("host"),
+            serverparams.get("path"), serverparams["database"])
+
+
+def generation_file(queryparams, serverparams):
+    """File in CacheDir the generation of a database is published to
+
+    :param queryparams: dictionary of QueryCache settings or None
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
+    :returns: string of the file name, or None without CacheDir
+    """
+    cache_dir = (queryparams or {}).get("CacheDir")
+    if not cache_dir:
+        return None
+    digest = hashlib.sha1(repr(_server_key(serverparams)).encode("utf-8"))
+    return os.path.join(cache_dir, GENERATION_PREFIX + digest.hexdigest())
+
+
+def publish(queryparams, serverparams, gen):
+    """Publish a committed generation to CacheDir
+
+    The published generation never goes back, so a writer publishing
+    late can't hide a newer one; rewriting it renews its GenerationMaxAge.
+
+    :param queryparams: dictionary of QueryCache settings or None;
+        nothing is published without CacheDir
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
+    :param gen: integer generation, committed
+    :returns: None
+    """
+    filename = generation_file(queryparams, serverparams)
+    if filename is None:
+        return
+    os.makedirs(os.path.dirname(filename), mode=0o700, exist_ok=True)
+    fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o600)
+    with os.fdopen(fd, "r+") as genfile:
+        fcntl.flock(genfile, fcntl.LOCK_EX)
+        try:
+            gen = max(gen, int(genfile.read()))
+        except ValueError:
+            pass
+        genfile.seek(0)
+        genfile.truncate()
+        genfile.write(str(gen))
+
+
+def published_generation(queryparams, serverparams):
+    """Generation published to CacheDir, unless missing or too old
+
+    :param queryparams: dictionary of QueryCache settings or None
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
+    :returns: integer generation, or None
+    """
+    filename = generation_file(queryparams, serverparams)
+    if filename is None:
+        return None
+    max_age = queryparams.get("GenerationMaxAge", DEFAULT_GENERATION_MAX_AGE)
+    try:
+        with open(filename, "r") as genfile:
+            if time.time() - os.fstat(genfile.fileno()).st_mtime > max_age:
+                return None
+            # Empty while a writer rewrites it
+            return int(genfile.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_file(cache_dir, key, gen):
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{digest}-{gen}{CACHE_SUFFIX}")
+
+
+def _encode(value):
+    # JSON-ready copy of a result; tuples and lists become lists
+    if isinstance(value, (tuple, list)):
+        return [_encode(item) for item in value]
+    if isinstance(value, datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"decimal": str(value)}
+    return value
+
+
+def _decode(value):
+    # Inverse of _encode for the rows of a result: lists become tuples
+    if type(value) is list:
+        return tuple(_decode(item) if type(item) in (list, dict) else item
+                     for item in value)
+    if type(value) is dict:
+        if "datetime" in value:
+            return datetime.fromisoformat(value["datetime"])
+        return Decimal(value["decimal"])
+    return value
+
+
+def encode_result(value):
+    """Encode a query result as JSON
+
+    :param value: list or tuple of rows (tuples) or scalars
+    :returns: bytes of JSON
+    """
+    return JSONCodec.dumps({"type": type(value).__name__,
+                            "value": _encode(value)})
+
+
+def decode_result(data):
+    """Decode a query result encoded by encode_result
+
+    :param data: bytes of JSON
+    :returns: list or tuple of rows (tuples) or scalars
+    :raises ValueError: when the data is not an encoded result
+    """
+    try:
+        document = JSONCodec.loads(data)
+        items = [_decode(item) for item in document["value"]]
+    except (KeyError, TypeError, AttributeError, ArithmeticError) as e:
+        raise ValueError(f"not a cached result: {e!r}")
+    return items if document["type"] == "list" else tuple(items)
+
+
+def read_memory(key, gen):
+    """Result cached in this process under the generation, or None"""
+    entry = _results.get(key)
+    if entry is None or entry[0] != gen:
+        return None
+    _results.move_to_end(key)
+    return entry[2]
+
+
+def write_memory(queryparams, key, gen, value, size):
+    """Cache a result in this process, evicting the least recently used
+
+    :returns: None
+    """
+    _results[key] = (gen, size, value)
+    _results.move_to_end(key)
+    max_entries = queryparams.get("MaxEntries", DEFAULT_MAX_ENTRIES)
+    max_bytes = queryparams.get("MaxBytes", DEFAULT_MAX_BYTES)
+    total = sum(entry[1] for entry in _results.values())
+    while _results and (len(_results) > max_entries or total > max_bytes):
+        (_, entry) = _results.popitem(last=False)
+        total -= entry[1]
+
+
+def read_disk(queryparams, key, gen):
+    """Result cached in CacheDir under the generation, or None"""
+    cache_dir = queryparams.get("CacheDir")
+    if not cache_dir:
+        return None
+    filename = _cache_file(cache_dir, key, gen)
+    try:
+        with open(filename, "rb") as infile:
+            data = infile.read()
+        value = decode_result(data)
+    except (OSError, ValueError):
+        return None
+    os.utime(filename)  # least recently used are evicted first
+    return (value, len(data))
+
+
+def write_disk(queryparams, key, gen, data):
+    """Cache a result in CacheDir, evicting older generations of the
+    key and the least recently used results
+
+    :returns: None
+    """
+    cache_dir = queryparams.get("CacheDir")
+    if not cache_dir:
+        return
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    filename = _cache_file(cache_dir, key, gen)
+    prefix = os.path.basename(filename).rsplit("-", 1)[0] + "-"
+    tmpfile = f"{filename}.{os.getpid()}.tmp"
+    fd = os.open(tmpfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as outfile:
+        outfile.write(data)
+    os.replace(tmpfile, filename)
+
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if not entry.name.endswith(CACHE_SUFFIX) or entry.path == filename:
+            continue
+        try:
+            if entry.name.startswith(prefix):
+                os.remove(entry.path)
+            else:
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            continue  # removed by another process
+    total = len(data) + sum(size for (_, size, _) in entries)
+    max_bytes = queryparams.get("MaxDiskBytes", DEFAULT_MAX_DISK_BYTES)
+    for (_, size, path) in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def read_through(queryparams, serverparams, name, args, loader):
+    """Result of a query, cached under the latest cycle generation
+
+    The generation is the one published to CacheDir when there is a
+    recent one, otherwise it is read from the query_generation table
+    (and published).
+
+    :param queryparams: dictionary of QueryCache settings or None; when
+        not enabled, loader() is returned as is
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
+    :param name: string naming the query
+    :param args: tuple of the query arguments the result depends on
+    :param loader: function running the query
+    :returns: result of loader(), possibly cached
+    """
+    if not enabled(queryparams):
+        return loader()
+    key = _server_key(serverparams) + (name,) + tuple(args)
+    # Read before the query: a result cached under it may be newer than
+    #  the generation, never older
+    gen = published_generation(queryparams, serverparams)
+    if gen is None:
+        Metrics.count("query_cache_generation_reads")
+        gen = generation(serverparams)
+        publish(queryparams, serverparams, gen)
+    value = read_memory(key, gen)
+    if value is not None:
+        Metrics.count("query_cache_hits")
+        return value
+    cached = read_disk(queryparams, key, gen)
+    if cached is not None:
+        Metrics.count("query_cache_disk_hits")
+        write_memory(queryparams, key, gen, *cached)
+        return cached[0]
+    Metrics.count("query_cache_misses")
+    value = loader()
+    data = encode_result(value)
+    write_memory(queryparams, key, gen, value, len(data))
+    write_disk(queryparams, key, gen, data)
+    return value
@@ -31,14 +31,18 @@ Outputs:
 Version log:
 v1      2021-0623   Created as normalized function across all
     DevNet Dashboard importing scripts
+v2      2026-1019   Reads through GetEnv, sharing its parsed file cache
+    and fast-start mode
 
 Credits:
 """
-__version__ = '1'
+__version__ = '2'
 __author__ = 'Jason Davis - jadavis@cisco.com'
 __license__ = "Cisco Sample Code License, Version 1.1 - https://developer.cisco.com/site/license/cisco-sample-code-license/"
 
 
+import GetEnv
+
 
 def read_config_file(servertype):
     """Read environmental settings file
@@ -48,15 +52,7 @@ def read_config_file(servertype):
     :param servertype: string defining the type of server settings to extract [eg. PrimeInfrastructure, DNACenter, etc.]
     :returns: List of servertype entries defined in YAML config file
     """
-    import yaml
-
-    with open("optionsconfig.yaml", "r") as ymlfile:
-        try:
-            cfg = yaml.safe_load(ymlfile)
-        except yaml.YAMLError as e:
-            print(e)
-    
-    return cfg.get(servertype)
+    return GetEnv.getparam(servertype)
 
 
 def main(servertype):
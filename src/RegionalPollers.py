@@ -0,0 +1,457 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Site-aware regional pollers (RegionalPollers.py)
+
+#                                                                      #
+Pinging remote branches from the central container adds the WAN hop
+to every latency figure and its timeouts to every poll cycle.  With
+RegionalPollers enabled, named PingAndUpdateInventory.py instances run
+close to the devices instead.  Each device is assigned to one poller by
+the Regions rules - fnmatch patterns on the inventory location and
+device_group columns, first match wins - and devices no rule matches
+stay with the central poller.
+
+A regional poller pings its devices and, rather than sending one
+upsert per device over the WAN, pushes the whole cycle as one batch:
+compact JSON rows (latencies rounded to the decimal(7,2) columns, the
+poller name once per batch) compressed with zlib.  The 'spool'
+transport drops the batch files atomically into SpoolDir, a directory
+shared with or synced to the central host (eg. NFS or rsync); the
+central poller ingests them after its own cycle, or run this script
+to ingest them on its own.  A batch is applied in one transaction and
+its batch_id recorded in the 'poller_batches' table, so a batch
+delivered twice is only applied once, and a batch older than the
+latest one applied for its poller is skipped rather than overwriting
+newer results.  The 'database' transport writes to MySQL directly,
+like the central poller.
+
+Every pingresults row records the poller that measured the device,
+which the dashboard shows in the device's cell.  RegionalPollers and
+Sharding can't be enabled together.
+
+Required inputs/variables:
+    optionsconfig.yaml RegionalPollers section (optional)
+        Enabled - True to split the inventory over regional pollers
+        Name - name of this poller (default: hostname)
+        Central - name of the central poller (default: central)
+        Transport - spool or database
+        SpoolDir - directory batch files are exchanged in
+        BatchRetention - seconds batch ids are kept for de-duplication
+        Regions - list of Poller, Locations and DeviceGroups rules
+
+Outputs:
+    Batch files in SpoolDir (regional pollers), rows of the
+    pingresults and poller_batches tables (central poller)
+
+Version log:
+v1      2026-1019   First release
+v2      2026-1019   Batches carry the devices left unprobed (stale)
+v3      2026-1019   Encodes and decodes batches with JSONCodec
+v4      2026-1019   Applied batches are added to the SLA daily aggregates
+v5      2026-1019   Applied batches increment the QueryCache cycle
+    generation
+v6      2026-1019   A batch that fails to apply is rolled back and
+    rejected instead of blocking the spool
+v7      2026-1019   Only malformed batches are rejected, checked before
+    any write; a batch failing on a database error is rolled back and
+    retried on the next run
+v8      2026-1019   Overlapping spool ingests skip the batch files the
+    other run has already removed
+v9      2026-1019   Applied batches publish the committed QueryCache
+    generation
+
+Credits:
+"""
+__version__ = '9'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import contextlib
+import os
+import sys
+import time
+import zlib
+import socket
+from fnmatch import fnmatchcase
+import DBConnect
+import JSONCodec
+import SLAEngine
+import QueryCache
+import GetEnv
+import Metrics
+import Profiling
+
+
+# Script-global variables
+DEFAULT_CENTRAL = "central"
+DEFAULT_TRANSPORT = "spool"
+DEFAULT_SPOOL_DIR = "spool"
+DEFAULT_BATCH_RETENTION = 86400
+BATCH_FORMAT = 1
+BATCH_SUFFIX = ".batch"
+# Values per down and up row of a batch, without the poller (see
+#  PingAndUpdateInventory.upsert_pingresults)
+DOWN_COLUMNS = 13
+UP_COLUMNS = 14
+
+
+def enabled(regionparams):
+    """Whether the inventory is split over regional pollers
+
+    :param regionparams: dictionary of RegionalPollers settings from
+        optionsconfig.yaml or None
+    :returns: boolean
+    """
+    return bool((regionparams or {}).get("Enabled", False))
+
+
+def poller_name(regionparams, override=None):
+    """Name of this poller
+
+    :param regionparams: dictionary of RegionalPollers settings or None
+    :param override: optional string, eg. from the command line
+    :returns: string
+    """
+    return override or (regionparams or {}).get("Name") \
+        or socket.gethostname()
+
+
+def central_name(regionparams):
+    """Name of the central poller
+
+    :param regionparams: dictionary of RegionalPollers settings or None
+    :returns: string
+    """
+    return (regionparams or {}).get("Central", DEFAULT_CENTRAL)
+
+
+def sends_batches(regionparams, poller):
+    """Whether this poller pushes its results as spool batches
+
+    :param regionparams: dictionary of RegionalPollers settings or None
+    :param poller: string of this poller's name
+    :returns: boolean
+    """
+    return enabled(regionparams) and poller != central_name(regionparams) \
+        and regionparams.get("Transport", DEFAULT_TRANSPORT) == "spool"
+
+
+def poller_for(location, device_group, regions, central=DEFAULT_CENTRAL):
+    """Poller a device is assigned to
+
+    :param location: string of the device's inventory location or None
+    :param device_group: string of the device's device_group or None
+    :param regions: list of dictionaries with Poller and optional
+        Locations and DeviceGroups lists of fnmatch patterns
+    :param central: string of the central poller's name
+    :returns: string of the poller name
+    """
+    for region in regions:
+        if any(fnmatchcase(location or "", pattern)
+               for pattern in region.get("Locations") or []) or \
+                any(fnmatchcase(device_group or "", pattern)
+                    for pattern in region.get("DeviceGroups") or []):
+            return region["Poller"]
+    return central
+
+
+def get_device_sites(serverparams):
+    """Get the location and device_group of every device
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
+    :returns: dictionary of IP: (location, device_group)
+    """
+
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+    cursor.execute(f"""SELECT mgmt_ip_address, location, device_group
+    FROM {serverparams["database"]}.inventory
+    WHERE do_ping = 1
+    """)
+    sites = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+    cursor.close()
+    db.close()
+    return sites
+
+
+def assign_devices(regionparams, serverparams, devicelist, poller):
+    """Devices this poller should ping
+
+    :param regionparams: dictionary of RegionalPollers settings
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
+    :param devicelist: list of device IPs of the whole inventory
+    :param poller: string of this poller's name
+    :returns: list of device IPs assigned to this poller
+    """
+    regions = regionparams.get("Regions") or []
+    central = central_name(regionparams)
+    sites = get_device_sites(serverparams)
+    # Many devices share a site; match each (location, group) once
+    owners = {}
+    assigned = []
+    for ip in devicelist:
+        site = sites.get(ip, (None, None))
+        if site not in owners:
+            owners[site] = poller_for(site[0], site[1], regions, central)
+        if owners[site] == poller:
+            assigned.append(ip)
+    print(f"Poller {poller}: {len(assigned)} of {len(devicelist)} devices")
+    return assigned
+
+
+def _compact(value):
+    # Latencies are stored as decimal(7,2); more digits only cost bytes
+    return round(value, 2) if isinstance(value, float) else value
+
+
+def encode_batch(poller, sqldata_down, sqldata_up, stale=(), created=None):
+    """Encode a poll cycle's results as a compressed batch
+
+    :param poller: string of the poller's name
+    :param sqldata_down: list of tuples for devices that are down
+    :param sqldata_up: list of tuples for devices that are up
+    :param stale: list of IPs of devices left unprobed
+    :param created: optional integer epoch nanoseconds of the cycle
+    :returns: (batch_id, bytes of the compressed batch)
+    """
+    created = time.time_ns() if created is None else created
+    batch_id = f"{poller}-{created}"
+    batch = {
+        "format": BATCH_FORMAT,
+        "batch_id": batch_id,
+        "poller": poller,
+        "created": created,
+        "down": [[_compact(value) for value in row] for row in sqldata_down],
+        "up": [[_compact(value) for value in row] for row in sqldata_up],
+        "stale": list(stale),
+    }
+    data = JSONCodec.dumps(batch, default=float)
+    return batch_id, zlib.compress(data, 6)
+
+
+def decode_batch(data):
+    """Decode a compressed batch
+
+    :param data: bytes of the compressed batch
+    :returns: dictionary of the batch
+    :raises ValueError: when the data is not a batch of a known format
+    """
+    try:
+        batch = JSONCodec.loads(zlib.decompress(data))
+    except zlib.error as e:
+        raise ValueError(f"not a compressed batch: {e}")
+    if not isinstance(batch, dict) or batch.get("format") != BATCH_FORMAT:
+        raise ValueError("unknown batch format")
+    missing = {"batch_id", "poller", "created", "down", "up"} - set(batch)
+    if missing:
+        raise ValueError(f"batch without {', '.join(sorted(missing))}")
+    if not isinstance(batch["batch_id"], str) or \
+            not isinstance(batch["poller"], str) or \
+            not isinstance(batch["created"], int):
+        raise ValueError("batch with a malformed batch_id, poller or "
+                         "created")
+    for (status, columns) in (("down", DOWN_COLUMNS), ("up", UP_COLUMNS)):
+        rows = batch[status]
+        if not isinstance(rows, list) or \
+                not all(isinstance(row, list) and len(row) == columns and
+                        isinstance(row[0], str) for row in rows):
+            raise ValueError(f"batch with {status} rows not of {columns} "
+                             f"values")
+    stale = batch.get("stale", [])
+    if not isinstance(stale, list) or \
+            not all(isinstance(ip, str) for ip in stale):
+        raise ValueError("batch with malformed stale IPs")
+    return batch
+
+
+def send_batch(regionparams, batch_id, data):
+    """Spool transport: drop a batch file for the central poller
+
+    The file is written under a temporary name and renamed, so the
+    central poller never reads a partial batch.
+
+    :param regionparams: dictionary of RegionalPollers settings
+    :param batch_id: string of the batch id
+    :param data: bytes of the compressed batch
+    :returns: string of the batch file name
+    """
+    spool = regionparams.get("SpoolDir", DEFAULT_SPOOL_DIR)
+    os.makedirs(spool, exist_ok=True)
+    filename = os.path.join(spool, batch_id + BATCH_SUFFIX)
+    tmpfile = os.path.join(spool, f".{batch_id}.tmp")
+    with open(tmpfile, "wb") as outfile:
+        outfile.write(data)
+    os.replace(tmpfile, filename)
+    return filename
+
+
+def apply_batch(serverparams, batch, retention=DEFAULT_BATCH_RETENTION,
+                slaparams=None, queryparams=None):
+    """Apply a batch to the pingresults table, at most once
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
+    :param batch: dictionary of a decoded batch
+    :param retention: integer seconds batch ids are kept
+    :param slaparams: dictionary of SLA settings or None; when enabled,
+        the batch is added to the SLA daily aggregates in the same
+        transaction
+    :param queryparams: dictionary of QueryCache settings or None; when
+        enabled, the cycle generation is incremented in the same
+        transaction and published once committed
+    :returns: string - 'applied', 'duplicate' or 'stale'
+    :raises: the database error when a statement fails (eg. a lock wait
+        timeout or deadlock), after rolling back; the batch is to be
+        applied again later
+    """
+    # PingAndUpdateInventory imports this module
+    import PingAndUpdateInventory
+
+    database = serverparams["database"]
+    now = time.time_ns()
+    cutoff = now - retention * 10**9
+    gen = None
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+
+    try:
+        cursor.execute(f"""DELETE FROM {database}.poller_batches
+        WHERE created < %s
+        """, (cutoff,))
+        cursor.execute(f"""SELECT batch_id FROM {database}.poller_batches
+        WHERE batch_id = %s
+        """, (batch["batch_id"],))
+        if cursor.fetchone() is not None:
+            outcome = "duplicate"
+        else:
+            cursor.execute(f"""SELECT MAX(created)
+            FROM {database}.poller_batches
+            WHERE poller = %s
+            """, (batch["poller"],))
+            latest = cursor.fetchone()[0]
+            if batch["created"] < cutoff or \
+                    (latest is not None and batch["created"] <= latest):
+                outcome = "stale"
+            else:
+                outcome = "applied"
+                poller = (batch["poller"],)
+                PingAndUpdateInventory.upsert_pingresults(
+                    cursor, database, "down",
+                    [tuple(row) + poller for row in batch["down"]])
+                PingAndUpdateInventory.upsert_pingresults(
+                    cursor, database, "up",
+                    [tuple(row) + poller for row in batch["up"]])
+                PingAndUpdateInventory.set_stale(cursor, database,
+                                                 batch.get("stale", []))
+                if SLAEngine.enabled(slaparams):
+                    SLAEngine.record_cycle(
+                        cursor, database, batch["created"] // 10**9,
+                        [row[0] for row in batch["down"]],
+                        [row[0] for row in batch["up"]], slaparams)
+                if QueryCache.enabled(queryparams):
+                    gen = QueryCache.bump_generation(cursor, database)
+            if batch["created"] >= cutoff:
+                # The primary key makes a concurrent second apply fail and
+                #  roll back instead of counting the devices twice
+                cursor.execute(f"""INSERT INTO {database}.poller_batches
+                (batch_id, poller, created, devices) VALUES (%s, %s, %s, %s)
+                """, (batch["batch_id"], batch["poller"], batch["created"],
+                      len(batch["down"]) + len(batch["up"])))
+        db.commit()
+    except Exception:
+        db.rollback()
+        cursor.execute(f"""SELECT batch_id FROM {database}.poller_batches
+        WHERE batch_id = %s
+        """, (batch["batch_id"],))
+        if cursor.fetchone() is None:
+            raise
+        # Applied meanwhile by a concurrent ingest
+        outcome = "duplicate"
+    finally:
+        cursor.close()
+        db.close()
+    if outcome == "applied" and gen is not None:
+        QueryCache.publish(queryparams, serverparams, gen)
+    return outcome
+
+
+def ingest_spool(regionparams, serverparams):
+    """Apply the batch files waiting in the spool directory
+
+    Batch files are removed once applied (or found to be duplicate or
+    stale); malformed ones are renamed to '.rejected' so the batches
+    after them are still applied.  When a batch fails on a database
+    error, eg. a lock wait timeout, it is kept and ingesting stops until
+    the next run, so each poller's batches are still applied in order.
+    Runs may overlap: a batch file another run has removed meanwhile is
+    skipped, and one both runs apply is only applied once.
+
+    :param regionparams: dictionary of RegionalPollers settings
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
+    :returns: dictionary of outcome: number of batches
+    """
+    spool = regionparams.get("SpoolDir", DEFAULT_SPOOL_DIR)
+    retention = regionparams.get("BatchRetention", DEFAULT_BATCH_RETENTION)
+    slaparams = GetEnv.getparam("SLA")
+    queryparams = GetEnv.getparam("QueryCache")
+    counts = {}
+    if not os.path.isdir(spool):
+        return counts
+    # Batch ids end in the creation time, so each poller's batches sort
+    #  oldest first
+    for name in sorted(os.listdir(spool)):
+        if not name.endswith(BATCH_SUFFIX):
+            continue
+        filename = os.path.join(spool, name)
+        try:
+            with open(filename, "rb") as infile:
+                data = infile.read()
+        except FileNotFoundError:
+            # Already ingested by a concurrent run
+            continue
+        try:
+            batch = decode_batch(data)
+        except ValueError as e:
+            print(f"Rejected batch file {name}: {e}", file=sys.stderr)
+            with contextlib.suppress(FileNotFoundError):
+                os.replace(filename, filename + ".rejected")
+            outcome = "rejected"
+        else:
+            try:
+                outcome = apply_batch(serverparams, batch, retention,
+                                      slaparams, queryparams)
+            except Exception as e:
+                print(f"Batch file {name} not applied, retrying on the "
+                      f"next run: {e!r}", file=sys.stderr)
+                counts["retried"] = counts.get("retried", 0) + 1
+                Metrics.count("batches_retried")
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(filename)
+            Metrics.count("batch_bytes", len(data))
+        counts[outcome] = counts.get(outcome, 0) + 1
+        Metrics.count(f"batches_{outcome}")
+    if counts:
+        print("Regional poller batches: " +
+              ", ".join(f"{count} {outcome}"
+                        for outcome, count in sorted(counts.items())))
+    return counts
+
+
+def main():
+    with Metrics.run("RegionalPollers", GetEnv.getparam("Metrics")):
+        regionparams = GetEnv.getparam("RegionalPollers") or {}
+        if not enabled(regionparams):
+            sys.exit("RegionalPollers is not enabled in optionsconfig.yaml")
+        with Metrics.timer("ingest_spool"):
+            ingest_spool(regionparams, GetEnv.getparam("MySQL"))
+
+
+if __name__ == "__main__":
+    Profiling.run(main)
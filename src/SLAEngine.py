@@ -0,0 +1,496 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Availability SLA reporting over the ping history (SLAEngine.py)
+
+#                                                                      #
+pingresults only holds each device's latest result, so availability
+over a month can't be computed from it.  Instead, every committed poll
+cycle updates small per-device, per-day aggregates in the 'sla_daily'
+table, and reports sum those aggregates over any range of days - no
+raw samples are kept or rescanned.
+
+The time between two samples of a device counts towards the state of
+the first one: a device last seen up was up until it was seen down.
+Intervals are split at midnight (local time) into the days they fall
+in; intervals longer than MaxGap (eg. while polling was stopped) count
+as unmonitored, not as up or down.  The 'sla_state' table holds every
+device's last sample and the start of its current outage.  For each
+device and day 'sla_daily' counts:
+
+    samples             - poll cycles the device was probed in
+    monitored_seconds   - time covered by samples
+    down_seconds        - monitored time the device was down
+    outages             - outages starting that day (up -> down)
+    repairs             - outages ending that day (down -> up)
+    repair_seconds      - duration of the outages ending that day
+
+A report of a window of days gives, per device, device_group, source
+and overall:
+
+    uptime %  - (monitored - down) / monitored time
+    outages   - number of outages started in the window
+    MTTR      - mean time to repair, of the outages ended in the window
+    MTBF      - mean time between failures, up time / outages
+
+Reports are cached in CacheDir until the next cycle is recorded, so
+repeated reports of a window cost a single small query.
+
+Required inputs/variables:
+    optionsconfig.yaml SLA section (optional)
+        Enabled - record the aggregates of every poll cycle
+        MaxGap - seconds between samples counted as monitored
+        RetentionDays - days of aggregates kept
+        CacheDir - directory of cached reports
+        MaxCacheEntries - reports kept in CacheDir
+    optionsconfig.yaml MySQL section
+    Command line, see 'python SLAEngine.py --help'
+
+Outputs:
+    Rows of the sla_state and sla_daily tables
+    Report as a text table, CSV or JSON on standard output
+
+Version log:
+v1      2026-1019   First release
+
+Credits:
+"""
+__version__ = '1'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+import DBConnect
+import JSONCodec
+import GetEnv
+import Metrics
+import Profiling
+
+
+# Script-global variables
+DEFAULT_MAX_GAP = 900
+DEFAULT_RETENTION_DAYS = 400
+DEFAULT_CACHE_DIR = "sla_cache"
+DEFAULT_MAX_CACHE_ENTRIES = 16
+DEFAULT_DAYS = 30
+STATE_BATCH_SIZE = 1000
+COUNTERS = ("samples", "monitored_seconds", "down_seconds", "outages",
+            "repairs", "repair_seconds")
+GROUPINGS = ("device_group", "source")
+
+
+def enabled(slaparams):
+    """Whether poll cycles are recorded
+
+    :param slaparams: dictionary of SLA settings from optionsconfig.yaml
+        or None
+    :returns: boolean
+    """
+    return bool((slaparams or {}).get("Enabled", False))
+
+
+def _midnight(day):
+    return int(datetime.combine(day, datetime.min.time()).timestamp())
+
+
+def day_spans(start, end):
+    """Split an interval at local midnights
+
+    :param start, end: integer epoch seconds, start < end
+    :returns: list of (ISO date string, seconds) tuples
+    """
+    spans = []
+    while start < end:
+        day = datetime.fromtimestamp(start).date()
+        stop = min(end, _midnight(day + timedelta(days=1)))
+        spans.append((day.isoformat(), stop - start))
+        start = stop
+    return spans
+
+
+def load_state(cursor, database, ips):
+    """Last sample of devices
+
+    :param cursor: database cursor
+    :param database: string of the database name
+    :param ips: list of device IPs
+    :returns: dictionary of IP: (last_sample, last_up, outage_start)
+    """
+    state = {}
+    for start in range(0, len(ips), STATE_BATCH_SIZE):
+        batch = ips[start:start + STATE_BATCH_SIZE]
+        cursor.execute(f"""SELECT mgmt_ip_address, last_sample, last_up,
+        outage_start
+        FROM {database}.sla_state
+        WHERE mgmt_ip_address IN ({", ".join(["%s"] * len(batch))})
+        """, batch)
+        for (ip, last_sample, last_up, outage_start) in cursor.fetchall():
+            state[ip] = (last_sample, last_up, outage_start)
+    return state
+
+
+def record_cycle(cursor, database, timestamp, down_ips, up_ips,
+                 slaparams=None):
+    """Add a poll cycle to the daily aggregates
+
+    Devices whose last sample is as recent as the cycle (eg. a batch
+    delivered late) are skipped.  Runs in the caller's transaction.
+
+    :param cursor: database cursor
+    :param database: string of the database name
+    :param timestamp: integer epoch seconds of the poll cycle
+    :param down_ips: list of IPs of devices found down
+    :param up_ips: list of IPs of devices found up
+    :param slaparams: dictionary of SLA settings or None
+    :returns: integer number of devices recorded
+    """
+    slaparams = slaparams or {}
+    max_gap = slaparams.get("MaxGap", DEFAULT_MAX_GAP)
+    samples = dict.fromkeys(down_ips, False)
+    samples.update(dict.fromkeys(up_ips, True))
+    state = load_state(cursor, database, list(samples))
+
+    today = datetime.fromtimestamp(timestamp).date()
+    day_start = _midnight(today)
+    today = today.isoformat()
+    daily = {}
+    states = []
+    for (ip, up) in samples.items():
+        (last_sample, last_up, outage_start) = state.get(ip,
+                                                         (None, None, None))
+        if last_sample is not None and timestamp <= last_sample:
+            continue
+        counters = daily.setdefault((today, ip), [0] * len(COUNTERS))
+        counters[0] += 1
+        if last_sample is not None and timestamp - last_sample <= max_gap:
+            # Nearly always within today - only split across midnight
+            spans = [(today, timestamp - last_sample)] \
+                if last_sample >= day_start \
+                else day_spans(last_sample, timestamp)
+            for (day, seconds) in spans:
+                span = daily.setdefault((day, ip), [0] * len(COUNTERS))
+                span[1] += seconds
+                if not last_up:
+                    span[2] += seconds
+        if not up and last_up != 0:
+            counters[3] += 1
+            outage_start = timestamp
+        elif up and last_up == 0:
+            counters[4] += 1
+            counters[5] += timestamp - (outage_start or timestamp)
+            outage_start = None
+        states.append((ip, timestamp, int(up), outage_start))
+
+    if daily:
+        updates = ", ".join(f"{counter}={counter}+VALUES({counter})"
+                            for counter in COUNTERS)
+        cursor.executemany(f"""INSERT INTO {database}.sla_daily
+        (day, mgmt_ip_address, {", ".join(COUNTERS)})
+        VALUES ({", ".join(["%s"] * (len(COUNTERS) + 2))})
+        ON DUPLICATE KEY UPDATE {updates}
+        """, [key + tuple(counters) for key, counters in daily.items()])
+    if states:
+        cursor.executemany(f"""INSERT INTO {database}.sla_state
+        (mgmt_ip_address, last_sample, last_up, outage_start)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE last_sample=VALUES(last_sample),
+        last_up=VALUES(last_up), outage_start=VALUES(outage_start)
+        """, states)
+
+    retention = slaparams.get("RetentionDays", DEFAULT_RETENTION_DAYS)
+    cursor.execute(f"""DELETE FROM {database}.sla_daily
+    WHERE day < %s
+    """, ((date.fromisoformat(today) - timedelta(days=retention))
+          .isoformat(),))
+    return len(states)
+
+
+def record(serverparams, slaparams, timestamp, sqldata_down, sqldata_up):
+    """Add a committed poll cycle to the daily aggregates
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
+    :param slaparams: dictionary of SLA settings or None
+    :param timestamp: integer epoch seconds of the poll cycle
+    :param sqldata_down: list of tuples for devices that are down
+    :param sqldata_up: list of tuples for devices that are up
+    :returns: integer number of devices recorded
+    """
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+    recorded = record_cycle(cursor, serverparams["database"], timestamp,
+                            [row[0] for row in sqldata_down],
+                            [row[0] for row in sqldata_up], slaparams)
+    db.commit()
+    cursor.close()
+    db.close()
+    return recorded
+
+
+def metrics(totals):
+    """SLA metrics of summed counters
+
+    :param totals: dictionary of COUNTERS: integer
+    :returns: dictionary of the counters plus uptime_pct, mttr_seconds
+        and mtbf_seconds (None when not defined, eg. no outages)
+    """
+    monitored = totals["monitored_seconds"]
+    up = monitored - totals["down_seconds"]
+    result = dict(totals)
+    result["uptime_pct"] = round(up * 100 / monitored, 3) \
+        if monitored else None
+    result["mttr_seconds"] = round(totals["repair_seconds"] /
+                                   totals["repairs"]) \
+        if totals["repairs"] else None
+    result["mtbf_seconds"] = round(up / totals["outages"]) \
+        if totals["outages"] else None
+    return result
+
+
+def data_version(cursor, database):
+    """Identifies the recorded data; changes with every recorded cycle
+
+    Every recorded device moves its last_sample forward, so the sum
+    changes even when a late batch of older samples is recorded.
+
+    :param cursor: database cursor
+    :param database: string of the database name
+    :returns: list of integers
+    """
+    cursor.execute(f"""SELECT COUNT(*), SUM(last_sample)
+    FROM {database}.sla_state
+    """)
+    return [int(value or 0) for value in cursor.fetchone()]
+
+
+def compute_report(cursor, database, start, end):
+    """SLA report of a window of days from the daily aggregates
+
+    :param cursor: database cursor
+    :param database: string of the database name
+    :param start, end: ISO date strings of the first and last day
+    :returns: dictionary with the window, 'overall' metrics and the
+        metrics by 'device' (IP), device_group and source
+    """
+    sums = ", ".join(f"SUM({counter})" for counter in COUNTERS)
+    cursor.execute(f"""SELECT totals.*, inventory.hostname,
+    inventory.device_group, inventory.source
+    FROM (SELECT mgmt_ip_address, {sums}
+          FROM {database}.sla_daily
+          WHERE day BETWEEN %s AND %s
+          GROUP BY mgmt_ip_address) AS totals
+    LEFT JOIN {database}.inventory AS inventory
+    ON inventory.mgmt_ip_address = totals.mgmt_ip_address
+    """, (start, end))
+
+    overall = dict.fromkeys(COUNTERS, 0)
+    groups = {grouping: {} for grouping in GROUPINGS}
+    devices = {}
+    for row in cursor.fetchall():
+        ip = row[0]
+        totals = dict(zip(COUNTERS, (int(value or 0)
+                                     for value in row[1:len(COUNTERS) + 1])))
+        (hostname, device_group, source) = row[len(COUNTERS) + 1:]
+        labels = {"device_group": device_group or "(not in inventory)",
+                  "source": source or "(not in inventory)"}
+        for counter, value in totals.items():
+            overall[counter] += value
+        for grouping in GROUPINGS:
+            group = groups[grouping].setdefault(labels[grouping],
+                                                dict.fromkeys(COUNTERS, 0))
+            group["devices"] = group.get("devices", 0) + 1
+            for counter, value in totals.items():
+                group[counter] += value
+        devices[ip] = dict(metrics(totals), hostname=hostname, **labels)
+
+    report = {"start": start, "end": end, "generated": int(time.time()),
+              "overall": dict(metrics(overall), devices=len(devices)),
+              "device": devices}
+    for grouping in GROUPINGS:
+        report[grouping] = {name: metrics(totals)
+                            for name, totals in groups[grouping].items()}
+    return report
+
+
+def _cache_file(slaparams, start, end):
+    return os.path.join(slaparams.get("CacheDir", DEFAULT_CACHE_DIR),
+                        f"sla-{start}-{end}.json")
+
+
+def read_cached(slaparams, start, end, version):
+    """Cached report of a window, if recorded from the same data
+
+    :returns: dictionary of the report or None
+    """
+    filename = _cache_file(slaparams, start, end)
+    try:
+        with open(filename, "rb") as infile:
+            cached = JSONCodec.loads(infile.read())
+    except (OSError, ValueError):
+        return None
+    if cached.get("version") != version:
+        return None
+    os.utime(filename)  # least recently used are evicted first
+    return cached["report"]
+
+
+def write_cached(slaparams, start, end, version, report):
+    """Cache a report, evicting the least recently used ones
+
+    :returns: None
+    """
+    cache_dir = slaparams.get("CacheDir", DEFAULT_CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    filename = _cache_file(slaparams, start, end)
+    tmpfile = f"{filename}.{os.getpid()}.tmp"
+    with open(tmpfile, "wb") as outfile:
+        outfile.write(JSONCodec.dumps({"version": version, "report": report}))
+    os.replace(tmpfile, filename)
+
+    entries = sorted((entry.stat().st_mtime, entry.path)
+                     for entry in os.scandir(cache_dir)
+                     if entry.name.startswith("sla-") and
+                     entry.name.endswith(".json"))
+    for (_, path) in entries[:-slaparams.get("MaxCacheEntries",
+                                             DEFAULT_MAX_CACHE_ENTRIES)]:
+        os.remove(path)
+
+
+def report(serverparams, start, end, slaparams=None):
+    """SLA report of a window of days, cached until new data arrives
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
+    :param start, end: ISO date strings of the first and last day
+    :param slaparams: dictionary of SLA settings or None
+    :returns: dictionary of the report, see compute_report()
+    """
+    slaparams = slaparams or {}
+    database = serverparams["database"]
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+    version = data_version(cursor, database)
+    result = read_cached(slaparams, start, end, version)
+    Metrics.gauge("sla_cache_hit", int(result is not None))
+    if result is None:
+        with Metrics.timer("compute_report"):
+            result = compute_report(cursor, database, start, end)
+        write_cached(slaparams, start, end, version, result)
+    cursor.close()
+    db.close()
+    return result
+
+
+def window(options, today=None):
+    """First and last day of the report window of the command line
+
+    :param options: argparse namespace
+    :param today: optional date, for testing
+    :returns: (start, end) ISO date strings
+    """
+    today = today or date.today()
+    if options.month:
+        first = datetime.strptime(options.month, "%Y-%m").date()
+        following = (first + timedelta(days=32)).replace(day=1)
+        return first.isoformat(), (following - timedelta(days=1)).isoformat()
+    if options.start:
+        return options.start, options.end or today.isoformat()
+    return (today - timedelta(days=options.days - 1)).isoformat(), \
+        today.isoformat()
+
+
+def _duration(seconds):
+    if seconds is None:
+        return "-"
+    (hours, seconds) = divmod(int(seconds), 3600)
+    return f"{hours}h{seconds // 60:02d}m"
+
+
+def print_report(result, by, output_format="text"):
+    """Print a report grouped by device, device_group or source
+
+    :param result: dictionary of the report
+    :param by: string; 'device', 'device_group' or 'source'
+    :param output_format: string; 'text', 'csv' or 'json'
+    :returns: None
+    """
+    rows = result[by]
+    if output_format == "json":
+        print(JSONCodec.dumps({key: result[key] for key in
+                               ("start", "end", "overall", by)}).decode())
+        return
+    names = sorted(rows, key=lambda name: (
+        rows[name]["uptime_pct"] is None, rows[name]["uptime_pct"] or 0,
+        name))
+    if output_format == "csv":
+        import csv
+
+        writer = csv.writer(sys.stdout)
+        columns = ["uptime_pct", "outages", "mttr_seconds", "mtbf_seconds",
+                   "monitored_seconds", "down_seconds"]
+        extra = ["hostname", "device_group", "source"] if by == "device" \
+            else ["devices"]
+        writer.writerow([by] + extra + columns)
+        for name in names:
+            writer.writerow([name] + [rows[name].get(column)
+                                      for column in extra + columns])
+        return
+
+    overall = result["overall"]
+    uptime = "-" if overall["uptime_pct"] is None else overall["uptime_pct"]
+    print(f"Availability {result['start']} to {result['end']}: {uptime} % "
+          f"over {overall['devices']} devices, {overall['outages']} "
+          f"outages, MTTR {_duration(overall['mttr_seconds'])}, "
+          f"MTBF {_duration(overall['mtbf_seconds'])}")
+    print(f"{by:40} {'uptime %':>9} {'outages':>8} {'MTTR':>9} "
+          f"{'MTBF':>10}")
+    for name in names:
+        row = rows[name]
+        label = f"{name} ({row['hostname']})" \
+            if by == "device" and row.get("hostname") else name
+        uptime = "-" if row["uptime_pct"] is None \
+            else f"{row['uptime_pct']:.3f}"
+        print(f"{label[:40]:40} {uptime:>9} {row['outages']:8} "
+              f"{_duration(row['mttr_seconds']):>9} "
+              f"{_duration(row['mtbf_seconds']):>10}")
+
+
+def parse_args():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Availability SLA report from the ping history")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS,
+                        help="window of days ending today (default: "
+                             f"{DEFAULT_DAYS})")
+    parser.add_argument("--month", help="calendar month, eg. 2026-09")
+    parser.add_argument("--start", help="first day, eg. 2026-09-01")
+    parser.add_argument("--end", help="last day (default: today)")
+    parser.add_argument("--by", default="device_group",
+                        choices=("device_group", "source", "device"))
+    parser.add_argument("--format", default="text",
+                        choices=("text", "csv", "json"))
+    return parser.parse_args()
+
+
+def main():
+    options = parse_args()
+    with Metrics.run("SLAEngine", GetEnv.getparam("Metrics")):
+        try:
+            (start, end) = window(options)
+            if date.fromisoformat(start) > date.fromisoformat(end):
+                sys.exit(f"Window starts ({start}) after it ends ({end})")
+        except ValueError as e:
+            sys.exit(f"Invalid date: {e}")
+        result = report(GetEnv.getparam("MySQL"), start, end,
+                        GetEnv.getparam("SLA"))
+        print_report(result, options.by, options.format)
+
+
+if __name__ == "__main__":
+    Profiling.run(main)
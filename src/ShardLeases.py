@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Shard assignment for multiple poller workers (ShardLeases.py)
+
+#                                                                      #
+Lets several PingAndUpdateInventory.py workers (on one or more hosts)
+share the inventory without pinging any device twice.  Devices are
+hashed on mgmt_ip_address into a fixed number of shards, so a device
+never changes shard.  Every poll cycle each worker:
+
+    1. records a heartbeat in the 'pollers' table
+    2. reads the live workers - heartbeat within LeaseSeconds
+    3. computes the shards it should own by rendezvous (highest random
+       weight) hashing of every shard over the live workers, so a
+       worker joining or leaving only moves its own share of shards
+    4. releases the leases it should no longer hold and claims or
+       renews the leases of its shards in the 'shard_leases' table -
+       a lease still held by another worker is only taken over once it
+       has expired
+    5. pings the devices of the shards it holds a lease on
+
+When a worker dies its heartbeat and leases expire after LeaseSeconds
+and the remaining workers take over its shards.  All workers write to
+the same pingresults table.  Leases and heartbeats are epoch seconds
+from the workers' clocks, so the hosts should be NTP synchronized;
+LeaseSeconds should be a few times the poll interval.
+
+Required inputs/variables:
+    optionsconfig.yaml Sharding section (optional)
+        Enabled - True to run as one of several workers
+        Shards - number of shards; the same on every worker
+        LeaseSeconds - heartbeat and lease lifetime
+        WorkerId - unique name of this worker (default: hostname)
+
+Outputs:
+    Rows of the pollers and shard_leases tables
+
+Version log:
+v1      2026-1019   First release
+
+Credits:
+"""
+__version__ = '1'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import os
+import time
+import socket
+import hashlib
+import DBConnect
+
+
+# Script-global variables
+DEFAULT_SHARDS = 64
+DEFAULT_LEASE_SECONDS = 180
+
+
+def enabled(shardparams):
+    """Whether this poller is one of several sharded workers
+
+    :param shardparams: dictionary of Sharding settings from
+        optionsconfig.yaml or None
+    :returns: boolean
+    """
+    return bool((shardparams or {}).get("Enabled", False))
+
+
+def worker_id(shardparams, override=None):
+    """Name of this worker
+
+    :param shardparams: dictionary of Sharding settings or None
+    :param override: optional string, eg. from the command line
+    :returns: string
+    """
+    return override or (shardparams or {}).get("WorkerId") \
+        or socket.gethostname()
+
+
+def worker_file(filename, worker):
+    """Per-worker variant of a local file name
+
+    Keeps the ping file and state files of workers sharing a working
+    directory apart, eg. 'latencystats.npz' -> 'latencystats-w1.npz'.
+
+    :param filename: string of the file name
+    :param worker: string of the worker name
+    :returns: string of the file name
+    """
+    root, ext = os.path.splitext(filename)
+    return f"{root}-{worker}{ext}"
+
+
+def _hash(text):
+    return int.from_bytes(hashlib.md5(text.encode()).digest()[:8], "big")
+
+
+def shard_of(ip, shards=DEFAULT_SHARDS):
+    """Shard of a device
+
+    :param ip: string of the device's mgmt_ip_address
+    :param shards: integer number of shards
+    :returns: integer shard number
+    """
+    return _hash(ip) % shards
+
+
+def owner_of(shard, workers):
+    """Worker a shard belongs to, by rendezvous hashing
+
+    :param shard: integer shard number
+    :param workers: list of live worker names
+    :returns: string of the worker name
+    """
+    return max(workers, key=lambda worker: (_hash(f"{worker}/{shard}"),
+                                            worker))
+
+
+def claim_shards(serverparams, worker, shards=DEFAULT_SHARDS,
+                 lease_seconds=DEFAULT_LEASE_SECONDS):
+    """Heartbeat, then release and claim shard leases
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
+    :param worker: string of this worker's name
+    :param shards: integer number of shards
+    :param lease_seconds: integer heartbeat and lease lifetime
+    :returns: set of shard numbers this worker holds a lease on
+    """
+
+    database = serverparams["database"]
+    now = int(time.time())
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+
+    cursor.execute(f"""INSERT INTO {database}.pollers
+    (worker_id, hostname, heartbeat) VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE hostname=VALUES(hostname),
+        heartbeat=VALUES(heartbeat)
+    """, (worker, socket.gethostname(), now))
+    db.commit()
+
+    cursor.execute(f"""SELECT worker_id FROM {database}.pollers
+    WHERE heartbeat > %s
+    """, (now - lease_seconds,))
+    workers = [row[0] for row in cursor.fetchall()]
+    wanted = {shard for shard in range(shards)
+              if owner_of(shard, workers) == worker}
+
+    cursor.execute(f"""SELECT shard FROM {database}.shard_leases
+    WHERE worker_id = %s AND lease_expires > %s
+    """, (worker, now))
+    release = [(worker, row[0]) for row in cursor.fetchall()
+               if row[0] not in wanted]
+    if release:
+        # Hand over right away instead of letting the lease run out
+        cursor.executemany(f"""UPDATE {database}.shard_leases
+        SET lease_expires = 0 WHERE worker_id = %s AND shard = %s
+        """, release)
+
+    if wanted:
+        # Takes a lease over only when it is ours or has expired
+        cursor.executemany(f"""INSERT INTO {database}.shard_leases
+        (shard, worker_id, lease_expires) VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            worker_id = CASE WHEN lease_expires <= %s
+                OR worker_id = VALUES(worker_id)
+                THEN VALUES(worker_id) ELSE worker_id END,
+            lease_expires = CASE WHEN lease_expires <= %s
+                OR worker_id = VALUES(worker_id)
+                THEN VALUES(lease_expires) ELSE lease_expires END
+        """, [(shard, worker, now + lease_seconds, now, now)
+              for shard in sorted(wanted)])
+    db.commit()
+
+    cursor.execute(f"""SELECT shard FROM {database}.shard_leases
+    WHERE worker_id = %s AND lease_expires > %s
+    """, (worker, now))
+    owned = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    db.close()
+
+    print(f"Worker {worker}: {len(workers)} live workers, owns "
+          f"{len(owned)} of {shards} shards ({len(wanted)} assigned)")
+    return owned
+
+
+def assign_devices(shardparams, serverparams, devicelist, worker):
+    """Devices this worker should ping this cycle
+
+    :param shardparams: dictionary of Sharding settings or None
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
+    :param devicelist: list of device IPs of the whole inventory
+    :param worker: string of this worker's name
+    :returns: list of device IPs in the shards leased by this worker
+    """
+    shardparams = shardparams or {}
+    shards = shardparams.get("Shards", DEFAULT_SHARDS)
+    owned = claim_shards(serverparams, worker, shards,
+                         shardparams.get("LeaseSeconds",
+                                         DEFAULT_LEASE_SECONDS))
+    return [ip for ip in devicelist if shard_of(ip, shards) in owned]
@@ -0,0 +1,661 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Records the network and replays it for load tests (Simulator.py)
+
+#                                                                      #
+Scaling changes are hard to validate without a network of tens of
+thousands of devices.  This script runs the Orchestrator pipeline -
+inventory sync, ping and dashboard - in one of two modes:
+
+    record - against the real network, saving what the pipeline saw
+             in CaptureDir: the fping (and Probes) results of every
+             poll cycle, and the device pages of the DNA Center, ACI
+             APIC and Prime Infrastructure REST APIs and the WLC
+             NETCONF replies of every inventory sync
+    replay - with fping, Probes and the collectors' API calls answered
+             from the capture, so the whole pipeline runs against a
+             local MySQL without any network devices or controllers
+
+A replay runs SpeedUp times faster than real time: the Orchestrator
+intervals and the recorded fping run times are divided by it, and the
+capture is looped when the replay outlasts it.  With a Multiplier of
+N, every IPv4 device of the collectors' captures is cloned N-1 times,
+on IPv6 addresses of CLONE_NETWORK that map back to the original, so
+a capture of 1,000 devices replays a fleet of 20,000.  A clone replays
+its original's results shifted in time, so the copies don't all
+change state in the same cycle.  Devices without a capture, eg. added
+to the inventory by hand, answer every ping.
+
+Outages are synthesized on top of the capture.  Each of the Outages
+takes Start and Duration seconds of simulated time since the replay
+started and the devices it hits - a random Fraction of all devices
+and/or listed Devices and Networks.  They are down, or, with Loss
+below 100 or added Latency ms, dropping or latent.
+
+The capture holds no credentials, but it does hold the inventory of
+the network; keep it as private as the optionsconfig.yaml.  Replays
+write to the MySQL database of optionsconfig.yaml - point it at a
+dedicated one, eg. the MySQL container of the Docker setup.  The
+collectors still import requests and ncclient, as listed in
+requirements.txt.
+
+Required inputs/variables:
+    record|replay - the mode
+    optionsconfig.yaml Simulation section (optional)
+        CaptureDir - directory of the capture
+        SpeedUp - replay speed relative to real time
+        Multiplier - fleet size relative to the capture
+        Outages - list of Start, Duration, Fraction, Devices, Networks,
+            Loss and Latency
+        Seed - random seed of the Fraction of devices an outage hits
+    optionsconfig.yaml Orchestrator section and the sections it uses
+    Command line options override the Simulation settings, see
+        'python Simulator.py --help'
+
+Outputs:
+    record - capture files in CaptureDir, besides the usual outputs
+    replay - the usual outputs of the pipeline: inventory and
+        pingresults tables, dashboard pages and metrics
+
+Version log:
+v1      2026-1019   First release
+
+Credits:
+"""
+__version__ = '1'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import os
+import re
+import sys
+import copy
+import glob
+import gzip
+import time
+import zlib
+import argparse
+import importlib
+import ipaddress
+import threading
+import subprocess
+from functools import lru_cache
+import xml.etree.ElementTree as ET
+import JSONCodec
+import GetEnv
+import Metrics
+import Profiling
+import Orchestrator
+import PingAndUpdateInventory
+
+
+# Script-global variables
+DEFAULT_CAPTURE_DIR = "capture"
+MANIFEST_FILE = "capture.json"
+SAMPLES_FILE = "probes.jsonl.gz"
+API_DIR = "api"
+API_SUFFIX = ".jsonl.gz"
+# Clone n of IPv4 device a.b.c.d is fd00:5151::n:a.b.c.d
+CLONE_NETWORK = ipaddress.ip_network("fd00:5151::/64")
+# Result of devices without a capture
+UNRECORDED = {"xmt": 3, "rcv": 3, "loss_percentage": 0, "min": 1.0,
+              "avg": 1.0, "max": 1.0}
+# Collector module, inventory source, stream, token and API functions
+COLLECTORS = (
+    ("GetDNACDevices", "DNACenter", "stream_devices", "get_dnac_authtoken",
+     "get_dnac_devices"),
+    ("GetACIAPICDevices", "ACIAPIC", "stream_devices",
+     "get_aciapic_authtoken", "get_aciapic_devices"),
+    ("GetPrimeInfraDevices", "PrimeInfrastructure", "stream_devices", None,
+     "get_prime_infra_devices"),
+    ("GetWLCAPs", "WLC", "stream_waps", None, "get_wap_info"),
+)
+# Server settings saved with a capture; never the credentials
+SERVER_KEYS = ("host", "alias", "PageSize")
+
+
+def clone_ip(ip, number):
+    """Address of a clone of an IPv4 device
+
+    :param ip: string of the device's IP address
+    :param number: integer clone number, from 1
+    :returns: string of the clone's IPv6 address, or None when the
+        device has no IPv4 address to clone
+    """
+    try:
+        address = ipaddress.ip_address(str(ip))
+    except ValueError:
+        return None
+    if address.version != 4 or address.is_unspecified:
+        return None
+    return str(ipaddress.IPv6Address(
+        int(CLONE_NETWORK.network_address) + (number << 32) + int(address)))
+
+
+@lru_cache(maxsize=2**20)
+def original_ip(ip):
+    """Device a clone was made from
+
+    :param ip: string of an IP address
+    :returns: (IP, clone number) - (ip, 0) for devices that aren't
+        clones
+    """
+    if ":" not in ip:
+        return (ip, 0)
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return (ip, 0)
+    if address not in CLONE_NETWORK:
+        return (ip, 0)
+    value = int(address)
+    return (str(ipaddress.IPv4Address(value & 0xffffffff)),
+            (value >> 32) & 0xffffffff)
+
+
+def _suffix(text, number):
+    return None if text is None else f"{text}-sim{number}"
+
+
+def clone_dnac_page(page, number):
+    """Clones of the devices of a DNA Center page"""
+    devices = []
+    for item in page.get("response") or []:
+        ip = clone_ip(item.get("managementIpAddress"), number)
+        if ip is not None:
+            devices.append(dict(item, managementIpAddress=ip,
+                                hostname=_suffix(item.get("hostname"),
+                                                 number)))
+    return dict(page, response=devices)
+
+
+def clone_apic_page(page, number):
+    """Clones of the devices of an ACI APIC page
+
+    Every clone number is a fabric of its own, so Topology groups the
+    clones' leaves under the clones' spines.
+    """
+    devices = []
+    for item in page.get("imdata") or []:
+        attributes = item.get("topSystem", {}).get("attributes", {})
+        ip = clone_ip(attributes.get("oobMgmtAddr"), number)
+        if ip is not None:
+            devices.append({"topSystem": {"attributes": dict(
+                attributes, oobMgmtAddr=ip,
+                fabricDomain=_suffix(attributes.get("fabricDomain",
+                                                    "Unknown"), number))}})
+    return dict(page, imdata=devices)
+
+
+def clone_prime_page(page, number):
+    """Clones of the devices of a Prime Infrastructure page"""
+    query = page.get("queryResponse", {})
+    devices = []
+    for entity in query.get("entity") or []:
+        device = entity.get("devicesDTO", {})
+        ip = clone_ip(device.get("ipAddress"), number)
+        if ip is not None:
+            devices.append({"devicesDTO": dict(
+                device, ipAddress=ip,
+                deviceName=_suffix(device.get("deviceName"), number))})
+    return dict(page, queryResponse=dict(query, entity=devices))
+
+
+def clone_wlc_reply(root, number):
+    """Add the clones of the access points of a WLC NETCONF reply
+
+    :param root: ElementTree element of the reply, without namespaces
+    :param number: integer clone number, from 1
+    :returns: None
+    """
+    for element in list(root.iter("capwap-data")):
+        ip = clone_ip(element.findtext("ip-addr"), number)
+        if ip is None:
+            continue
+        clone = copy.deepcopy(element)
+        clone.find("ip-addr").text = ip
+        for path in ("wtp-mac",
+                     "device-detail/static-info/board-data/wtp-serial-num"):
+            field = clone.find(path)
+            if field is not None:
+                field.text = _suffix(field.text, number)
+        root.append(clone)
+    for element in list(root.iter("ap-name-mac-map")):
+        clone = copy.deepcopy(element)
+        for path in ("wtp-mac", "wtp-name"):
+            field = clone.find(path)
+            if field is not None:
+                field.text = _suffix(field.text, number)
+        root.append(clone)
+
+
+CLONERS = {"DNACenter": clone_dnac_page, "ACIAPIC": clone_apic_page,
+           "PrimeInfrastructure": clone_prime_page}
+
+
+def api_file(capture_dir, source, host):
+    safe = re.sub(r"[^\w.-]", "_", str(host))
+    return os.path.join(capture_dir, API_DIR, f"{source}-{safe}{API_SUFFIX}")
+
+
+def read_api_file(filename):
+    """Server settings and payloads of a collector capture
+
+    :param filename: string of the capture file
+    :returns: (dictionary of server settings, list of payloads)
+    """
+    with gzip.open(filename, "rb") as infile:
+        lines = [JSONCodec.loads(line) for line in infile if line.strip()]
+    return (lines[0]["server"], lines[1:])
+
+
+def collector_modules():
+    """Collector modules that can be imported
+
+    :returns: list of (module, COLLECTORS entry) tuples
+    """
+    modules = []
+    for entry in COLLECTORS:
+        try:
+            modules.append((importlib.import_module(entry[0]), entry))
+        except ImportError as e:
+            print(f"Collector {entry[0]} not simulated: {e}",
+                  file=sys.stderr)
+    return modules
+
+
+class Recorder:
+    """Saves the fping and Probes results and the collectors' API
+    payloads of the pipeline
+
+    :param capture_dir: string of the capture directory
+    """
+
+    def __init__(self, capture_dir):
+        self.capture_dir = capture_dir
+        os.makedirs(os.path.join(capture_dir, API_DIR), exist_ok=True)
+        manifest = os.path.join(capture_dir, MANIFEST_FILE)
+        try:
+            with open(manifest, "rb") as infile:
+                self.started = JSONCodec.loads(infile.read())["started"]
+        except (OSError, ValueError, KeyError):
+            # A new capture; sample times count from here
+            self.started = time.time()
+            with open(manifest, "wb") as outfile:
+                outfile.write(JSONCodec.dumps({"started": self.started,
+                                               "version": __version__}))
+        # Probes run on a thread of their own, next to fping
+        self.lock = threading.Lock()
+        self.fping = PingAndUpdateInventory.execute_fping
+        self.probes = None
+
+    def record_hosts(self, started, elapsed, hosts):
+        line = JSONCodec.dumps({"t": round(started - self.started, 3),
+                                "elapsed": round(elapsed, 3),
+                                "hosts": hosts}) + b"\n"
+        with self.lock, gzip.open(os.path.join(self.capture_dir,
+                                               SAMPLES_FILE), "ab") as outfile:
+            outfile.write(line)
+
+    def execute_fping(self, pingfile=PingAndUpdateInventory.PINGFILE,
+                      timeout=None,
+                      options=PingAndUpdateInventory.FPING_OPTIONS):
+        started = time.time()
+        output = self.fping(pingfile, timeout, options)
+        self.record_hosts(started, time.time() - started,
+                          JSONCodec.loads(output)["hosts"])
+        return output
+
+    def run_probes(self, targets, probeparams=None, budget=None,
+                   attempts=None):
+        started = time.time()
+        (hosts, unprobed) = self.probes(targets, probeparams, budget,
+                                        attempts)
+        self.record_hosts(started, time.time() - started, hosts)
+        return (hosts, unprobed)
+
+    def capture_pages(self, source, server, pages):
+        """Pass a collector's pages on, saving them
+
+        The capture replaces the previous one of the server once all
+        pages are read.
+        """
+        filename = api_file(self.capture_dir, source, server["host"])
+        tmpfile = f"{filename}.{os.getpid()}.tmp"
+        try:
+            with gzip.open(tmpfile, "wb") as outfile:
+                outfile.write(JSONCodec.dumps(
+                    {"server": {key: server[key] for key in SERVER_KEYS
+                                if key in server}}) + b"\n")
+                for page in pages:
+                    outfile.write(JSONCodec.dumps(page) + b"\n")
+                    yield page
+            os.replace(tmpfile, filename)
+        finally:
+            if os.path.exists(tmpfile):
+                os.remove(tmpfile)
+
+    def install(self):
+        """Record from now on"""
+        import Probes
+
+        PingAndUpdateInventory.execute_fping = self.execute_fping
+        self.probes = Probes.run
+        Probes.run = self.run_probes
+        for (module, (_, source, _, _, api)) in collector_modules():
+            fetch = getattr(module, api)
+            if source == "WLC":
+                def get_wap_info(wlc, fetch=fetch):
+                    root = fetch(wlc)
+                    pages = [{"xml": ET.tostring(root, encoding="unicode")}]
+                    for _ in self.capture_pages("WLC", wlc, pages):
+                        pass
+                    return root
+                setattr(module, api, get_wap_info)
+            else:
+                setattr(module, api,
+                        lambda server, *args, fetch=fetch, source=source:
+                        self.capture_pages(source, server,
+                                           fetch(server, *args)))
+
+
+class Outage:
+    """A synthesized outage of a replay
+
+    :param outageparams: dictionary of Start, Duration, Fraction,
+        Devices, Networks, Loss and Latency
+    :param number: integer number of the outage, varies the devices
+        its Fraction hits
+    :param seed: integer random seed
+    """
+
+    def __init__(self, outageparams, number=0, seed=0):
+        self.start = float(outageparams.get("Start", 0))
+        self.end = self.start + float(outageparams.get("Duration", 300))
+        self.threshold = float(outageparams.get("Fraction", 0)) * 2**32
+        self.devices = {str(ip) for ip in outageparams.get("Devices") or []}
+        self.networks = [ipaddress.ip_network(str(network), strict=False)
+                         for network in outageparams.get("Networks") or []]
+        self.loss = int(outageparams.get("Loss", 100))
+        self.latency = float(outageparams.get("Latency", 0))
+        self.salt = f"{seed}:{number}:"
+        self.covered = {}
+
+    def active(self, now):
+        return self.start <= now < self.end
+
+    def covers(self, ip):
+        if ip not in self.covered:
+            covered = ip in self.devices or \
+                zlib.crc32((self.salt + ip).encode()) < self.threshold
+            if not covered and self.networks:
+                address = ipaddress.ip_address(ip)
+                covered = any(address in network
+                              for network in self.networks)
+            self.covered[ip] = covered
+        return self.covered[ip]
+
+    def apply(self, result):
+        """Result of a device hit by the outage"""
+        if self.loss >= 100:
+            return {"xmt": result.get("xmt", 3), "rcv": 0,
+                    "loss_percentage": 100}
+        result = dict(result)
+        result["loss_percentage"] = max(result["loss_percentage"],
+                                        self.loss)
+        for key in ("min", "avg", "max"):
+            result[key] = round(result[key] + self.latency, 2)
+        return result
+
+
+def parse_outage(text):
+    """Outage of the command line, 'FRACTION,START,DURATION'"""
+    try:
+        (fraction, start, duration) = (float(value)
+                                       for value in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"'{text}' is not FRACTION,START,DURATION")
+    return {"Fraction": fraction, "Start": start, "Duration": duration}
+
+
+class Replayer:
+    """Answers fping, Probes and the collectors' API calls from a
+    capture
+
+    :param capture_dir: string of the capture directory
+    :param speedup: number of simulated seconds per real second
+    :param multiplier: integer fleet size relative to the capture
+    :param outages: list of Outage
+    """
+
+    def __init__(self, capture_dir, speedup=1, multiplier=1, outages=()):
+        import numpy as np
+
+        self.capture_dir = capture_dir
+        self.speedup = float(speedup)
+        self.multiplier = max(int(multiplier), 1)
+        self.outages = list(outages)
+        filename = os.path.join(capture_dir, SAMPLES_FILE)
+        if not os.path.exists(filename):
+            sys.exit(f"No capture in '{capture_dir}'; run 'python "
+                     f"Simulator.py record' first")
+
+        # One row per device result: device index, time, loss and
+        #  latencies, sorted by device and time
+        self.index = {}
+        (devices, times, loss, latency, runs, elapsed) = \
+            ([], [], [], [], [], [])
+        with gzip.open(filename, "rb") as infile:
+            for line in infile:
+                if not line.strip():
+                    continue
+                run = JSONCodec.loads(line)
+                runs.append(run["t"])
+                elapsed.append(run["elapsed"])
+                for (ip, result) in run["hosts"].items():
+                    devices.append(self.index.setdefault(ip,
+                                                         len(self.index)))
+                    times.append(run["t"])
+                    loss.append(result.get("loss_percentage", 100))
+                    latency.append((result.get("min", np.nan),
+                                    result.get("avg", np.nan),
+                                    result.get("max", np.nan)))
+        if not devices:
+            sys.exit(f"Capture in '{capture_dir}' has no results")
+        devices = np.array(devices, dtype=np.int64)
+        times = np.array(times, dtype=np.float64)
+        order = np.lexsort((times, devices))
+        self.first = float(times.min())
+        self.span = float(times.max()) + 1
+        self.keys = devices[order] * self.span + times[order]
+        self.starts = np.searchsorted(devices[order],
+                                      np.arange(len(self.index)))
+        self.loss = np.array(loss, dtype=np.uint8)[order]
+        self.latency = np.array(latency, dtype=np.float32)[order]
+        # The capture loops after its last run's poll interval
+        runs = np.unique(np.array(runs))
+        period = float(np.median(np.diff(runs))) if len(runs) > 1 else 0.0
+        self.duration = float(runs[-1] - runs[0]) + period
+        self.delay = float(np.mean(elapsed)) / self.speedup
+        self.started = time.monotonic()
+        print(f"Replaying {len(self.index)} devices, "
+              f"{self.duration:.0f} s of capture, x{self.multiplier} "
+              f"fleet at {self.speedup:g}x speed")
+
+    def now(self):
+        """Seconds of simulated time since the replay started"""
+        return (time.monotonic() - self.started) * self.speedup
+
+    def hosts(self, ips):
+        """Recorded results of devices, with the outages applied
+
+        :param ips: list of device IPs
+        :returns: dictionary of IP: fping-style results
+        """
+        import numpy as np
+
+        now = self.now()
+        originals = [original_ip(ip) for ip in ips]
+        index = np.fromiter((self.index.get(ip, -1) for (ip, _) in originals),
+                            dtype=np.int64, count=len(ips))
+        numbers = np.fromiter((number for (_, number) in originals),
+                              dtype=np.float64, count=len(ips))
+        known = index >= 0
+        index = np.where(known, index, 0)
+        when = np.full(len(ips), self.first)
+        if self.duration:
+            # Clones replay their original shifted in time
+            when += (now + numbers * self.duration / self.multiplier) % \
+                self.duration
+        position = np.searchsorted(self.keys, index * self.span + when,
+                                   side="right") - 1
+        position = np.maximum(position, self.starts[index])
+        loss = self.loss[position].tolist()
+        latency = np.round(self.latency[position].astype(np.float64),
+                           2).tolist()
+
+        active = [outage for outage in self.outages if outage.active(now)]
+        hosts = {}
+        unrecorded = 0
+        for (number, ip) in enumerate(ips):
+            if not known[number]:
+                result = dict(UNRECORDED)
+                unrecorded += 1
+            elif loss[number] >= 100:
+                result = {"xmt": 3, "rcv": 0, "loss_percentage": 100}
+            else:
+                (low, average, high) = latency[number]
+                result = {"xmt": 3, "rcv": 3 - round(loss[number] * 3 / 100),
+                          "loss_percentage": loss[number], "min": low,
+                          "avg": average, "max": high}
+            for outage in active:
+                if outage.covers(ip):
+                    result = outage.apply(result)
+            hosts[ip] = result
+        if unrecorded:
+            Metrics.count("replay_unrecorded", unrecorded)
+        return hosts
+
+    def execute_fping(self, pingfile=PingAndUpdateInventory.PINGFILE,
+                      timeout=None,
+                      options=PingAndUpdateInventory.FPING_OPTIONS):
+        with open(pingfile, "r") as infile:
+            ips = infile.read().split()
+        if timeout is not None and self.delay > timeout:
+            time.sleep(max(timeout, 0))
+            raise subprocess.TimeoutExpired(["fping", *options], timeout)
+        time.sleep(self.delay)
+        return JSONCodec.dumps({"hosts": self.hosts(ips)})
+
+    def run_probes(self, targets, probeparams=None, budget=None,
+                   attempts=None):
+        return (self.hosts(list(targets)), [])
+
+    def servers(self, source):
+        """Server settings of a source's captures"""
+        return [read_api_file(filename)[0] for filename in sorted(glob.glob(
+            os.path.join(self.capture_dir, API_DIR,
+                         f"{source}-*{API_SUFFIX}")))]
+
+    def pages(self, source, server):
+        """A server's captured pages, followed by their clones"""
+        (_, pages) = read_api_file(api_file(self.capture_dir, source,
+                                            server["host"]))
+        yield from pages
+        for number in range(1, self.multiplier):
+            for page in pages:
+                yield CLONERS[source](page, number)
+
+    def wap_info(self, wlc):
+        """A controller's captured NETCONF reply, with the clones"""
+        (_, replies) = read_api_file(api_file(self.capture_dir, "WLC",
+                                              wlc["host"]))
+        root = ET.fromstring(replies[0]["xml"])
+        for number in range(1, self.multiplier):
+            clone_wlc_reply(root, number)
+        return root
+
+    def install(self):
+        """Replay from now on"""
+        import Probes
+
+        PingAndUpdateInventory.execute_fping = self.execute_fping
+        Probes.run = self.run_probes
+        for (module, (_, source, stream, token, api)) in collector_modules():
+            # The captured servers replace those of optionsconfig.yaml
+            setattr(module, stream,
+                    lambda serverlist, stream=getattr(module, stream),
+                    source=source: stream(self.servers(source)))
+            if token is not None:
+                setattr(module, token, lambda server: "replay")
+            if source == "WLC":
+                setattr(module, api, self.wap_info)
+            else:
+                setattr(module, api,
+                        lambda server, *args, source=source:
+                        self.pages(source, server))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Record the network, or replay a recording through "
+                    "the Orchestrator pipeline")
+    parser.add_argument("mode", choices=("record", "replay"))
+    parser.add_argument("--capture",
+                        help="capture directory (default: CaptureDir)")
+    parser.add_argument("--speedup", type=float,
+                        help="replay speed relative to real time "
+                             "(default: SpeedUp or 1)")
+    parser.add_argument("--multiplier", type=int,
+                        help="replayed fleet size relative to the capture "
+                             "(default: Multiplier or 1)")
+    parser.add_argument("--outage", type=parse_outage, action="append",
+                        default=[], metavar="FRACTION,START,DURATION",
+                        help="synthesize an outage of a fraction of the "
+                             "devices, in seconds of simulated time; "
+                             "adds to Outages")
+    parser.add_argument("--seed", type=int,
+                        help="random seed of the outages (default: Seed "
+                             "or 0)")
+    parser.add_argument("--once", action="store_true",
+                        help="run every task once and exit")
+    parser.add_argument("--worker-id",
+                        help="passed on to the Orchestrator")
+    return parser.parse_args()
+
+
+def main():
+    options = parse_args()
+    simparams = GetEnv.getparam("Simulation") or {}
+    capture_dir = options.capture or simparams.get("CaptureDir",
+                                                   DEFAULT_CAPTURE_DIR)
+    orchestratorparams = dict(GetEnv.getparam("Orchestrator") or {})
+    if options.mode == "record":
+        Recorder(capture_dir).install()
+    else:
+        speedup = options.speedup or simparams.get("SpeedUp", 1)
+        seed = options.seed if options.seed is not None \
+            else simparams.get("Seed", 0)
+        outages = [Outage(outageparams, number, seed)
+                   for (number, outageparams) in enumerate(
+                       (simparams.get("Outages") or []) + options.outage)]
+        Replayer(capture_dir, speedup,
+                 options.multiplier or simparams.get("Multiplier", 1),
+                 outages).install()
+        for (key, default) in (
+                ("InventoryInterval",
+                 Orchestrator.DEFAULT_INVENTORY_INTERVAL),
+                ("PollInterval", Orchestrator.DEFAULT_POLL_INTERVAL)):
+            orchestratorparams[key] = orchestratorparams.get(key,
+                                                             default) / speedup
+    Orchestrator.main(argparse.Namespace(once=options.once,
+                                         worker_id=options.worker_id),
+                      orchestratorparams)
+
+
+if __name__ == "__main__":
+    Profiling.run(main)
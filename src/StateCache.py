@@ -0,0 +1,472 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Shared snapshot of the latest ping results (StateCache.py)
+
+#                                                                      #
+PingAndUpdateInventory.py has every device's results in memory right
+after it commits them to MySQL.  It saves them as a snapshot file of
+dashboard rows - the same rows get_mysql_pingresults returns, already
+joined to the inventory - so CreateAvailabilityDashboard.py can render
+and count the poll stats without querying MySQL at all.
+
+The snapshot is columnar and fixed-width: a NumPy structured array
+(ROW_DTYPE, about 230 bytes per device) with IPs as 16-byte packed
+addresses (IPv4 as IPv4-mapped IPv6), float32 latencies, uint8
+reachability, state, flap score and stale flag and epoch second
+timestamps.  NULLs are NaN for latencies, 255 for the uint8 columns,
+-1 for timestamps and empty strings for the inventory, poller and
+probe type columns.  On disk it is a plain .npy file, so readers can memory-map
+it instead of unpickling tens of thousands of Python tuples.
+
+The pinger builds each snapshot from the previous one plus the ping
+cycle it has just committed.  When the snapshot is missing, unreadable
+or older than MaxAge seconds (eg. the pinger has stopped, or a cycle
+ran with the cache disabled) the readers fall back to MySQL, which
+stays the system of record.
+
+With Topology enabled, the pinger also saves the parent map it built
+for the cycle next to the snapshot, so the renderer groups the outages
+of down children without querying the inventory either.
+
+Required inputs/variables:
+    optionsconfig.yaml StateCache section (optional)
+        Enabled - True to write and read the snapshot
+        SnapshotFile - file holding the snapshot
+        MaxAge - seconds after which a snapshot is stale
+
+Outputs:
+    Snapshot file, and the Topology parents file next to it, replaced
+    atomically after every ping cycle
+
+Version log:
+v1      2026-1019   First release
+v2      2026-1019   Columnar NumPy snapshot (DeviceSnapshot), memory-
+    mapped by readers
+v3      2026-1019   Poller column
+v4      2026-1019   Stale column for devices left unprobed
+v5      2026-1019   Probe type column
+v6      2026-1019   load_results reads MySQL through the QueryCache
+v7      2026-1019   invalidate, for changes a ping cycle can't apply (eg.
+    pingresults rows removed by InventoryMerge)
+v8      2026-1019   Topology parent map saved next to the snapshot
+
+Credits:
+"""
+__version__ = '8'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import os
+import time
+import socket
+import ipaddress
+from functools import lru_cache
+from datetime import datetime
+from decimal import Decimal
+import numpy as np
+import FlapDetection
+import JSONCodec
+
+
+# Script-global variables
+DEFAULT_SNAPSHOT_FILE = "statecache.npy"
+DEFAULT_MAX_AGE = 600
+
+# Column widths follow mysql-table-ddl.sql
+ROW_DTYPE = np.dtype([
+    ("ip", "S16"),
+    ("hostname", "S45"),
+    ("source", "S30"),
+    ("device_group", "S45"),
+    ("reachable_pct", "u1"),
+    ("avg_latency", "f4"),
+    ("max_latency", "f4"),
+    ("p95_latency", "f4"),
+    ("datetime_lastup", "i8"),
+    ("down_count", "u4"),
+    ("state", "u1"),
+    ("flap_score", "u1"),
+    ("poller", "S45"),
+    ("stale", "u1"),
+    ("probe_type", "S20"),
+])
+NULL_UINT8 = 255
+NULL_TIME = -1
+
+_IPV4_MAPPED = b"\x00" * 10 + b"\xff\xff"
+_STATE_CODES = {name: code for code, name in
+                enumerate(FlapDetection.STATE_NAMES)}
+
+
+def enabled(cacheparams):
+    """Whether the snapshot is written and read
+
+    :param cacheparams: dictionary of StateCache settings from
+        optionsconfig.yaml or None
+    :returns: boolean
+    """
+    return bool((cacheparams or {}).get("Enabled", False))
+
+
+def pack_ip(ip):
+    """Pack an IP address string into 16 bytes
+
+    :param ip: string of an IPv4 or IPv6 address
+    :returns: bytes; IPv4 addresses as IPv4-mapped IPv6
+    """
+    try:
+        return _IPV4_MAPPED + socket.inet_pton(socket.AF_INET, ip)
+    except OSError:
+        return socket.inet_pton(socket.AF_INET6, ip)
+
+
+def unpack_ips(packed):
+    """Unpack 16-byte addresses into IP address strings
+
+    :param packed: NumPy array of S16 packed addresses
+    :returns: list of IP address strings
+    """
+    octets = np.frombuffer(np.ascontiguousarray(packed).tobytes(),
+                           dtype=np.uint8).reshape(-1, 16)
+    ipv4 = (octets[:, :12] == np.frombuffer(_IPV4_MAPPED,
+                                             dtype=np.uint8)).all(axis=1)
+    ips = ["%d.%d.%d.%d" % tuple(row) for row in octets[:, 12:].tolist()]
+    for row in np.flatnonzero(~ipv4).tolist():
+        ips[row] = str(ipaddress.IPv6Address(octets[row].tobytes()))
+    return ips
+
+
+def _text(value):
+    return None if value == b"" else value.decode("utf-8", "ignore")
+
+
+def _decimal(value):
+    # Latencies as read back from the decimal(7,2) columns; NaN is NULL
+    return None if value != value else Decimal(f"{value:.2f}")
+
+
+def _datetime(epoch):
+    return None if epoch == NULL_TIME else datetime.fromtimestamp(epoch)
+
+
+def _map_column(column, function):
+    # Converts each distinct value once - latencies, timestamps, sources
+    #  and groups repeat a lot across devices
+    values, inverse = np.unique(column, return_inverse=True)
+    mapped = np.empty(len(values), dtype=object)
+    mapped[:] = [function(value) for value in values.tolist()]
+    return mapped[inverse.reshape(-1)].tolist()
+
+
+def _latency(value):
+    return np.nan if value is None else value
+
+
+@lru_cache(maxsize=1024)
+def _epoch(value):
+    # SQLite hands back DATETIME columns as strings
+    if value is None:
+        return NULL_TIME
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+    return int(value.timestamp())
+
+
+class DeviceSnapshot:
+    """Columnar ping results of every device
+
+    :param array: NumPy structured array of ROW_DTYPE, possibly a
+        read-only memory map
+    """
+
+    def __init__(self, array=None):
+        self.array = np.zeros(0, dtype=ROW_DTYPE) if array is None \
+            else array
+        self._ips = None
+
+    def __len__(self):
+        return len(self.array)
+
+    @property
+    def ips(self):
+        """List of IP address strings, in row order"""
+        if self._ips is None:
+            self._ips = unpack_ips(self.array["ip"])
+        return self._ips
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a snapshot from ping result rows
+
+        :param rows: list of ping result rows as returned by
+            get_mysql_pingresults
+        :returns: DeviceSnapshot
+        """
+        array = np.zeros(len(rows), dtype=ROW_DTYPE)
+        if rows:
+            (hostname, ip, pct, avg, maximum, lastup, down_count, p95, state,
+             flap_score, source, device_group, poller, stale,
+             probe_type) = zip(*rows)
+            array["ip"] = [pack_ip(value) for value in ip]
+            array["hostname"] = [(value or "").encode() for value in hostname]
+            array["source"] = [(value or "").encode() for value in source]
+            array["device_group"] = [(value or "").encode()
+                                     for value in device_group]
+            array["reachable_pct"] = [NULL_UINT8 if value is None else value
+                                      for value in pct]
+            array["avg_latency"] = [_latency(value) for value in avg]
+            array["max_latency"] = [_latency(value) for value in maximum]
+            array["p95_latency"] = [_latency(value) for value in p95]
+            array["datetime_lastup"] = [_epoch(value) for value in lastup]
+            array["down_count"] = down_count
+            array["state"] = [_STATE_CODES.get(value, NULL_UINT8)
+                              for value in state]
+            array["flap_score"] = [NULL_UINT8 if value is None else value
+                                   for value in flap_score]
+            array["poller"] = [(value or "").encode() for value in poller]
+            array["stale"] = stale
+            array["probe_type"] = [(value or "").encode()
+                                   for value in probe_type]
+        snapshot = cls(array)
+        snapshot._ips = list(ip) if rows else []
+        return snapshot
+
+    def rows(self):
+        """Ping result rows, as returned by get_mysql_pingresults
+
+        :returns: list of tuples
+        """
+        array = self.array
+        return list(zip(
+            [_text(value) for value in array["hostname"].tolist()],
+            self.ips,
+            [None if value == NULL_UINT8 else value
+             for value in array["reachable_pct"].tolist()],
+            _map_column(array["avg_latency"], _decimal),
+            _map_column(array["max_latency"], _decimal),
+            _map_column(array["datetime_lastup"], _datetime),
+            array["down_count"].tolist(),
+            _map_column(array["p95_latency"], _decimal),
+            [None if value == NULL_UINT8 else FlapDetection.STATE_NAMES[value]
+             for value in array["state"].tolist()],
+            [None if value == NULL_UINT8 else value
+             for value in array["flap_score"].tolist()],
+            _map_column(array["source"], _text),
+            _map_column(array["device_group"], _text),
+            _map_column(array["poller"], _text),
+            array["stale"].tolist(),
+            _map_column(array["probe_type"], _text)))
+
+    def apply_ping_cycle(self, inventory, sqldata_down, sqldata_up,
+                         stale=()):
+        """Apply a committed ping cycle
+
+        Mirrors the pingresults upserts of insupd_mysql_pingresults and
+        the inventory join of get_mysql_pingresults, so the rows equal
+        what the renderer would read back from the database.
+
+        :param inventory: dictionary of IP: (hostname, source,
+            device_group)
+        :param sqldata_down: list of tuples of devices that are down
+        :param sqldata_up: list of tuples of devices that are up
+        :param stale: list of IPs of devices left unprobed; their
+            previous results are kept and marked stale
+        :returns: None
+        """
+        ips = self.ips
+        index = {ip: row for row, ip in enumerate(ips)}
+        cycle_ips = [row[0] for row in sqldata_down] + \
+            [row[0] for row in sqldata_up]
+        new_ips = [ip for ip in dict.fromkeys(cycle_ips) if ip not in index]
+        array = np.array(self.array)
+        if new_ips:
+            added = np.zeros(len(new_ips), dtype=ROW_DTYPE)
+            added["ip"] = [pack_ip(ip) for ip in new_ips]
+            added["reachable_pct"] = NULL_UINT8
+            added["avg_latency"] = np.nan
+            added["max_latency"] = np.nan
+            added["p95_latency"] = np.nan
+            added["datetime_lastup"] = NULL_TIME
+            added["state"] = NULL_UINT8
+            added["flap_score"] = NULL_UINT8
+            for row, ip in enumerate(new_ips, start=len(ips)):
+                index[ip] = row
+            array = np.concatenate((array, added))
+            ips = ips + new_ips
+
+        if sqldata_down:
+            rows = np.array([index[row[0]] for row in sqldata_down])
+            array["reachable_pct"][rows] = 0
+            array["avg_latency"][rows] = np.nan
+            array["max_latency"][rows] = np.nan
+            array["down_count"][rows] += 1
+            array["p95_latency"][rows] = [_latency(row[7])
+                                          for row in sqldata_down]
+            array["state"][rows] = [_STATE_CODES.get(row[10], NULL_UINT8)
+                                    for row in sqldata_down]
+            array["flap_score"][rows] = [
+                NULL_UINT8 if row[11] is None else row[11]
+                for row in sqldata_down]
+            array["probe_type"][rows] = [(row[12] or "").encode()
+                                         for row in sqldata_down]
+            array["poller"][rows] = [(row[13] or "").encode()
+                                     for row in sqldata_down]
+            array["stale"][rows] = 0
+        if sqldata_up:
+            rows = np.array([index[row[0]] for row in sqldata_up])
+            array["reachable_pct"][rows] = [row[1] for row in sqldata_up]
+            array["avg_latency"][rows] = [_latency(row[2])
+                                          for row in sqldata_up]
+            array["max_latency"][rows] = [_latency(row[4])
+                                          for row in sqldata_up]
+            array["datetime_lastup"][rows] = [_epoch(row[5])
+                                              for row in sqldata_up]
+            array["down_count"][rows] = 0
+            array["p95_latency"][rows] = [_latency(row[8])
+                                          for row in sqldata_up]
+            array["state"][rows] = [_STATE_CODES.get(row[11], NULL_UINT8)
+                                    for row in sqldata_up]
+            array["flap_score"][rows] = [
+                NULL_UINT8 if row[12] is None else row[12]
+                for row in sqldata_up]
+            array["probe_type"][rows] = [(row[13] or "").encode()
+                                         for row in sqldata_up]
+            array["poller"][rows] = [(row[14] or "").encode()
+                                     for row in sqldata_up]
+            array["stale"][rows] = 0
+        rows = [index[ip] for ip in stale if ip in index]
+        if rows:
+            array["stale"][rows] = 1
+
+        details = [inventory.get(ip, (None, None, None)) for ip in ips]
+        for column, field in enumerate(("hostname", "source",
+                                        "device_group")):
+            array[field] = [(detail[column] or "").encode()
+                            for detail in details]
+        self.array = array
+        self._ips = ips
+
+    def save(self, snapshotfile):
+        """Atomically write the snapshot to a .npy file
+
+        :param snapshotfile: string of the snapshot file
+        :returns: None
+        """
+        tmpfile = snapshotfile + ".tmp"
+        with open(tmpfile, "wb") as outfile:
+            np.save(outfile, self.array, allow_pickle=False)
+        os.replace(tmpfile, snapshotfile)
+
+
+def read_snapshot(cacheparams):
+    """Memory-map the snapshot, unless it is missing or stale
+
+    :param cacheparams: dictionary of StateCache settings or None
+    :returns: DeviceSnapshot, or None
+    """
+    cacheparams = cacheparams or {}
+    snapshotfile = cacheparams.get("SnapshotFile", DEFAULT_SNAPSHOT_FILE)
+    try:
+        if time.time() - os.stat(snapshotfile).st_mtime > \
+                cacheparams.get("MaxAge", DEFAULT_MAX_AGE):
+            return None
+        array = np.load(snapshotfile, mmap_mode="r", allow_pickle=False)
+    except (OSError, ValueError):
+        return None
+    if array.dtype != ROW_DTYPE:
+        return None
+    return DeviceSnapshot(array)
+
+
+def write_snapshot(cacheparams, snapshot):
+    """Atomically write the snapshot
+
+    :param cacheparams: dictionary of StateCache settings or None
+    :param snapshot: DeviceSnapshot
+    :returns: None
+    """
+    snapshot.save((cacheparams or {}).get("SnapshotFile",
+                                          DEFAULT_SNAPSHOT_FILE))
+
+
+def parents_file(cacheparams):
+    """File holding the Topology parent map, next to the snapshot
+
+    :param cacheparams: dictionary of StateCache settings or None
+    :returns: string of the file name
+    """
+    snapshotfile = (cacheparams or {}).get("SnapshotFile",
+                                           DEFAULT_SNAPSHOT_FILE)
+    return os.path.splitext(snapshotfile)[0] + "-parents.json"
+
+
+def read_parents(cacheparams):
+    """Read the Topology parent map, unless it is missing or stale
+
+    :param cacheparams: dictionary of StateCache settings or None
+    :returns: dictionary of child IP: tuple of parent IPs, or None
+    """
+    filename = parents_file(cacheparams)
+    try:
+        if time.time() - os.stat(filename).st_mtime > \
+                (cacheparams or {}).get("MaxAge", DEFAULT_MAX_AGE):
+            return None
+        with open(filename, "rb") as infile:
+            pairs = JSONCodec.loads(infile.read())
+        return {child: tuple(ips) for child, ips in pairs}
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def write_parents(cacheparams, parents):
+    """Atomically write the Topology parent map
+
+    Written before the snapshot, so a fresh snapshot never comes with
+    an older parent map.
+
+    :param cacheparams: dictionary of StateCache settings or None
+    :param parents: dictionary of child IP: tuple of parent IPs
+    :returns: None
+    """
+    filename = parents_file(cacheparams)
+    tmpfile = filename + ".tmp"
+    with open(tmpfile, "wb") as outfile:
+        outfile.write(JSONCodec.dumps(sorted(parents.items())))
+    os.replace(tmpfile, filename)
+
+
+def invalidate(cacheparams):
+    """Remove the snapshot, so the next cycle reads MySQL again
+
+    :param cacheparams: dictionary of StateCache settings or None
+    :returns: None
+    """
+    for filename in ((cacheparams or {}).get("SnapshotFile",
+                                             DEFAULT_SNAPSHOT_FILE),
+                     parents_file(cacheparams)):
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+
+
+def load_results(cacheparams, serverparams, queryparams=None):
+    """Load the ping results from the snapshot, or MySQL if it is stale
+
+    :param cacheparams: dictionary of StateCache settings or None
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, database name, username, password,  etc.]
+    :param queryparams: dictionary of QueryCache settings or None
+    :returns: DeviceSnapshot
+    """
+    if enabled(cacheparams):
+        snapshot = read_snapshot(cacheparams)
+        if snapshot is not None:
+            return snapshot
+    import CreateAvailabilityDashboard
+    return DeviceSnapshot.from_rows(
+        CreateAvailabilityDashboard.get_mysql_pingresults(serverparams,
+                                                          queryparams))
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Parent-child device dependencies for outage suppression (Topology.py)
+
+#                                                                      #
+When a distribution switch, a wireless controller or the spines of an
+ACI fabric go down, every device behind them turns red too and is
+still probed with full retries every cycle.  This module models which
+devices depend on which, so the pinger can probe the children of a
+down parent with fewer packets and the dashboard can show one grouped
+outage - the parent, with a count of its unreachable children -
+instead of hundreds of tiles.
+
+The dependencies are built from the inventory:
+
+    WLC APs     - the access points of GetWLCAPs depend on their
+                  controller; their device_group is the controller's
+                  WLC alias, and the controller's host is looked up in
+                  the inventory by IP address or hostname
+    ACI fabrics - leaves depend on the spines of their fabric, from the
+                  '"fabricDomain"-fabricId--name' hostnames of
+                  GetACIAPICDevices
+    Dependencies - optional list in the Topology section naming a
+                  parent IP and its child IPs and/or device_groups, eg.
+                  the distribution switch of a building; they replace
+                  the parents found above for those children
+
+A device with several parents (eg. a leaf under two spines) is only
+suppressed when all of them are down.  Parents are taken as down from
+their committed state of the last cycle, so suppression starts with
+the cycle after the parent's failure and a single lost cycle of a
+parent doesn't suppress anything while StateTracking hysteresis holds
+it up.  Suppressed children are still probed, with SuppressedPackets
+probes, so their recovery is seen straight away.
+
+Run 'python Topology.py' to list the parents and their children.
+
+Required inputs/variables:
+    optionsconfig.yaml Topology section (optional)
+        Enabled - probe children of down parents with fewer packets and
+            group their outages on the dashboard
+        WLCAPs - APs depend on their wireless controller
+        ACIFabrics - ACI leaves depend on the spines of their fabric
+        SuppressedPackets - fping packets (or Probes attempts) per
+            suppressed child per cycle
+        SuppressedTimeout - fping timeout of a suppressed child, in ms
+        Dependencies - list of Parent, Children and DeviceGroups
+    optionsconfig.yaml WLC and MySQL sections
+
+Outputs:
+    Dictionary of child IP: tuple of parent IPs
+    Dependency listing on standard output
+
+Version log:
+v1      2026-1019   First release
+v2      2026-1019   suppressed_devices takes the parent map the pinger
+    has already built
+
+Credits:
+"""
+__version__ = '2'
+__author__ = 'Jason Davis - jadavis@cisco.com'
+__license__ = "Cisco Sample Code License, Version 1.1 - " \
+    "https://developer.cisco.com/site/license/cisco-sample-code-license/"
+
+
+import re
+import DBConnect
+import GetEnv
+
+
+# Script-global variables
+DEFAULT_SUPPRESSED_PACKETS = 1
+DEFAULT_SUPPRESSED_TIMEOUT = 250
+WLC_AP_TYPE = "Wireless AP"
+# GetACIAPICDevices hostnames, '"fabricDomain"-fabricId--name'
+ACI_HOSTNAME = re.compile(
+    r'^"(?P<domain>.*)"-(?P<fabric>[^-]+)--(?P<name>.+)$')
+
+
+def enabled(topoparams):
+    return bool((topoparams or {}).get("Enabled", False))
+
+
+def get_inventory(serverparams):
+    """Get the inventory columns the dependencies are built from
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, username, password,  etc.]
+    :returns: list of (mgmt_ip_address, hostname, device_type,
+        device_group, source) tuples
+    """
+
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+    cursor.execute(f"""SELECT mgmt_ip_address, hostname, device_type,
+    device_group, source FROM {serverparams["database"]}.inventory
+    """)
+    rows = cursor.fetchall()
+    cursor.close()
+    db.close()
+    return list(rows)
+
+
+def wlc_parents(rows, controllers):
+    """Access points depend on their wireless controller
+
+    :param rows: list of inventory tuples from get_inventory
+    :param controllers: list of WLC section dictionaries (alias, host)
+    :returns: dictionary of AP IP: (controller IP,)
+    """
+    addresses = {}
+    for (ip, hostname, _, _, _) in rows:
+        addresses[ip] = ip
+        if hostname:
+            addresses.setdefault(hostname.lower(), ip)
+    aliases = {}
+    for controller in controllers or []:
+        host = str(controller.get("host", "")).lower()
+        if host in addresses:
+            aliases[controller.get("alias")] = addresses[host]
+    return {ip: (aliases[group],)
+            for (ip, _, device_type, group, _) in rows
+            if device_type == WLC_AP_TYPE and group in aliases
+            and aliases[group] != ip}
+
+
+def aci_parents(rows):
+    """ACI leaves depend on the spines of their fabric
+
+    :param rows: list of inventory tuples from get_inventory
+    :returns: dictionary of leaf IP: tuple of spine IPs
+    """
+    spines = {}
+    leaves = {}
+    for (ip, hostname, device_type, _, _) in rows:
+        match = ACI_HOSTNAME.match(hostname or "")
+        if match is None:
+            continue
+        fabric = (match["domain"], match["fabric"])
+        if device_type == "spine":
+            spines.setdefault(fabric, []).append(ip)
+        elif device_type == "leaf":
+            leaves.setdefault(fabric, []).append(ip)
+    return {ip: tuple(sorted(spines[fabric]))
+            for fabric, ips in leaves.items() if fabric in spines
+            for ip in ips}
+
+
+def configured_parents(rows, topoparams):
+    """Dependencies listed in the Topology section
+
+    :param rows: list of inventory tuples from get_inventory
+    :param topoparams: dictionary of Topology settings
+    :returns: dictionary of child IP: tuple of parent IPs
+    """
+    parents = {}
+    for dependency in (topoparams or {}).get("Dependencies") or []:
+        parent = str(dependency.get("Parent", ""))
+        children = {str(ip) for ip in dependency.get("Children") or []}
+        groups = set(dependency.get("DeviceGroups") or [])
+        if groups:
+            children.update(ip for (ip, _, _, group, _) in rows
+                            if group in groups)
+        children.discard(parent)
+        for child in children:
+            parents[child] = parents.get(child, ()) + (parent,)
+    return parents
+
+
+def build(rows, topoparams, controllers=None):
+    """Build the dependencies of the inventory
+
+    :param rows: list of inventory tuples from get_inventory
+    :param topoparams: dictionary of Topology settings
+    :param controllers: list of WLC section dictionaries, or None
+    :returns: dictionary of child IP: tuple of parent IPs
+    """
+    topoparams = topoparams or {}
+    parents = {}
+    if topoparams.get("WLCAPs", True):
+        parents.update(wlc_parents(rows, controllers))
+    if topoparams.get("ACIFabrics", True):
+        parents.update(aci_parents(rows))
+    parents.update(configured_parents(rows, topoparams))
+    return parents
+
+
+def dependencies(serverparams, topoparams):
+    """Dependencies of the current inventory
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, username, password,  etc.]
+    :param topoparams: dictionary of Topology settings
+    :returns: dictionary of child IP: tuple of parent IPs
+    """
+    return build(get_inventory(serverparams), topoparams,
+                 GetEnv.getparam("WLC"))
+
+
+def down_devices(serverparams, ips):
+    """Devices down as of the last committed cycle
+
+    Down as the dashboard classifies them: the tracked state is down,
+    or, for rows without a state, the device didn't answer.
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, username, password,  etc.]
+    :param ips: set of the IPs of interest, eg. the parents
+    :returns: set of IPs
+    """
+
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+    cursor.execute(f"""SELECT mgmt_ip_address
+    FROM {serverparams["database"]}.pingresults
+    WHERE state = 'down' OR (state IS NULL AND reachable_pct = 0)
+    """)
+    rows = cursor.fetchall()
+    cursor.close()
+    db.close()
+    return {row[0] for row in rows if row[0] in ips}
+
+
+def suppressed(parents, down):
+    """Children all of whose parents are down
+
+    :param parents: dictionary of child IP: tuple of parent IPs
+    :param down: set of IPs of down devices
+    :returns: set of child IPs
+    """
+    return {child for child, ips in parents.items()
+            if all(ip in down for ip in ips)}
+
+
+def suppressed_devices(serverparams, topoparams, devicelist, parents=None):
+    """Devices of a ping cycle to probe with fewer packets
+
+    :param serverparams: dictionary containing settings of the MySQL
+        server [eg. host, username, password,  etc.]
+    :param topoparams: dictionary of Topology settings
+    :param devicelist: list of device IPs to ping
+    :param parents: optional dictionary of child IP: tuple of parent
+        IPs from dependencies; built when None
+    :returns: set of IPs of devicelist whose parents are all down
+    """
+    if parents is None:
+        parents = dependencies(serverparams, topoparams)
+    if not parents:
+        return set()
+    down = down_devices(serverparams,
+                        {ip for ips in parents.values() for ip in ips})
+    return suppressed(parents, down) & set(devicelist)
+
+
+def fping_options(topoparams):
+    """fping count and timeout options of suppressed children
+
+    :param topoparams: dictionary of Topology settings
+    :returns: list of fping arguments
+    """
+    topoparams = topoparams or {}
+    packets = topoparams.get("SuppressedPackets", DEFAULT_SUPPRESSED_PACKETS)
+    timeout = topoparams.get("SuppressedTimeout", DEFAULT_SUPPRESSED_TIMEOUT)
+    return [f"-c{packets}", f"-t{timeout}"]
+
+
+def probe_attempts(topoparams):
+    return (topoparams or {}).get("SuppressedPackets",
+                                  DEFAULT_SUPPRESSED_PACKETS)
+
+
+def root_cause(ip, parents, down):
+    """Topmost down device a down device's outage is caused by
+
+    Follows the first parent up while all parents of the device are
+    down; dependency loops stop at the first repeated device.
+
+    :param ip: string of a down device's IP
+    :param parents: dictionary of child IP: tuple of parent IPs
+    :param down: set of IPs of down devices
+    :returns: string of the root cause IP, ip itself when its outage
+        isn't explained by its parents
+    """
+    seen = {ip}
+    while True:
+        ips = parents.get(ip)
+        if not ips or not all(parent in down for parent in ips) \
+                or ips[0] in seen:
+            return ip
+        ip = ips[0]
+        seen.add(ip)
+
+
+def group_outages(in_results, classes, parents):
+    """Group the down devices under the outage of their root cause
+
+    :param in_results: list of ping result rows, the IP in row[1]
+    :param classes: list of endpoint classes aligned with in_results
+    :param parents: dictionary of child IP: tuple of parent IPs
+    :returns: dictionary of root cause IP: list of the indexes of its
+        down descendants in in_results
+    """
+    down = {endpoint[1] for endpoint, endpointclass
+            in zip(in_results, classes) if endpointclass == "down"}
+    groups = {}
+    for index, endpoint in enumerate(in_results):
+        if endpoint[1] not in down:
+            continue
+        root = root_cause(endpoint[1], parents, down)
+        if root != endpoint[1]:
+            groups.setdefault(root, []).append(index)
+    return groups
+
+
+def main():
+    topoparams = GetEnv.getparam("Topology") or {}
+    parents = dependencies(GetEnv.getparam("MySQL"), topoparams)
+    children = {}
+    for child, ips in parents.items():
+        for ip in ips:
+            children.setdefault(ip, []).append(child)
+    for parent in sorted(children):
+        print(f"{parent}: {len(children[parent])} children")
+    print(f"{len(parents)} devices depend on {len(children)} parents")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Shared fixtures of the DD-CAM tests
+
+The tests run against a SQLite database in a temporary directory and,
+when DDCAM_TEST_MYSQL_HOST, DDCAM_TEST_MYSQL_USER,
+DDCAM_TEST_MYSQL_PASSWORD and DDCAM_TEST_MYSQL_DATABASE are set,
+against that local MySQL database as well.  The MySQL database is
+dropped and recreated from docker/mysql/build-database.sql, so use a
+dedicated one.
+"""
+
+import os
+import re
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import DBConnect  # noqa: E402
+
+MYSQL_SETTINGS = ("HOST", "USER", "PASSWORD", "DATABASE")
+
+
+def mysql_params():
+    values = [os.environ.get(f"DDCAM_TEST_MYSQL_{name}")
+              for name in MYSQL_SETTINGS]
+    if not all(values):
+        return None
+    (host, username, password, database) = values
+    return {"host": host, "username": username, "password": password,
+            "database": database}
+
+
+def create_mysql_schema(serverparams):
+    with open(os.path.join(ROOT, "docker", "mysql",
+                           "build-database.sql")) as infile:
+        script = re.sub(r"^--.*$", "", infile.read(), flags=re.MULTILINE)
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+    for statement in script.split(";"):
+        statement = statement.strip()
+        if not statement or statement.upper().startswith(
+                ("CREATE DATABASE", "USE ")):
+            continue
+        table = re.match(r"CREATE TABLE `(\w+)`", statement)
+        if table:
+            cursor.execute(f"DROP TABLE IF EXISTS `{table.group(1)}`")
+        cursor.execute(statement)
+    db.commit()
+    cursor.close()
+    db.close()
+
+
+@pytest.fixture(params=["sqlite", "mysql"])
+def serverparams(request, tmp_path):
+    """Settings of an empty project database"""
+    if request.param == "mysql":
+        params = mysql_params()
+        if params is None:
+            pytest.skip("DDCAM_TEST_MYSQL_* not set")
+        create_mysql_schema(params)
+        return params
+    params = {"engine": "sqlite", "path": str(tmp_path / "ddcam.sqlite"),
+              "database": "devnet_dashboards"}
+    DBConnect.create_sqlite_schema(params)
+    return params
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Temporary working directory with an optionsconfig.yaml"""
+    (tmp_path / "optionsconfig.yaml").write_text(
+        "SLA:\n  Enabled: False\nQueryCache:\n  Enabled: False\n")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
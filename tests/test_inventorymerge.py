@@ -0,0 +1,84 @@
+"""Merging the sources' inventories (InventoryMerge.py)"""
+
+import DBConnect
+import InventoryMerge
+
+MERGEPARAMS = {"Precedence": ["DNACenter", "WLC"], "BatchSize": 2}
+
+
+def device(ip, hostname=None, serial=None, model=None):
+    return {"mgmt_ip_address": ip, "hostname": hostname,
+            "serial_number": serial, "model": model, "source": "test",
+            "do_ping": 1}
+
+
+def query(serverparams, sql):
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+    cursor.execute(sql.format(database=serverparams["database"]))
+    rows = [tuple(row) for row in cursor.fetchall()]
+    cursor.close()
+    db.close()
+    return rows
+
+
+def inventory(serverparams):
+    return query(serverparams, """SELECT mgmt_ip_address, hostname, model
+    FROM {database}.inventory ORDER BY mgmt_ip_address""")
+
+
+def test_precedence_and_removed_source(workdir, serverparams):
+    InventoryMerge.merge(serverparams, "WLC",
+                         [device("10.0.0.1", "wlc-name", model="AP1"),
+                          device("10.0.0.2", "ap-2")], MERGEPARAMS)
+    InventoryMerge.merge(serverparams, "DNACenter",
+                         [device("10.0.0.1", "dnac-name")], MERGEPARAMS)
+    assert inventory(serverparams) == [("10.0.0.1", "dnac-name", "AP1"),
+                                       ("10.0.0.2", "ap-2", None)]
+
+    # The WLC no longer reports either device: 10.0.0.2 is gone, and
+    #  10.0.0.1 loses the model only the WLC reported
+    counts = InventoryMerge.merge(serverparams, "WLC", [], MERGEPARAMS)
+    assert counts["sources_removed"] == 2
+    assert counts["devices_removed"] == 1
+    assert inventory(serverparams) == [("10.0.0.1", "dnac-name", None)]
+
+
+def test_unreported_device_loses_its_ping_results(workdir, serverparams):
+    InventoryMerge.merge(serverparams, "WLC",
+                         [device(f"10.0.1.{n}") for n in range(5)],
+                         MERGEPARAMS)
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+    cursor.executemany(f"""INSERT INTO {serverparams['database']}.pingresults
+    (mgmt_ip_address, down_count) VALUES (%s, 0)
+    """, [(f"10.0.1.{n}",) for n in range(5)])
+    # Added by hand, never reported by a source
+    cursor.execute(f"""INSERT INTO {serverparams['database']}.inventory
+    (mgmt_ip_address, hostname) VALUES ('10.0.9.9', 'manual')""")
+    db.commit()
+    cursor.close()
+    db.close()
+
+    counts = InventoryMerge.merge(serverparams, "WLC",
+                                  [device("10.0.1.0")], MERGEPARAMS)
+    assert counts["devices_removed"] == 4
+    assert [row[0] for row in inventory(serverparams)] == ["10.0.1.0",
+                                                           "10.0.9.9"]
+    assert query(serverparams, """SELECT mgmt_ip_address
+    FROM {database}.pingresults""") == [("10.0.1.0",)]
+
+
+def test_serial_merged_device_keeps_remaining_ip(workdir, serverparams):
+    InventoryMerge.merge(serverparams, "DNACenter",
+                         [device("10.0.2.1", "sw1", "abc 123")], MERGEPARAMS)
+    InventoryMerge.merge(serverparams, "WLC",
+                         [device("10.0.2.2", "sw1-wlc", "ABC123")],
+                         MERGEPARAMS)
+    assert inventory(serverparams) == [("10.0.2.1", "sw1", None)]
+
+    # DNA Center drops the device; it stays under the WLC's IP only
+    counts = InventoryMerge.merge(serverparams, "DNACenter", [],
+                                  MERGEPARAMS)
+    assert counts["devices_removed"] == 1
+    assert inventory(serverparams) == [("10.0.2.2", "sw1-wlc", None)]
@@ -0,0 +1,163 @@
+"""TCP, HTTPS and SNMP probes against loopback listeners (Probes.py)"""
+
+import os
+import socket
+import ssl
+import threading
+import time
+
+import pytest
+
+import Probes
+from conftest import ROOT
+
+LOOPBACK = "127.0.0.1"
+TIMEOUT = 0.2
+PARAMS = {"Attempts": 2, "Timeout": TIMEOUT}
+
+
+class Listener:
+    """Loopback TCP listener; handler(connection) serves each client"""
+
+    def __init__(self, handler=None, address=LOOPBACK):
+        self.handler = handler
+        self.sock = socket.create_server((address, 0))
+        self.port = self.sock.getsockname()[1]
+        self.connections = []
+        self.accepted = 0
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                (connection, _) = self.sock.accept()
+            except OSError:
+                return
+            self.accepted += 1
+            # Kept open until close(), so silent listeners stay silent
+            self.connections.append(connection)
+            if self.handler:
+                threading.Thread(target=self.handler, args=(connection,),
+                                 daemon=True).start()
+
+    def close(self):
+        self.sock.close()
+        for connection in self.connections:
+            connection.close()
+
+
+def tls_context():
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(
+        os.path.join(ROOT, "docker", "apache", "server.crt"),
+        os.path.join(ROOT, "docker", "apache", "server.key"))
+    return context
+
+
+def https_handler(reply):
+    context = tls_context()
+
+    def handler(connection):
+        try:
+            client = context.wrap_socket(connection, server_side=True)
+            client.recv(1024)
+            if reply:
+                client.sendall(reply)
+                client.close()
+            else:
+                time.sleep(5)
+        except (OSError, ssl.SSLError):
+            pass
+    return handler
+
+
+@pytest.fixture
+def listeners():
+    started = []
+
+    def start(handler=None, address=LOOPBACK):
+        listener = Listener(handler, address)
+        started.append(listener)
+        return listener
+    yield start
+    for listener in started:
+        listener.close()
+
+
+def closed_port():
+    with socket.create_server((LOOPBACK, 0)) as sock:
+        return sock.getsockname()[1]
+
+
+def test_parse_probe():
+    assert Probes.parse_probe("") == ("icmp", [])
+    assert Probes.parse_probe("tcp:22,830") == ("tcp", [22, 830])
+    assert Probes.parse_probe("https") == ("https", [443])
+    assert Probes.parse_probe("tcp", {"TCPPorts": [8080]}) == \
+        ("tcp", [8080])
+    with pytest.raises(ValueError):
+        Probes.parse_probe("tcp:70000")
+
+
+def test_tcp_open_and_closed_port(listeners):
+    listener = listeners()
+    (hosts, unprobed) = Probes.run(
+        {LOOPBACK: f"tcp:{closed_port()},{listener.port}"}, PARAMS)
+    assert unprobed == []
+    assert hosts[LOOPBACK]["rcv"] == 2
+    assert hosts[LOOPBACK]["loss_percentage"] == 0
+    assert hosts[LOOPBACK]["max"] < TIMEOUT * 1000
+
+    (hosts, _) = Probes.run({LOOPBACK: f"tcp:{closed_port()}"}, PARAMS)
+    assert hosts[LOOPBACK] == {"xmt": 2, "rcv": 0, "loss_percentage": 100}
+
+
+def test_https_answered(listeners):
+    listener = listeners(https_handler(b"HTTP/1.0 200 OK\r\n\r\n"))
+    (hosts, _) = Probes.run({LOOPBACK: f"https:{listener.port}"}, PARAMS)
+    assert hosts[LOOPBACK]["rcv"] == 2
+
+
+@pytest.mark.parametrize("handler", [
+    None,                                # TCP accepted, no TLS handshake
+    https_handler(None),                 # TLS, no HTTP response
+])
+def test_https_silent_listener_times_out(listeners, handler):
+    listener = listeners(handler)
+    start = time.monotonic()
+    (hosts, _) = Probes.run({LOOPBACK: f"https:{listener.port}"}, PARAMS)
+    elapsed = time.monotonic() - start
+    assert hosts[LOOPBACK] == {"xmt": 2, "rcv": 0, "loss_percentage": 100}
+    assert listener.accepted == 2
+    # Each attempt gives up after Timeout
+    assert 2 * TIMEOUT <= elapsed < 2 * TIMEOUT + 1
+
+
+def test_https_non_http_reply_fails(listeners):
+    listener = listeners(https_handler(b"SSH-2.0-OpenSSH\r\n"))
+    (hosts, _) = Probes.run({LOOPBACK: f"https:{listener.port}"}, PARAMS)
+    assert hosts[LOOPBACK]["rcv"] == 0
+
+
+def test_snmp_silent_agent_times_out():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as agent:
+        agent.bind((LOOPBACK, 0))
+        port = agent.getsockname()[1]
+        (hosts, _) = Probes.run({LOOPBACK: f"snmp:{port}"}, PARAMS)
+        request = agent.recv(1024)
+    assert hosts[LOOPBACK] == {"xmt": 2, "rcv": 0, "loss_percentage": 100}
+    # An SNMPv2c GetRequest of the default community
+    assert request.startswith(b"\x30") and b"\x04\x06public\xa0" in request
+
+
+def test_budget_cancels_slow_probes(listeners):
+    silent = listeners()
+    answering = listeners(address="127.0.0.2")
+    targets = {LOOPBACK: f"https:{silent.port}",
+               "127.0.0.2": f"tcp:{answering.port}"}
+    start = time.monotonic()
+    (hosts, unprobed) = Probes.run(targets, {"Attempts": 3, "Timeout": 1.0},
+                                   budget=0.5)
+    assert time.monotonic() - start < 1.0
+    assert unprobed == [LOOPBACK]
+    assert list(hosts) == ["127.0.0.2"]
@@ -0,0 +1,110 @@
+"""Read-through cache of the dashboard queries (QueryCache.py)"""
+
+import os
+import time
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+import CreateAvailabilityDashboard
+import PingAndUpdateInventory
+import QueryCache
+
+
+@pytest.fixture(autouse=True)
+def empty_memory_cache():
+    QueryCache._results.clear()
+    yield
+    QueryCache._results.clear()
+
+
+@pytest.fixture
+def queryparams(workdir):
+    params = {"Enabled": True, "CacheDir": str(workdir / "query_cache"),
+              "GenerationMaxAge": 60}
+    (workdir / "optionsconfig.yaml").write_text(
+        f"QueryCache:\n  Enabled: True\n  CacheDir: {params['CacheDir']}\n"
+        f"  GenerationMaxAge: 60\n")
+    return params
+
+
+@pytest.fixture
+def generation_reads(monkeypatch):
+    """Count the reads of the query_generation table"""
+    reads = []
+    generation = QueryCache.generation
+
+    def counted(serverparams):
+        reads.append(serverparams["database"])
+        return generation(serverparams)
+    monkeypatch.setattr(QueryCache, "generation", counted)
+    return reads
+
+
+def up_row(ip):
+    return (ip, 100, 1.5, 0.5, 2.5, "2026-10-19 12:00:00", 0, 1.5, 2.0,
+            2.5, 0.5, "up", 0, "icmp", None)
+
+
+def test_result_encoding_round_trip():
+    rows = [("a", Decimal("1.50"), datetime(2026, 10, 19, 12, 0), None, 3)]
+    assert QueryCache.decode_result(QueryCache.encode_result(rows)) == rows
+    with pytest.raises(ValueError):
+        QueryCache.decode_result(b'{"value": 1}')
+
+
+def test_published_generation_never_goes_back(queryparams, serverparams):
+    assert QueryCache.published_generation(queryparams, serverparams) is None
+    QueryCache.publish(queryparams, serverparams, 5)
+    QueryCache.publish(queryparams, serverparams, 3)
+    assert QueryCache.published_generation(queryparams, serverparams) == 5
+    assert QueryCache.generation_file(None, serverparams) is None
+
+
+def test_repeated_reads_skip_the_database(queryparams, serverparams,
+                                          generation_reads):
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return [("row", 1)]
+    for _ in range(3):
+        assert QueryCache.read_through(queryparams, serverparams, "q", (),
+                                       loader) == [("row", 1)]
+    assert len(loads) == 1
+    # Looked up once, then taken from the published file
+    assert len(generation_reads) == 1
+
+
+def test_commit_publishes_the_new_generation(queryparams, serverparams,
+                                             generation_reads):
+    PingAndUpdateInventory.insupd_mysql_pingresults(
+        serverparams, "up", [up_row("10.0.0.1")], bump=True)
+    assert QueryCache.published_generation(queryparams, serverparams) == 1
+    assert [row[1] for row in CreateAvailabilityDashboard
+            .get_mysql_pingresults(serverparams, queryparams)] == ["10.0.0.1"]
+
+    PingAndUpdateInventory.insupd_mysql_pingresults(
+        serverparams, "up", [up_row("10.0.0.2")], bump=True)
+    assert QueryCache.published_generation(queryparams, serverparams) == 2
+    assert [row[1] for row in CreateAvailabilityDashboard
+            .get_mysql_pingresults(serverparams, queryparams)] == \
+        ["10.0.0.1", "10.0.0.2"]
+    assert generation_reads == []
+
+
+def test_old_published_generation_is_looked_up(queryparams, serverparams,
+                                               generation_reads):
+    # A commit nobody published here, eg. by a poller on another host
+    QueryCache.bump(serverparams)
+    QueryCache.publish(queryparams, serverparams, 0)
+    filename = QueryCache.generation_file(queryparams, serverparams)
+    QueryCache.read_through(queryparams, serverparams, "q", (), list)
+    assert generation_reads == []
+
+    old = time.time() - 120
+    os.utime(filename, (old, old))
+    QueryCache.read_through(queryparams, serverparams, "q", (), list)
+    assert len(generation_reads) == 1
+    assert QueryCache.published_generation(queryparams, serverparams) == 1
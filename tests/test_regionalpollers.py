@@ -0,0 +1,151 @@
+"""Regional poller batches and spool ingest (RegionalPollers.py)"""
+
+import multiprocessing
+import os
+import sqlite3
+import time
+
+import pytest
+
+import DBConnect
+import PingAndUpdateInventory
+import RegionalPollers
+
+
+def down_row(ip):
+    return (ip, 0, None, None, None, 1, None, None, None, None, "down", 0,
+            "icmp")
+
+
+def up_row(ip):
+    return (ip, 100, 1.5, 0.5, 2.5, "2026-10-19 12:00:00", 0, 1.5, 2.0,
+            2.5, 0.5, "up", 0, "icmp")
+
+
+def make_batch(poller="branch", down=("10.0.0.1",), up=("10.0.0.2",),
+               created=None):
+    return RegionalPollers.encode_batch(poller, [down_row(ip) for ip in down],
+                                        [up_row(ip) for ip in up],
+                                        created=created)
+
+
+def pingresults(serverparams):
+    db = DBConnect.connect(serverparams)
+    cursor = db.cursor()
+    cursor.execute(f"""SELECT mgmt_ip_address, reachable_pct, down_count,
+    poller FROM {serverparams['database']}.pingresults
+    ORDER BY mgmt_ip_address""")
+    rows = [tuple(row) for row in cursor.fetchall()]
+    cursor.close()
+    db.close()
+    return rows
+
+
+@pytest.fixture
+def regionparams(workdir):
+    return {"Enabled": True, "SpoolDir": str(workdir / "spool")}
+
+
+def test_batch_round_trip():
+    (batch_id, data) = make_batch(created=10**18)
+    batch = RegionalPollers.decode_batch(data)
+    assert batch_id == batch["batch_id"] == f"branch-{10**18}"
+    assert batch["down"] == [list(down_row("10.0.0.1"))]
+    assert [tuple(row) for row in batch["up"]] == [up_row("10.0.0.2")]
+
+
+@pytest.mark.parametrize("data", [
+    b"not compressed",
+    RegionalPollers.zlib.compress(b'{"format": 1}'),
+    RegionalPollers.zlib.compress(
+        b'{"format": 1, "batch_id": "b-1", "poller": "b", "created": 1, '
+        b'"down": [["10.0.0.1", 0]], "up": []}'),
+])
+def test_malformed_batch_is_refused(data):
+    with pytest.raises(ValueError):
+        RegionalPollers.decode_batch(data)
+
+
+def test_duplicate_batch_is_applied_once(workdir, serverparams):
+    (batch_id, data) = make_batch()
+    batch = RegionalPollers.decode_batch(data)
+    assert RegionalPollers.apply_batch(serverparams, batch) == "applied"
+    assert RegionalPollers.apply_batch(serverparams, batch) == "duplicate"
+    assert pingresults(serverparams) == [("10.0.0.1", 0, 1, "branch"),
+                                         ("10.0.0.2", 100, 0, "branch")]
+
+
+def test_older_batch_is_stale(workdir, serverparams):
+    now = time.time_ns()
+    newer = RegionalPollers.decode_batch(make_batch(created=now)[1])
+    older = RegionalPollers.decode_batch(
+        make_batch(down=(), up=("10.0.0.1",), created=now - 10**9)[1])
+    assert RegionalPollers.apply_batch(serverparams, newer) == "applied"
+    assert RegionalPollers.apply_batch(serverparams, older) == "stale"
+    assert pingresults(serverparams)[0] == ("10.0.0.1", 0, 1, "branch")
+
+
+def apply(serverparams, data):
+    return RegionalPollers.apply_batch(serverparams,
+                                       RegionalPollers.decode_batch(data))
+
+
+def test_concurrent_apply_counts_once(workdir, serverparams):
+    (batch_id, data) = make_batch(down=[f"10.0.1.{n}" for n in range(200)])
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        outcomes = pool.starmap(apply, [(serverparams, data)] * 4)
+    assert sorted(outcomes) == ["applied"] + ["duplicate"] * 3
+    assert {row[2] for row in pingresults(serverparams)
+            if row[1] == 0} == {1}
+
+
+def ingest(regionparams, serverparams):
+    return RegionalPollers.ingest_spool(regionparams, serverparams)
+
+
+def test_concurrent_ingest_applies_each_batch_once(regionparams,
+                                                   serverparams):
+    now = time.time_ns()
+    for n in range(5):
+        (batch_id, data) = make_batch(created=now + n)
+        RegionalPollers.send_batch(regionparams, batch_id, data)
+    with multiprocessing.get_context("fork").Pool(3) as pool:
+        counts = pool.starmap(ingest, [(regionparams, serverparams)] * 3)
+    assert sum(count.get("applied", 0) for count in counts) == 5
+    assert os.listdir(regionparams["SpoolDir"]) == []
+    # Each of the five batches marked 10.0.0.1 down once
+    assert pingresults(serverparams)[0] == ("10.0.0.1", 0, 5, "branch")
+
+
+def test_ingest_rejects_malformed_and_retries_failed(regionparams,
+                                                     serverparams,
+                                                     monkeypatch):
+    spool = regionparams["SpoolDir"]
+    now = time.time_ns()
+    RegionalPollers.send_batch(regionparams, f"branch-{now}", b"garbage")
+    (first, data) = make_batch(created=now + 1)
+    RegionalPollers.send_batch(regionparams, first, data)
+    (second, data) = make_batch(created=now + 2)
+    RegionalPollers.send_batch(regionparams, second, data)
+
+    upsert = PingAndUpdateInventory.upsert_pingresults
+    failures = []
+
+    def locked_once(*args):
+        if not failures:
+            failures.append(args)
+            raise sqlite3.OperationalError("database is locked")
+        return upsert(*args)
+
+    monkeypatch.setattr(PingAndUpdateInventory, "upsert_pingresults",
+                        locked_once)
+    assert RegionalPollers.ingest_spool(regionparams, serverparams) == \
+        {"rejected": 1, "retried": 1}
+    assert sorted(os.listdir(spool)) == [
+        f"branch-{now}.batch.rejected", first + ".batch", second + ".batch"]
+    assert pingresults(serverparams) == []
+
+    assert RegionalPollers.ingest_spool(regionparams, serverparams) == \
+        {"applied": 2}
+    assert os.listdir(spool) == [f"branch-{now}.batch.rejected"]
+    assert pingresults(serverparams)[0] == ("10.0.0.1", 0, 2, "branch")
@@ -0,0 +1,91 @@
+"""Shard leases of several poller workers (ShardLeases.py)"""
+
+import multiprocessing
+import time
+
+import ShardLeases
+
+SHARDS = 16
+
+
+def claim(serverparams, worker, lease_seconds):
+    return ShardLeases.claim_shards(serverparams, worker, SHARDS,
+                                    lease_seconds)
+
+
+def claim_concurrently(serverparams, workers, lease_seconds=60):
+    """Each worker claims its shards in a process of its own"""
+    with multiprocessing.get_context("fork").Pool(len(workers)) as pool:
+        owned = pool.starmap(claim, [(serverparams, worker, lease_seconds)
+                                     for worker in workers])
+    return dict(zip(workers, owned))
+
+
+def assert_disjoint(owned):
+    workers = list(owned)
+    for (index, worker) in enumerate(workers):
+        for other in workers[index + 1:]:
+            assert not owned[worker] & owned[other], (worker, other)
+
+
+def test_shard_of_is_stable():
+    assert ShardLeases.shard_of("10.0.0.1", SHARDS) == \
+        ShardLeases.shard_of("10.0.0.1", SHARDS)
+    assert {ShardLeases.shard_of(f"10.0.{n // 256}.{n % 256}", SHARDS)
+            for n in range(1000)} == set(range(SHARDS))
+
+
+def test_concurrent_workers_split_the_shards(serverparams):
+    workers = ["worker-a", "worker-b", "worker-c"]
+    first = claim_concurrently(serverparams, workers)
+    assert_disjoint(first)
+
+    # Once every heartbeat is in, the shards are shared out completely
+    for _ in range(2):
+        owned = claim_concurrently(serverparams, workers)
+        assert_disjoint(owned)
+    assert set().union(*owned.values()) == set(range(SHARDS))
+    for worker in workers:
+        assert owned[worker] == {
+            shard for shard in range(SHARDS)
+            if ShardLeases.owner_of(shard, workers) == worker}
+
+
+def test_live_lease_is_not_taken_over(serverparams):
+    assert claim(serverparams, "worker-a", 60) == set(range(SHARDS))
+
+    # worker-a still holds every lease, so worker-b gets none yet
+    assert claim(serverparams, "worker-b", 60) == set()
+
+    # worker-a hands over worker-b's share, which worker-b then claims
+    owned_a = claim(serverparams, "worker-a", 60)
+    owned_b = claim(serverparams, "worker-b", 60)
+    assert owned_a and owned_b
+    assert not owned_a & owned_b
+    assert owned_a | owned_b == set(range(SHARDS))
+
+
+def test_expired_worker_is_taken_over(serverparams):
+    # Heartbeats in, then surplus leases released, then claimed
+    for _ in range(3):
+        owned = claim_concurrently(serverparams, ["worker-a", "worker-b"], 2)
+    assert_disjoint(owned)
+    assert owned["worker-a"] and owned["worker-b"]
+
+    # worker-b stops; once its heartbeat and leases expire worker-a
+    #  owns every shard
+    time.sleep(3)
+    assert claim(serverparams, "worker-a", 2) == set(range(SHARDS))
+
+
+def test_assign_devices(serverparams):
+    devices = [f"10.1.0.{n}" for n in range(1, 101)]
+    params = {"Shards": SHARDS, "LeaseSeconds": 60}
+    assert ShardLeases.assign_devices(params, serverparams, devices,
+                                      "worker-a") == devices
+    ShardLeases.assign_devices(params, serverparams, devices, "worker-b")
+    part_a = ShardLeases.assign_devices(params, serverparams, devices,
+                                        "worker-a")
+    part_b = ShardLeases.assign_devices(params, serverparams, devices,
+                                        "worker-b")
+    assert sorted(part_a + part_b) == sorted(devices)
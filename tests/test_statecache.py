@@ -0,0 +1,92 @@
+"""StateCache snapshot and the Topology parents saved with it
+(StateCache.py)"""
+
+import os
+import time
+
+import pytest
+
+import CreateAvailabilityDashboard
+import StateCache
+import Topology
+
+PARENTS = {"10.0.0.2": ("10.0.0.1",), "10.0.0.3": ("10.0.0.1", "10.0.0.4")}
+
+
+def row(ip, pct, state):
+    return ("host-" + ip, ip, pct, 1.0 if pct else None,
+            2.0 if pct else None, None, 0 if pct else 3, None, state, 0,
+            "DNACenter", "core", None, 0, None)
+
+
+@pytest.fixture
+def cacheparams(tmp_path):
+    return {"Enabled": True, "SnapshotFile": str(tmp_path / "state.npy"),
+            "MaxAge": 60}
+
+
+def test_parents_round_trip(cacheparams):
+    assert StateCache.read_parents(cacheparams) is None
+    StateCache.write_parents(cacheparams, PARENTS)
+    assert StateCache.parents_file(cacheparams).endswith("state-parents.json")
+    assert StateCache.read_parents(cacheparams) == PARENTS
+
+
+def test_stale_or_damaged_parents_are_ignored(cacheparams):
+    StateCache.write_parents(cacheparams, PARENTS)
+    filename = StateCache.parents_file(cacheparams)
+    old = time.time() - 120
+    os.utime(filename, (old, old))
+    assert StateCache.read_parents(cacheparams) is None
+
+    with open(filename, "w") as outfile:
+        outfile.write('{"not": "pairs"')
+    assert StateCache.read_parents(cacheparams) is None
+
+
+def test_invalidate_removes_snapshot_and_parents(cacheparams):
+    StateCache.write_snapshot(cacheparams, StateCache.DeviceSnapshot.from_rows(
+        [row("10.0.0.1", 100, "up")]))
+    StateCache.write_parents(cacheparams, PARENTS)
+    StateCache.invalidate(cacheparams)
+    assert StateCache.read_snapshot(cacheparams) is None
+    assert StateCache.read_parents(cacheparams) is None
+
+
+@pytest.fixture
+def renderer(tmp_path, monkeypatch, cacheparams):
+    """Standalone renderer settings with StateCache and Topology on"""
+    (tmp_path / "optionsconfig.yaml").write_text(f"""
+LatencyThreshold: 100
+DashboardFile: {tmp_path / "www" / "DDCAM" / "availability.html"}
+MySQL:
+  engine: sqlite
+  path: {tmp_path / "missing.sqlite"}
+  database: devnet_dashboards
+StateCache:
+  Enabled: True
+  SnapshotFile: {cacheparams["SnapshotFile"]}
+  MaxAge: 60
+Topology:
+  Enabled: True
+""")
+    (tmp_path / "www").mkdir()
+    monkeypatch.chdir(tmp_path)
+    calls = []
+    monkeypatch.setattr(Topology, "dependencies",
+                        lambda *args: calls.append(args) or PARENTS)
+    StateCache.write_snapshot(cacheparams, StateCache.DeviceSnapshot.from_rows(
+        [row("10.0.0.1", 0, "down"), row("10.0.0.2", 0, "down"),
+         row("10.0.0.4", 100, "up")]))
+    return calls
+
+
+def test_renderer_uses_parents_of_fresh_snapshot(renderer, cacheparams):
+    StateCache.write_parents(cacheparams, PARENTS)
+    CreateAvailabilityDashboard.main()
+    assert renderer == []
+
+
+def test_renderer_builds_parents_without_saved_ones(renderer):
+    CreateAvailabilityDashboard.main()
+    assert len(renderer) == 1